@@ -0,0 +1,554 @@
+"""Scaling benchmarks on synthetic station catalogs.
+
+Generates catalogs clustered around Kerala cities and times catalog loading,
+radius and text search, filtering, result rendering, map generation and provider
+registration at each size, and optionally cold vs snapshot warm starts and
+sharded multi-process batch search. Results are written as JSON so runs from different
+versions can be compared:
+
+    python benchmark.py --sizes 1000 10000 100000 --output bench.json
+    python benchmark.py --sizes 1000 10000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator
+
+from charging_estimate import ChargeEstimator, VehicleProfile
+from catalog_snapshot import catalog_signature, load_catalog, save_snapshot
+from map_render import MapCache, render_map
+from provider_import import register_providers
+from provider_store import SQLiteProviderStore
+from sharded_search import ShardedSearch
+from station_engine import PUBLIC_STATIONS, StationEngine, build_engine
+from station_record import StationRecord
+
+# (name, lat, lon, relative weight, spread in degrees)
+KERALA_CITIES = [
+    ("Thiruvananthapuram", 8.5241, 76.9366, 0.18, 0.08),
+    ("Kochi", 9.9312, 76.2673, 0.24, 0.08),
+    ("Kozhikode", 11.2588, 75.7804, 0.14, 0.06),
+    ("Thrissur", 10.5276, 76.2144, 0.10, 0.05),
+    ("Kollam", 8.8932, 76.6141, 0.07, 0.05),
+    ("Kannur", 11.8745, 75.3704, 0.06, 0.05),
+    ("Alappuzha", 9.4981, 76.3388, 0.05, 0.04),
+    ("Palakkad", 10.7867, 76.6548, 0.05, 0.05),
+    ("Kottayam", 9.5916, 76.5222, 0.05, 0.04),
+    ("Malappuram", 11.0510, 76.0711, 0.06, 0.05),
+]
+# Stations outside the cities, spread over the state's bounding box
+RURAL_SHARE = 0.1
+KERALA_BOUNDS = (8.2, 12.8, 74.9, 77.4)
+
+CONNECTOR_MIXES = [["Type 2"], ["Type 2", "CCS"], ["CCS", "CHAdeMO"], ["Type 2", "CCS", "CHAdeMO"], ["CCS"]]
+ACCESS_TYPES = [("public", 0.6), ("private", 0.25), ("provider", 0.15)]
+OPERATING_HOURS = ["24/7", "10AM-10PM", "8AM-8PM", "6PM-10PM", "Mon-Sat 9AM-9PM; Sun closed", "22:00-06:00"]
+
+SEARCH_RADII = [5, 25, 50]
+
+# Cold-start budgets, in seconds from process launch
+STARTUP_BUDGETS = {"import_app": 0.4, "first_paint": 0.6, "first_results": 1.0}
+STARTUP_RUNS = 3
+
+# Run in a fresh interpreter so imports are cold; prints the startup marks as JSON
+STARTUP_PROBE = """
+import json, sys, time
+launched = time.perf_counter()
+import tkinter as tk
+from ev_charging_with_providers import EVChargingWithProviders
+marks = {"import_app": time.perf_counter() - launched}
+try:
+    root = tk.Tk()
+except tk.TclError as e:
+    print(json.dumps(dict(marks, error=str(e))))
+    sys.exit()
+app = EVChargingWithProviders(root, dataset_files=sys.argv[1:])
+deadline = time.perf_counter() + 300
+while 'catalog_loaded' not in app.startup_marks and time.perf_counter() < deadline:
+    root.update()
+    time.sleep(0.002)
+offset = app.started - launched
+marks.update({name: offset + seconds for name, seconds in app.startup_marks.items()})
+root.destroy()
+print(json.dumps(marks))
+"""
+
+
+def generate_catalog(n, seed=42) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    weights = [c[3] for c in KERALA_CITIES]
+    access_values = [a for a, _ in ACCESS_TYPES]
+    access_weights = [w for _, w in ACCESS_TYPES]
+    for i in range(n):
+        if rng.random() < RURAL_SHARE:
+            lat = rng.uniform(KERALA_BOUNDS[0], KERALA_BOUNDS[1])
+            lon = rng.uniform(KERALA_BOUNDS[2], KERALA_BOUNDS[3])
+            city = "Kerala"
+        else:
+            city, c_lat, c_lon, _, spread = rng.choices(KERALA_CITIES, weights)[0]
+            lat = rng.gauss(c_lat, spread)
+            lon = rng.gauss(c_lon, spread)
+        access_type = rng.choices(access_values, access_weights)[0]
+        total_slots = rng.randint(1, 8)
+        yield {
+            "id": 100000 + i,
+            "name": f"Station {i} - {city}",
+            "address": f"{rng.randint(1, 999)} Main Road, {city}",
+            "latitude": lat,
+            "longitude": lon,
+            "total_slots": total_slots,
+            "available_slots": rng.randint(0, total_slots),
+            "power_types": rng.choice(CONNECTOR_MIXES),
+            "max_power": rng.choice([7, 22, 50, 150, 250]),
+            "price_per_kwh": round(rng.uniform(0.12, 0.40), 2),
+            "status": "open" if rng.random() < 0.95 else "closed",
+            "access_type": access_type,
+            "owner_type": "provider" if access_type == "provider" else "commercial",
+            "operating_hours": rng.choice(OPERATING_HOURS),
+        }
+
+
+def generate_origins(n, seed=7):
+    rng = random.Random(seed)
+    return [(rng.gauss(c[1], c[4]), rng.gauss(c[2], c[4]))
+            for c in rng.choices(KERALA_CITIES, [c[3] for c in KERALA_CITIES], k=n)]
+
+
+def summarize(samples) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 4),
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_load(stations):
+    engine = StationEngine()
+    elapsed, _ = timed(engine.load, stations)
+    return engine, {"load_all_stations": summarize([elapsed])}
+
+
+def bench_search(engine, origins):
+    samples = {r: [] for r in SEARCH_RADII}
+    results = []
+    for lat, lon in origins:
+        for radius in SEARCH_RADII:
+            elapsed, found = timed(engine.radius_query, lat, lon, radius)
+            samples[radius].append(elapsed)
+            if radius == 25:
+                results.append(found)
+    stages = {f"radius_search_{r}km": summarize(s) for r, s in samples.items()}
+    return results, stages
+
+
+def bench_nearest(engine, origins, k=10):
+    """Top-k query with filters, against the radius search + filter + sort it replaces"""
+    samples = [timed(engine.nearest, lat, lon, k, "public", "CCS", 50)[0] for lat, lon in origins]
+    return {f"nearest_{k}": summarize(samples)}
+
+
+def bench_cached_search(engine, origins, repeats=5):
+    """Repeated searches from a few popular origins, answered from the query cache after the first"""
+    queries = [(lat, lon, 25, access_type, power_type)
+               for lat, lon in origins[:10] for access_type, power_type in (("all", "all"), ("public", "CCS"))]
+    for query in queries:
+        engine.search_rows(*query)
+    samples = [timed(engine.search_rows, *query)[0] for _ in range(repeats) for query in queries]
+    return {"search_cached": summarize(samples), "query_cache": engine.query_cache.stats()}
+
+
+def bench_text(engine, origins, limit=20):
+    """Text index build, then name/address searches as typed: exact, misspelt, half-typed and within a radius"""
+    build, _ = timed(engine.sync_text_index)
+    rng = random.Random(11)
+    queries = []
+    for city, *_ in KERALA_CITIES:
+        word = city.lower()
+        typo = rng.randrange(1, len(word) - 1)
+        queries.append(("exact", f"{rng.randint(1, 999)} main road {word}"))
+        queries.append(("fuzzy", f"main road {word[:typo]}{word[typo + 1:]}"))
+        queries.append(("prefix", f"station {word[:3]}"))
+    samples = {"exact": [], "fuzzy": [], "prefix": [], "radius": []}
+    suggest = []
+    for i, (lat, lon) in enumerate(origins):
+        kind, query = queries[i % len(queries)]
+        samples[kind].append(timed(engine.text_rows, query, lat, lon, None, "all", "all", None, limit)[0])
+        samples["radius"].append(timed(engine.text_rows, query, lat, lon, 25)[0])
+        suggest.append(timed(engine.suggest, query)[0])
+    stages = {"text_index_build": summarize([build]), "text_suggest": summarize(suggest)}
+    stages.update({f"text_search_{kind}": summarize(s) for kind, s in samples.items()})
+    return stages
+
+
+def bench_filters(engine, results):
+    samples = []
+    open_samples = []
+    combos = [("public", "CCS"), ("provider", "all"), ("all", "CHAdeMO"), ("private", "Type 2")]
+    for i, ((rows, _), (access_type, power_type)) in enumerate(zip(results, combos * len(results))):
+        elapsed, _ = timed(engine.matches, rows, access_type, power_type)
+        samples.append(elapsed)
+        # "Open at" a different minute of the week each time
+        elapsed, _ = timed(engine.matches, rows, access_type, power_type, None, None, i * 997 % 10080)
+        open_samples.append(elapsed)
+    return {"apply_filters": summarize(samples), "apply_filters_open_at": summarize(open_samples)}
+
+
+def bench_estimate(engine, results):
+    """Charging estimates for a vehicle over each result set, then re-ranking as the profile changes"""
+    profiles = [VehicleProfile(60, soc, 80, max_kw, ("Type 2", "CCS")) for soc, max_kw in ((20, 100), (40, 50), (10, 150))]
+    first, rerank = [], []
+    for rows, distances in results:
+        start = time.perf_counter()
+        estimator = ChargeEstimator(engine, rows, distances)
+        estimator.rank(profiles[0], "score")
+        first.append(time.perf_counter() - start)
+        for profile, by in zip(profiles[1:], ("cost", "time")):
+            rerank.append(timed(estimator.rank, profile, by)[0])
+    return {"charge_estimate": summarize(first), "charge_rerank": summarize(rerank)}
+
+
+def bench_materialize(engine, results):
+    samples = [timed(engine.materialize, rows, distances)[0] for rows, distances in results]
+    return {"materialize_results": summarize(samples)}
+
+
+def start_virtual_display():
+    """Start Xvfb when there is no display; returns the process to terminate, if any"""
+    if os.environ.get('DISPLAY') or not shutil.which('Xvfb'):
+        return None
+    display = ':99'
+    process = subprocess.Popen(['Xvfb', display, '-screen', '0', '1280x1024x24'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = display
+    time.sleep(0.5)
+    return process
+
+
+def bench_display(engine, results):
+    """Time VirtualResultsList.set_items on a real (or Xvfb) Tk display, if one can be had"""
+    xvfb = start_virtual_display()
+    try:
+        return _bench_display(engine, results)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+            del os.environ['DISPLAY']
+
+
+def _bench_display(engine, results):
+    try:
+        import tkinter as tk
+        from ev_charging_with_providers import EVChargingWithProviders, VirtualResultsList
+        root = tk.Tk()
+    except Exception as e:
+        return {"display_results": {"skipped": f"no display: {e}"}}
+
+    try:
+        root.geometry("1250x850")
+        app = EVChargingWithProviders.__new__(EVChargingWithProviders)
+        app.setup_styles()
+        results_list = VirtualResultsList(root, app.colors, app.fonts)
+        root.update()
+        samples = []
+        for rows, distances in results[:20]:
+            stations = engine.materialize(rows, distances)
+            start = time.perf_counter()
+            results_list.set_items(stations)
+            root.update_idletasks()
+            samples.append(time.perf_counter() - start)
+        return {"display_results": summarize(samples)}
+    finally:
+        root.destroy()
+
+
+def bench_map(engine, origins):
+    cache_dir = tempfile.mkdtemp(prefix='ev_bench_maps_')
+    try:
+        cache = MapCache(cache_dir)
+        lat, lon = origins[0]
+        stations = engine.materialize(*engine.radius_query(lat, lon, 25))
+        cold, _ = timed(render_map, stations, lat, lon, cache)
+        warm, path = timed(render_map, stations, lat, lon, cache)
+        return {
+            "show_map_render": dict(summarize([cold]), stations=len(stations), html_bytes=os.path.getsize(path)),
+            "show_map_cached": summarize([warm]),
+        }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def bench_registration(engine, n_existing, registrations=200, batch_size=100):
+    work_dir = tempfile.mkdtemp(prefix='ev_bench_store_')
+    try:
+        store = SQLiteProviderStore(os.path.join(work_dir, 'providers.db'))
+        with store.conn:
+            store.conn.executemany("INSERT INTO providers (id, data) VALUES (?, ?)",
+                                   ((s['id'], json.dumps(s)) for s in generate_catalog(n_existing, seed=3)))
+        samples = []
+        for station in generate_catalog(registrations, seed=4):
+            provider = dict(station, status="available")
+            start = time.perf_counter()
+            register_providers([provider], store, engine)
+            samples.append(time.perf_counter() - start)
+        batch_samples = []
+        for i in range(5):
+            batch = [dict(s, status="available") for s in generate_catalog(batch_size, seed=5 + i)]
+            start = time.perf_counter()
+            register_providers(batch, store, engine)
+            batch_samples.append(time.perf_counter() - start)
+        store.close()
+        return {"register_provider": summarize(samples), f"register_batch_{batch_size}": summarize(batch_samples)}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def deep_size(objects) -> int:
+    """Bytes held by objects and everything they reference, counting shared objects once"""
+    seen = set()
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif hasattr(obj, '__slots__'):
+            stack.extend(getattr(obj, name) for name in obj.__slots__)
+    return total
+
+
+def bench_memory(n):
+    """Catalog memory per station as plain dicts vs StationRecords.
+
+    Stations go through a JSON round trip first, as they would when imported,
+    so repeated strings are separate objects unless the representation interns them.
+    """
+    dicts = [json.loads(json.dumps(s)) for s in generate_catalog(n)]
+    dict_bytes = deep_size(dicts)
+    records = [StationRecord.from_dict(s) for s in dicts]
+    del dicts
+    record_bytes = deep_size(records)
+    return {"station_memory": {"dict_bytes_per_station": round(dict_bytes / n, 1),
+                               "record_bytes_per_station": round(record_bytes / n, 1)}}
+
+
+def bench_startup(n, runs=STARTUP_RUNS):
+    """Cold start of the GUI with an n-station dataset: import, first paint, first results, full catalog"""
+    xvfb = start_virtual_display()
+    workdir = tempfile.mkdtemp(prefix="ev_startup_")
+    try:
+        dataset = os.path.join(workdir, "stations.jsonl")
+        with open(dataset, 'w') as f:
+            for station in generate_catalog(n):
+                f.write(json.dumps(station) + "\n")
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [app_dir, os.environ.get('PYTHONPATH')])))
+        samples: Dict[str, list] = {}
+        error = None
+        for _ in range(runs):
+            # A fresh working directory each run, so there is no provider store to reuse
+            run_dir = tempfile.mkdtemp(dir=workdir)
+            out = subprocess.run([sys.executable, "-c", STARTUP_PROBE, dataset], cwd=run_dir, env=env,
+                                 capture_output=True, text=True, timeout=600)
+            if out.returncode:
+                raise RuntimeError(f"startup probe failed: {out.stderr.strip()}")
+            marks = json.loads(out.stdout.strip().splitlines()[-1])
+            error = marks.pop("error", None)
+            for name, seconds in marks.items():
+                samples.setdefault(name, []).append(seconds)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if xvfb:
+            xvfb.terminate()
+            del os.environ['DISPLAY']
+
+    stages = {}
+    for name in ("import_app", "first_paint", "first_results", "catalog_loaded"):
+        if name not in samples:
+            stages[f"startup_{name}"] = {"skipped": f"no display: {error}"}
+            continue
+        stats = summarize(samples[name])
+        if name in STARTUP_BUDGETS:
+            stats["budget_ms"] = STARTUP_BUDGETS[name] * 1000
+            stats["over_budget"] = stats["p50_ms"] > stats["budget_ms"]
+        stages[f"startup_{name}"] = stats
+    return stages
+
+
+def bench_snapshot(n, origin, runs=STARTUP_RUNS):
+    """Catalog ready for a first search: importing an n-station dataset (cold) vs mapping its snapshot (warm)"""
+    workdir = tempfile.mkdtemp(prefix="ev_snapshot_")
+    try:
+        dataset = os.path.join(workdir, "stations.jsonl")
+        with open(dataset, 'w') as f:
+            for station in generate_catalog(n):
+                f.write(json.dumps(station) + "\n")
+        store = SQLiteProviderStore(os.path.join(workdir, "providers.db"))
+        snapshot = os.path.join(workdir, "catalog.snap")
+
+        def cold():
+            engine = build_engine(datasets=[dataset], store=store)
+            engine.search(*origin, 25)
+            return engine
+
+        cold_s, engine = timed(cold)
+        save_s, _ = timed(save_snapshot, engine, snapshot, catalog_signature(PUBLIC_STATIONS, [], [dataset]))
+        del engine
+        load_samples, start_samples = [], []
+        for _ in range(runs):
+            load_s, (engine, _) = timed(load_catalog, snapshot, PUBLIC_STATIONS, [], [dataset])
+            # The first search also builds the records it returns from the snapshot
+            search_s, _ = timed(engine.search, *origin, 25)
+            load_samples.append(load_s)
+            start_samples.append(load_s + search_s)
+            del engine
+        stages = {
+            "catalog_cold_start": summarize([cold_s]),
+            "snapshot_save": summarize([save_s]),
+            "snapshot_load": summarize(load_samples),
+            "catalog_warm_start": summarize(start_samples),
+            "snapshot_size": {"bytes_per_station": round(os.path.getsize(snapshot) / n, 1)},
+        }
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return stages
+
+
+def bench_sharded(engine, n_origins=20000, k=5, radius=50):
+    """Nearest-k for a batch of origins: one engine in this process vs ShardedSearch at 1..CPU shards"""
+    origins = generate_origins(n_origins, seed=11)
+    lats = [lat for lat, _ in origins]
+    lons = [lon for _, lon in origins]
+    # Cached results would flatter the single engine
+    engine.query_cache.clear()
+    max_entries, engine.query_cache.max_entries = engine.query_cache.max_entries, 0
+    try:
+        elapsed, _ = timed(lambda: [engine.search_rows(lat, lon, radius, k=k) for lat, lon in origins])
+    finally:
+        engine.query_cache.max_entries = max_entries
+    stages = {"batch_nearest_engine": dict(summarize([elapsed]), origins_per_sec=round(n_origins / elapsed))}
+    cpus = os.cpu_count() or 1
+    for shards in sorted({1, min(2, cpus), cpus}):
+        with ShardedSearch(engine, shards) as sharded:
+            elapsed, _ = timed(sharded.search_batch, lats, lons, radius, "all", "all", k)
+        stages[f"batch_nearest_sharded_{shards}"] = dict(summarize([elapsed]),
+                                                         origins_per_sec=round(n_origins / elapsed))
+    return stages
+
+
+def run_size(n, n_queries, include_display=True, include_memory=False, include_startup=False,
+             include_snapshot=False, include_sharded=False) -> Dict:
+    stations = list(generate_catalog(n))
+    origins = generate_origins(n_queries)
+
+    engine, stages = bench_load(stations)
+    results, search_stages = bench_search(engine, origins)
+    stages.update(search_stages)
+    stages.update(bench_nearest(engine, origins))
+    stages.update(bench_cached_search(engine, origins))
+    stages.update(bench_text(engine, origins))
+    stages.update(bench_filters(engine, results))
+    stages.update(bench_estimate(engine, results))
+    stages.update(bench_materialize(engine, results))
+    if include_display:
+        stages.update(bench_display(engine, results))
+    stages.update(bench_map(engine, origins))
+    stages.update(bench_registration(engine, n))
+    if include_memory:
+        stages.update(bench_memory(n))
+    if include_startup:
+        stages.update(bench_startup(n))
+    if include_snapshot:
+        stages.update(bench_snapshot(n, origins[0]))
+    if include_sharded:
+        stages.update(bench_sharded(engine))
+    return stages
+
+
+def version_label():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def compare(current, previous_path):
+    with open(previous_path, 'r') as f:
+        previous = json.load(f)
+    before = {(r["size"], r["stage"]): r for r in previous["results"]}
+    print(f"\nvs {previous_path} ({previous.get('version', '?')}):")
+    for row in current["results"]:
+        old = before.get((row["size"], row["stage"]))
+        if not old or "p50_ms" not in old or "p50_ms" not in row or not old["p50_ms"]:
+            continue
+        ratio = row["p50_ms"] / old["p50_ms"]
+        flag = "  REGRESSION" if ratio > 1.2 else ""
+        print(f"  {row['size']:>8} {row['stage']:<24} {old['p50_ms']:>10.3f} -> {row['p50_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the station finder on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=100, help="search origins per size")
+    parser.add_argument("--no-display", action="store_true", help="skip the Tk rendering benchmark")
+    parser.add_argument("--memory", action="store_true", help="also measure catalog memory per station (slow)")
+    parser.add_argument("--startup", action="store_true", help="also time GUI cold start with each size as a dataset")
+    parser.add_argument("--snapshot", action="store_true", help="also time dataset import vs binary snapshot load")
+    parser.add_argument("--sharded", action="store_true", help="also time batch nearest-k over shard processes")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    report = {
+        "version": version_label(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for n in args.sizes:
+        print(f"Benchmarking {n:,} stations...", file=sys.stderr)
+        for stage, stats in run_size(n, args.queries, not args.no_display, args.memory, args.startup,
+                                    args.snapshot, args.sharded).items():
+            report["results"].append(dict(size=n, stage=stage, **stats))
+            if "p50_ms" in stats:
+                over = f"   OVER BUDGET ({stats['budget_ms']:.0f} ms)" if stats.get("over_budget") else ""
+                print(f"  {stage:<24} p50 {stats['p50_ms']:>10.3f} ms   p95 {stats['p95_ms']:>10.3f} ms{over}", file=sys.stderr)
+            else:
+                print(f"  {stage:<24} {stats}", file=sys.stderr)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+"""Binary catalog snapshots for warm starts.
+
+Importing a large dataset means parsing every row, building a record for it
+and inserting it into the grid and bitmap indexes. A snapshot stores the
+result of all that: fixed-width numeric columns, a string table, the grid
+index's cells and the filter bitmaps, each as a 64-byte aligned array. Loading
+one maps the file and wraps the arrays in place; station records are only
+built, from the columns and string table, when a search first returns them.
+
+The file is mapped copy-on-write: live availability changes write to private
+pages and never reach the file, and a snapshot replaced on disk by another
+process doesn't disturb one already mapped.
+
+Layout (little-endian):
+    0   magic b'EVCATSNP'
+    8   format version, uint32
+    16  header offset, uint64
+    24  header length, uint64
+    64  sections, each 64-byte aligned
+        header (JSON): station count, catalog signature, section table, bitmap list
+
+Each snapshot records a signature of what it was built from: the built-in
+stations, the registered providers and the dataset files (path, size,
+mtime). load_catalog only uses a snapshot whose signature still matches,
+except that providers registered since it was written are added on top,
+since provider ids only grow.
+
+    python catalog_snapshot.py build catalog.snap --dataset ocm_india.json
+    python catalog_snapshot.py info catalog.snap
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from filter_index import BitmapIndex
+from instrumentation import METRICS
+from spatial_index import GridIndex
+from station_columns import StationColumns
+from station_import import MAPPING_VERSION
+from station_record import StationRecord
+
+MAGIC = b'EVCATSNP'
+FORMAT_VERSION = 1
+PREFIX = struct.Struct('<8sIxxxxQQ')
+ALIGN = 64
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'ev_charging', 'catalog.snap')
+
+# Marks a station whose id is a string (stored in id_str) rather than an integer
+STRING_ID = np.iinfo(np.int64).min
+NO_STRING = -1
+# Set in 'flags' when max_power was an integer, so records round-trip unchanged
+INT_MAX_POWER = 1
+
+STRING_FIELDS = ('name', 'address', 'status', 'access_type', 'owner_type', 'operating_hours')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _digest(items) -> str:
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(json.dumps(item, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def catalog_signature(builtin, providers, dataset_files) -> Dict:
+    """What a catalog was built from; providers are compared in id order"""
+    datasets = []
+    for path in dataset_files:
+        stat = os.stat(path)
+        datasets.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    providers = sorted(providers, key=lambda p: p["id"])
+    return {"builtin": _digest(builtin), "datasets": datasets, "import_mapping": MAPPING_VERSION,
+            "providers": len(providers), "providers_digest": _digest(providers)}
+
+
+class StringTable:
+    def __init__(self):
+        self.refs: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def ref(self, value) -> int:
+        if value is None:
+            return NO_STRING
+        ref = self.refs.get(value)
+        if ref is None:
+            ref = self.refs[value] = len(self.strings)
+            self.strings.append(value)
+        return ref
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [s.encode('utf-8') for s in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+@METRICS.instrument('snapshot_save')
+def save_snapshot(engine, path, signature):
+    """Write engine's catalog to path atomically"""
+    n = len(engine)
+    strings = StringTable()
+    combos: Dict[Tuple[str, ...], int] = {}
+    combo_items: List[List[int]] = []
+    latitude = np.empty(n, dtype=np.float64)
+    longitude = np.empty(n, dtype=np.float64)
+    id_int = np.empty(n, dtype=np.int64)
+    id_str = np.full(n, NO_STRING, dtype=np.int32)
+    flags = np.zeros(n, dtype=np.uint8)
+    power = np.empty(n, dtype=np.int32)
+    refs = {field: np.empty(n, dtype=np.int32) for field in STRING_FIELDS}
+    extra = np.full(n, NO_STRING, dtype=np.int32)
+
+    for row, station in enumerate(engine.stations):
+        latitude[row] = station.latitude
+        longitude[row] = station.longitude
+        if type(station.id) is int:
+            id_int[row] = station.id
+        elif type(station.id) is str:
+            id_int[row] = STRING_ID
+            id_str[row] = strings.ref(station.id)
+        else:
+            # Anything else would come back as a string and stop matching live updates and registrations
+            raise SnapshotError(f"Station id {station.id!r} is neither an int nor a str")
+        if type(station.max_power) is int:
+            flags[row] = INT_MAX_POWER
+        combo = combos.get(station.power_types)
+        if combo is None:
+            combo = combos[station.power_types] = len(combo_items)
+            combo_items.append([strings.ref(p) for p in station.power_types])
+        power[row] = combo
+        for field in STRING_FIELDS:
+            refs[field][row] = strings.ref(getattr(station, field))
+        if station.extra:
+            extra[row] = strings.ref(json.dumps(station.extra))
+
+    string_offsets, string_data = strings.arrays()
+    combo_offsets = np.zeros(len(combo_items) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in combo_items], out=combo_offsets[1:])
+    cells = sorted(engine.station_index.cells.items())
+    cell_offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum([len(rows) for _, rows in cells], out=cell_offsets[1:])
+
+    columns = engine.station_columns
+    sections = {
+        "latitude": latitude, "longitude": longitude, "id_int": id_int, "id_str": id_str,
+        "flags": flags, "power_combo": power, "extra": extra,
+        "string_offsets": string_offsets, "string_data": string_data,
+        "combo_offsets": combo_offsets,
+        "combo_items": np.array([r for c in combo_items for r in c], dtype=np.int32),
+        "cell_keys": np.array([key for key, _ in cells], dtype=np.int32).reshape(-1, 2),
+        "cell_offsets": cell_offsets,
+        "cell_items": np.concatenate([np.asarray(rows, dtype=np.int32) for _, rows in cells] or
+                                     [np.empty(0, dtype=np.int32)]),
+    }
+    for field in STRING_FIELDS:
+        sections[f"ref_{field}"] = refs[field]
+    for name in StationColumns.FIELDS:
+        sections[f"column_{name}"] = getattr(columns, name)
+    masks = []
+    for i, ((field, value), mask) in enumerate(sorted(engine.filter_index.masks.items())):
+        sections[f"mask_{i}"] = mask[:n]
+        masks.append([field, value, f"mask_{i}"])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'\0' * ALIGN)
+            table = {}
+            for name, array in sections.items():
+                offset = -f.tell() % ALIGN
+                f.write(b'\0' * offset)
+                table[name] = [f.tell(), array.dtype.str, list(array.shape)]
+                f.write(np.ascontiguousarray(array).tobytes())
+            header = json.dumps({"count": n, "signature": signature, "created": time.time(),
+                                 "cell_size": engine.station_index.lat_size,
+                                 "sections": table, "masks": masks}).encode()
+            header_offset = f.tell()
+            f.write(header)
+            f.seek(0)
+            f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, header_offset, len(header)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class Snapshot:
+    """A mapped snapshot file: its header and its sections as arrays over the mapping"""
+
+    def __init__(self, path):
+        try:
+            with open(path, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Could not map {path}: {e}")
+        if len(self.map) < PREFIX.size:
+            raise SnapshotError(f"{path} is not a catalog snapshot")
+        magic, version, header_offset, header_length = PREFIX.unpack_from(self.map)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a catalog snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} has snapshot format {version}, expected {FORMAT_VERSION}")
+        try:
+            self.header = json.loads(self.map[header_offset:header_offset + header_length])
+            self.count = self.header["count"]
+            self.arrays = {name: self._section(offset, dtype, shape)
+                           for name, (offset, dtype, shape) in self.header["sections"].items()}
+        except (ValueError, KeyError, TypeError) as e:
+            raise SnapshotError(f"{path} is damaged: {e}")
+
+    def _section(self, offset, dtype, shape):
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        if offset + count * dtype.itemsize > len(self.map):
+            raise ValueError("section runs past the end of the file")
+        return np.frombuffer(self.map, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+    def string(self, ref) -> Optional[str]:
+        if ref == NO_STRING:
+            return None
+        return self.strings([ref])[0]
+
+    def strings(self, refs) -> List[str]:
+        """Decode the given (valid) string refs, straight from the mapping"""
+        offsets = self.arrays["string_offsets"]
+        base = self.header["sections"]["string_data"][0]
+        starts = (offsets[refs] + base).tolist()
+        ends = (offsets[np.asarray(refs) + 1] + base).tolist()
+        data = self.map
+        return [data[start:end].decode('utf-8') for start, end in zip(starts, ends)]
+
+
+class MappedGridIndex(GridIndex):
+    """A GridIndex whose cells are slices of the snapshot's cell_items, read in place.
+
+    A cell becomes an ordinary list the first time a station is added to or
+    removed from it.
+    """
+
+    def __init__(self, cell_size, keys, offsets, items):
+        super().__init__(cell_size)
+        bounds = offsets.tolist()
+        self.cells = {(r, c): items[bounds[i]:bounds[i + 1]] for i, (r, c) in enumerate(keys.tolist())}
+        self.count = len(items)
+
+    def insert(self, key, lat, lon):
+        self._own((self._row(lat), self._col(lon)))
+        super().insert(key, lat, lon)
+
+    def remove(self, key, lat, lon):
+        self._own((self._row(lat), self._col(lon)))
+        super().remove(key, lat, lon)
+
+    def _own(self, cell):
+        bucket = self.cells.get(cell)
+        if bucket is not None and not isinstance(bucket, list):
+            self.cells[cell] = bucket.tolist()
+
+    def _gather(self, buckets) -> np.ndarray:
+        arrays = [np.asarray(bucket, dtype=np.intp) for bucket in buckets]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.intp)
+
+
+class SnapshotStations:
+    """The station list of a snapshot-backed engine.
+
+    Records are built from the snapshot the first time a row is read and kept,
+    so every reader of a row sees (and live updates modify) the same record.
+    Stations added after loading are ordinary records appended at the end.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.count = snapshot.count
+        self.records: Dict[int, StationRecord] = {}
+        self.added: List[StationRecord] = []
+        a = snapshot.arrays
+        # Per-row columns as plain arrays; categorical strings and connector lists are decoded once
+        self.latitude, self.longitude = a["latitude"], a["longitude"]
+        self.id_int, self.id_str, self.flags = a["id_int"], a["id_str"], a["flags"]
+        self.available_slots = a["column_available_slots"]
+        self.total_slots = a["column_total_slots"]
+        self.max_power = a["column_max_power"]
+        self.price = a["column_price_per_kwh"]
+        self.refs = [a[f"ref_{field}"] for field in STRING_FIELDS]
+        self.power_combo = a["power_combo"]
+        self.extra = a["extra"]
+        self.strings: Dict[int, Optional[str]] = {NO_STRING: None}
+        offsets, items = a["combo_offsets"], a["combo_items"]
+        self.combos = [tuple(snapshot.string(r) for r in items[offsets[i]:offsets[i + 1]])
+                       for i in range(len(offsets) - 1)]
+
+    def __len__(self):
+        return self.count + len(self.added)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if row >= self.count:
+            return self.added[row - self.count]
+        record = self.records.get(row)
+        if record is None:
+            self._build([row])
+            record = self.records[row]
+        return record
+
+    def take(self, rows) -> List[StationRecord]:
+        """The records at rows (a list), building the missing ones in one pass"""
+        records = self.records
+        missing = [row for row in rows if row < self.count and row not in records]
+        if missing:
+            self._build(missing)
+        return [records[row] if row < self.count else self.added[row - self.count] for row in rows]
+
+    def append(self, station):
+        self.added.append(station)
+
+    def _strings(self, refs) -> List[Optional[str]]:
+        """Categorical values for an array of refs; each distinct value is decoded once and kept"""
+        known = self.strings
+        for ref in np.unique(refs).tolist():
+            if ref not in known:
+                known[ref] = self.snapshot.string(ref)
+        return list(map(known.__getitem__, refs.tolist()))
+
+    def _build(self, rows):
+        """Build and keep the records for rows, gathering each column once"""
+        index = np.asarray(rows, dtype=np.intp)
+        snapshot = self.snapshot
+        ids = self.id_int[index].tolist()
+        for i in np.flatnonzero(self.id_int[index] == STRING_ID).tolist():
+            ids[i] = snapshot.string(int(self.id_str[rows[i]]))
+        names = snapshot.strings(self.refs[0][index])
+        addresses = snapshot.strings(self.refs[1][index])
+        categorical = [self._strings(refs[index]) for refs in self.refs[2:]]
+        int_power = (self.flags[index] & INT_MAX_POWER).astype(bool).tolist()
+        extras = self.extra[index].tolist()
+        columns = zip(rows, ids, names, addresses, self.latitude[index].tolist(), self.longitude[index].tolist(),
+                      self.total_slots[index].tolist(), self.available_slots[index].tolist(),
+                      self.power_combo[index].tolist(), self.max_power[index].tolist(), int_power,
+                      self.price[index].tolist(), *categorical, extras)
+        for (row, station_id, name, address, lat, lon, total, available, combo, max_power, is_int,
+             price, status, access_type, owner_type, hours, extra) in columns:
+            self.records[row] = StationRecord(
+                station_id, name, address, lat, lon, total, available, self.combos[combo],
+                int(max_power) if is_int else max_power, None if price != price else price,
+                status, access_type, owner_type, hours,
+                json.loads(snapshot.string(extra)) if extra != NO_STRING else None)
+
+    def texts(self, start, stop) -> List[str]:
+        """"name address" of rows start to stop, for the text index, without building records"""
+        end = min(stop, self.count)
+        texts = []
+        if start < end:
+            names = self.snapshot.strings(self.refs[0][start:end])
+            addresses = self.snapshot.strings(self.refs[1][start:end])
+            texts = [f"{name} {address}" for name, address in zip(names, addresses)]
+        if stop > self.count:
+            texts += [f"{s.name} {s.address}" for s in self.added[max(start - self.count, 0):stop - self.count]]
+        return texts
+
+    def ids(self):
+        """Every station id in row order, without building records"""
+        ids = self.id_int.tolist()
+        for row in np.flatnonzero(self.id_int == STRING_ID).tolist():
+            ids[row] = self.snapshot.string(int(self.id_str[row]))
+        return ids + [s.id for s in self.added]
+
+
+@METRICS.instrument('snapshot_load')
+def load_snapshot(path):
+    """A StationEngine over the snapshot at path, and the snapshot's header"""
+    snapshot = Snapshot(path)
+    return snapshot_engine(snapshot, path), snapshot.header
+
+
+def snapshot_engine(snapshot: Snapshot, path):
+    """A StationEngine reading its catalog from an open snapshot"""
+    from station_engine import StationEngine
+
+    engine = StationEngine()
+    n = snapshot.count
+    if n == 0:
+        return engine
+    a = snapshot.arrays
+    try:
+        engine.stations = SnapshotStations(snapshot)
+        engine.station_index = MappedGridIndex(snapshot.header["cell_size"], a["cell_keys"], a["cell_offsets"],
+                                               a["cell_items"])
+
+        columns = StationColumns()
+        columns._data = {name: a[f"column_{name}"] for name in StationColumns.FIELDS}
+        columns.size = n
+        engine.station_columns = columns
+
+        bitmaps = BitmapIndex(capacity=n)
+        bitmaps.masks = {(field, value): a[section] for field, value, section in snapshot.header["masks"]}
+        bitmaps.size = n
+        engine.filter_index = bitmaps
+
+        # A catalog has a handful of distinct hours strings; parse each once
+        refs, inverse = np.unique(a["ref_operating_hours"], return_inverse=True)
+        engine.hours_index.assign([snapshot.string(ref) for ref in refs.tolist()], inverse)
+        # Only provider records carry tariffs, in their extra fields
+        engine.tariff_index.reset(n)
+        for row in np.flatnonzero(a["extra"] != NO_STRING).tolist():
+            engine.tariff_index.add(row, json.loads(snapshot.string(int(a["extra"][row]))))
+    except (KeyError, TypeError, ValueError) as e:
+        raise SnapshotError(f"{path} is damaged: {e}")
+    # Station ids are only needed for live updates and registrations; map them on first use
+    engine._row_by_id = None
+    return engine
+
+
+def load_catalog(path, builtin, providers, dataset_files) -> Optional[Tuple[object, List[Dict]]]:
+    """Engine from the snapshot at path if it was built from the same inputs, and the providers added on top.
+
+    Providers registered since the snapshot was written are added to the
+    engine; any other difference (datasets, built-in stations, changed or
+    removed providers) returns None so the caller rebuilds from source.
+    """
+    from station_engine import provider_to_station
+
+    if not os.path.exists(path):
+        return None
+    # Only the header is read before the signature check, so a stale snapshot costs next to nothing
+    snapshot = Snapshot(path)
+    saved = snapshot.header.get("signature", {})
+    current = catalog_signature(builtin, providers, dataset_files)
+    if not isinstance(saved, dict) or any(saved.get(key) != current[key]
+                                          for key in ("builtin", "datasets", "import_mapping")):
+        return None
+    providers = sorted(providers, key=lambda p: p["id"])
+    known = saved.get("providers", -1)
+    if not isinstance(known, int) or not 0 <= known <= len(providers) \
+            or _digest(providers[:known]) != saved.get("providers_digest"):
+        return None
+    with METRICS.timer('snapshot_load'):
+        engine = snapshot_engine(snapshot, path)
+    added = providers[known:]
+    for provider in added:
+        engine.add_station(provider_to_station(provider))
+    return engine, added
+
+
+def main(argv=None):
+    from provider_store import open_provider_store
+    from station_engine import PUBLIC_STATIONS, build_engine
+
+    parser = argparse.ArgumentParser(description="Build or inspect a binary catalog snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the catalog from source and write a snapshot")
+    build.add_argument("snapshot")
+    build.add_argument("--providers", default="providers.db", help="provider store (.db, or legacy .json)")
+    build.add_argument("--dataset", action="append", default=[], help="external station dataset to import (repeatable)")
+    info = sub.add_parser("info", help="print a snapshot's header")
+    info.add_argument("snapshot")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        try:
+            header = Snapshot(args.snapshot).header
+        except SnapshotError as e:
+            sys.exit(str(e))
+        summary = {k: v for k, v in header.items() if k not in ("sections", "masks")}
+        summary["bitmaps"] = len(header["masks"])
+        print(json.dumps(summary, indent=2))
+        return
+
+    store = open_provider_store(args.providers)
+    try:
+        engine = build_engine(datasets=args.dataset, store=store)
+        signature = catalog_signature(PUBLIC_STATIONS, store.load_all(), args.dataset)
+    finally:
+        store.close()
+    save_snapshot(engine, args.snapshot, signature)
+    print(f"Wrote {len(engine)} stations to {args.snapshot}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
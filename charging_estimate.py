@@ -0,0 +1,335 @@
+"""Charging cost and time estimates for a vehicle across candidate stations.
+
+A VehicleProfile (battery size, current and target state of charge, the most
+power the car accepts, its connectors) is estimated against every candidate
+station of a search in one numpy pass:
+
+  * Power: a station delivers its max_power through DC connectors (CCS,
+    CHAdeMO) but at most AC_MAX_KW through AC ones (Type 1, Type 2); the car
+    takes at most max_kw on DC and ac_kw on AC. Above TAPER_SOC, DC power
+    falls linearly to TAPER_FLOOR of its peak at 100%, as battery charge
+    curves do. Stations without a usable connector, or without a known
+    max_power, get no estimate (NaN) and rank last.
+  * Cost follows the station's pricing_model: per_kwh (the default, on the
+    energy drawn including CHARGE_EFFICIENCY losses), per_hour / per_minute
+    (price_per_kwh then holds the rate for that unit of time), per_session
+    (a flat price) or free.
+  * time_limits ("2_hours", "45 min", "no_limit") caps the session; a capped
+    session reports the charge it reaches and is flagged truncated.
+
+Pricing model and time limit only exist on provider records, so TariffIndex
+keeps one small tariff id per row and the (model, limit) table, parsed once
+per distinct pair. ChargeEstimator gathers the candidates' columns once per
+result set, so re-estimating and re-ranking as the profile is edited is
+pure array arithmetic.
+"""
+import math
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+AC_CONNECTORS = frozenset(("Type 1", "Type 2"))
+AC_MAX_KW = 22.0
+DEFAULT_AC_KW = 11.0
+CHARGE_EFFICIENCY = 0.9
+TAPER_SOC = 0.8
+TAPER_FLOOR = 0.3
+# Value of an hour spent charging or driving, in the price currency, for the "score" ranking
+VALUE_OF_TIME_PER_HOUR = 5.0
+DRIVE_SPEED_KMH = 40.0
+
+PER_KWH, PER_HOUR, PER_MINUTE, PER_SESSION, FREE = range(5)
+PRICING_MODELS = {
+    "per_kwh": PER_KWH, "kwh": PER_KWH, "per_unit": PER_KWH, "energy": PER_KWH,
+    "per_hour": PER_HOUR, "per_hr": PER_HOUR, "hourly": PER_HOUR, "time": PER_HOUR,
+    "per_minute": PER_MINUTE, "per_min": PER_MINUTE,
+    "per_session": PER_SESSION, "session": PER_SESSION, "flat": PER_SESSION, "flat_rate": PER_SESSION,
+    "free": FREE,
+}
+# time_limits meaning no limit, with separators removed
+NO_LIMIT = frozenset(("", "nolimit", "nolimits", "none", "unlimited", "no", "na", "unknown"))
+DURATION = re.compile(r'(\d+(?:\.\d+)?)_?(hours|hour|hrs|hr|h|minutes|minute|mins|min|m)')
+RANKINGS = ("distance", "cost", "time", "score")
+
+
+class TariffError(ValueError):
+    pass
+
+
+class VehicleError(ValueError):
+    pass
+
+
+def _key(text) -> str:
+    return re.sub(r'[\s\-/]+', '_', str(text).strip().lower())
+
+
+def parse_pricing_model(text) -> int:
+    """PER_KWH, PER_HOUR, PER_MINUTE, PER_SESSION or FREE for a provider's pricing_model"""
+    if text is None or _key(text) == "":
+        return PER_KWH
+    model = PRICING_MODELS.get(_key(text))
+    if model is None:
+        raise TariffError(f"unrecognised pricing model {text!r}")
+    return model
+
+
+def parse_time_limit(text) -> float:
+    """Session limit in minutes for a provider's time_limits ("2_hours", "1h30m"); inf for none"""
+    if text is None:
+        return math.inf
+    key = _key(text).replace('_', '')
+    if key in NO_LIMIT:
+        return math.inf
+    position = 0
+    minutes = 0.0
+    for match in DURATION.finditer(key):
+        if match.start() != position:
+            break
+        position = match.end()
+        value = float(match.group(1))
+        minutes += value * 60 if match.group(2).startswith('h') else value
+    if position != len(key) or minutes <= 0:
+        raise TariffError(f"unrecognised time limit {text!r}")
+    return minutes
+
+
+def tariff_problem(pricing_model, time_limits) -> Optional[str]:
+    """Why a provider's pricing_model or time_limits cannot be read, or None"""
+    try:
+        parse_pricing_model(pricing_model)
+        parse_time_limit(time_limits)
+    except TariffError as e:
+        return str(e)
+    return None
+
+
+class TariffIndex:
+    """Tariff id per station row, and the pricing model and time limit of each distinct tariff.
+
+    Tariff 0 is per kWh with no time limit, which is every station without
+    provider fields. Unreadable provider values fall back to those defaults.
+    """
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.rows = np.zeros(capacity, dtype=np.int32)
+        self.ids: Dict[Tuple, int] = {(None, None): 0}
+        self.models = np.array([PER_KWH], dtype=np.int8)
+        self.limits = np.array([math.inf])
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.size = 0
+
+    def reset(self, size):
+        """Every row from 0 to size on the default tariff"""
+        self.rows = np.zeros(max(size, 1), dtype=np.int32)
+        self.size = size
+
+    def tariff_id(self, pricing_model, time_limits) -> int:
+        key = (pricing_model, time_limits)
+        tariff = self.ids.get(key)
+        if tariff is not None:
+            return tariff
+        try:
+            model = parse_pricing_model(pricing_model)
+        except TariffError:
+            model = PER_KWH
+        try:
+            limit = parse_time_limit(time_limits)
+        except TariffError:
+            limit = math.inf
+        tariff = self.ids[key] = len(self.models)
+        self.models = np.append(self.models, np.int8(model))
+        self.limits = np.append(self.limits, limit)
+        return tariff
+
+    def _grow(self, needed):
+        if needed <= len(self.rows):
+            return
+        capacity = max(len(self.rows), 1)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros(capacity, dtype=np.int32)
+        grown[:self.size] = self.rows[:self.size]
+        self.rows = grown
+
+    def add(self, row, extra: Optional[Dict]):
+        """Record the tariff of the station at row; extra is its side dict of provider fields, if any"""
+        self._grow(row + 1)
+        self.rows[row] = self.tariff_id(extra.get('pricing_model'), extra.get('time_limits')) if extra else 0
+        self.size = max(self.size, row + 1)
+
+    def gather(self, rows) -> Tuple[np.ndarray, np.ndarray]:
+        """Pricing model codes and time limits (minutes) of the given rows"""
+        tariffs = self.rows[rows]
+        return self.models[tariffs], self.limits[tariffs]
+
+
+class VehicleProfile:
+    """The car being charged: battery_kwh, state of charge now and wanted (percent), power limits and connectors"""
+
+    def __init__(self, battery_kwh, soc_now, soc_target, max_kw, connectors: Iterable[str] = ("Type 2", "CCS"),
+                 ac_kw=None, value_of_time=VALUE_OF_TIME_PER_HOUR):
+        self.battery_kwh = float(battery_kwh)
+        self.soc_now = float(soc_now)
+        self.soc_target = float(soc_target)
+        self.max_kw = float(max_kw)
+        self.ac_kw = min(self.max_kw, DEFAULT_AC_KW) if ac_kw is None else float(ac_kw)
+        self.connectors = tuple(dict.fromkeys(c.strip() for c in connectors if c and c.strip()))
+        self.value_of_time = float(value_of_time)
+        if not self.battery_kwh > 0:
+            raise VehicleError(f"invalid battery size: {battery_kwh}")
+        if not 0 <= self.soc_now < self.soc_target <= 100:
+            raise VehicleError(f"invalid charge range: {soc_now}% to {soc_target}%")
+        if not self.max_kw > 0 or not self.ac_kw > 0:
+            raise VehicleError(f"invalid charging power: {max_kw} kW")
+        if not self.connectors:
+            raise VehicleError("no connectors")
+
+    def __repr__(self):
+        return (f"VehicleProfile({self.battery_kwh:g} kWh, {self.soc_now:g}-{self.soc_target:g}%, "
+                f"{self.max_kw:g} kW, {'/'.join(self.connectors)})")
+
+
+def _hours_to(soc, battery_kwh, power, taper_soc, slope):
+    """Hours to charge from empty to soc (fraction) at power kW into the battery, tapering above taper_soc"""
+    flat = np.minimum(soc, taper_soc)
+    over = np.maximum(soc - taper_soc, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tapered = np.where(over > 0, -np.log1p(-slope * over) / slope, 0.0)
+    return battery_kwh * (flat + tapered) / power
+
+
+def _soc_after(hours, battery_kwh, power, taper_soc, slope):
+    """Inverse of _hours_to: the charge (fraction) reached after hours"""
+    flat_hours = battery_kwh * taper_soc / power
+    flat = hours * power / battery_kwh
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        tapered = taper_soc - np.expm1(-(hours - flat_hours) * power * slope / battery_kwh) / slope
+    return np.where(hours <= flat_hours, flat, tapered)
+
+
+class ChargeEstimates:
+    """Per-station estimate arrays, aligned with the estimator's rows; NaN where no estimate is possible"""
+
+    __slots__ = ('compatible', 'power_kw', 'minutes', 'energy_kwh', 'cost', 'soc_reached', 'truncated')
+
+    def __init__(self, compatible, power_kw, minutes, energy_kwh, cost, soc_reached, truncated):
+        self.compatible = compatible
+        self.power_kw = power_kw
+        self.minutes = minutes
+        self.energy_kwh = energy_kwh
+        self.cost = cost
+        self.soc_reached = soc_reached
+        self.truncated = truncated
+
+    def __len__(self):
+        return len(self.compatible)
+
+    def to_dict(self, i) -> Optional[Dict]:
+        if not self.compatible[i] or math.isnan(self.minutes[i]):
+            return None
+        cost = float(self.cost[i])
+        return {
+            "power_kw": round(float(self.power_kw[i]), 1),
+            "minutes": round(float(self.minutes[i]), 1),
+            "energy_kwh": round(float(self.energy_kwh[i]), 2),
+            "cost": None if math.isnan(cost) else round(cost, 2),
+            "soc_reached": round(float(self.soc_reached[i]), 1),
+            "truncated": bool(self.truncated[i]),
+        }
+
+
+class ChargeEstimator:
+    """Estimates for one result set: the station columns of rows are gathered once, any profile is then cheap"""
+
+    def __init__(self, engine, rows, distances):
+        self.engine = engine
+        self.rows = np.asarray(rows, dtype=np.intp)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        columns = engine.station_columns
+        self.station_kw = columns.max_power[self.rows]
+        self.price = columns.price_per_kwh[self.rows]
+        self.models, self.limits = engine.tariff_index.gather(self.rows)
+        self._connectors: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _has(self, connector) -> np.ndarray:
+        mask = self._connectors.get(connector)
+        if mask is None:
+            mask = self._connectors[connector] = self.engine.filter_index.mask('power_types', connector)[self.rows]
+        return mask
+
+    def estimate(self, profile: VehicleProfile) -> ChargeEstimates:
+        n = len(self.rows)
+        dc = np.zeros(n, dtype=bool)
+        ac = np.zeros(n, dtype=bool)
+        for connector in profile.connectors:
+            if connector in AC_CONNECTORS:
+                ac |= self._has(connector)
+            else:
+                dc |= self._has(connector)
+        compatible = dc | ac
+
+        station_kw = np.where(self.station_kw > 0, self.station_kw, np.nan)
+        power = np.where(dc, np.minimum(station_kw, profile.max_kw),
+                         np.minimum(np.minimum(station_kw, AC_MAX_KW), profile.ac_kw))
+        power[~compatible] = np.nan
+        # Only DC charging fast enough to stress the battery tapers
+        tapers = dc & (power > AC_MAX_KW)
+        taper_soc = np.where(tapers, TAPER_SOC, 1.0)
+        slope = np.where(tapers, (1 - TAPER_FLOOR) / (1 - TAPER_SOC), 1.0)
+        into_battery = power * CHARGE_EFFICIENCY
+
+        start, target = profile.soc_now / 100, profile.soc_target / 100
+        started = _hours_to(start, profile.battery_kwh, into_battery, taper_soc, slope)
+        hours = _hours_to(target, profile.battery_kwh, into_battery, taper_soc, slope) - started
+        limit_hours = self.limits / 60
+        truncated = hours > limit_hours
+        reached = np.full(n, target)
+        if truncated.any():
+            reached[truncated] = _soc_after(started[truncated] + limit_hours[truncated], profile.battery_kwh,
+                                            into_battery[truncated], taper_soc[truncated], slope[truncated])
+            hours = np.minimum(hours, limit_hours)
+        reached = np.where(np.isnan(hours), np.nan, reached)
+        energy = profile.battery_kwh * (reached - start) / CHARGE_EFFICIENCY
+
+        models = self.models
+        cost = np.select([models == PER_KWH, models == PER_HOUR, models == PER_MINUTE, models == PER_SESSION],
+                         [self.price * energy, self.price * hours, self.price * hours * 60, self.price], 0.0)
+        cost = np.where(np.isnan(hours), np.nan, cost)
+        return ChargeEstimates(compatible, power, hours * 60, energy, cost, reached * 100, truncated)
+
+    def score(self, profile: VehicleProfile, estimates: ChargeEstimates) -> np.ndarray:
+        """Cost plus the value of the time spent charging and driving to the station"""
+        hours = estimates.minutes / 60 + self.distances / DRIVE_SPEED_KMH
+        return estimates.cost + profile.value_of_time * hours
+
+    def rank(self, profile: VehicleProfile, by="score") -> Tuple[np.ndarray, ChargeEstimates]:
+        """Positions into rows, best first by "distance", "cost", "time" or "score", and the estimates.
+
+        "distance" keeps the order rows were given in (nearest first from a
+        search, route order from a corridor search). For the others, stations
+        with no estimate (incompatible, unknown power or price) come last and
+        ties are broken by distance.
+        """
+        estimates = self.estimate(profile)
+        if by == "distance":
+            return np.arange(len(self.rows)), estimates
+        if by == "cost":
+            key = estimates.cost
+        elif by == "time":
+            key = estimates.minutes
+        elif by == "score":
+            key = self.score(profile, estimates)
+        else:
+            raise ValueError(f"unknown ranking {by!r}, expected one of {', '.join(RANKINGS)}")
+        key = np.where(np.isnan(key), np.inf, key)
+        return np.lexsort((self.distances, key)), estimates
@@ -1,19 +1,47 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, font
-import requests
-import math
-from datetime import datetime
+import numpy as np
 import threading
-import webbrowser
+import time
 from typing import List, Dict, Optional
-import folium
 import os
-import tempfile
 import json
+import sys
+import bisect
+import itertools
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from spatial_index import haversine_km
+from station_engine import PUBLIC_STATIONS, StationEngine, provider_to_station
+from catalog_snapshot import DEFAULT_SNAPSHOT_PATH, SnapshotError, catalog_signature, load_catalog, save_snapshot
+from station_import import ImportReport, iter_stations
+from map_render import MapCache, render_map
+from geolocation import GeoLocator
+from provider_import import read_providers, validate_provider
+from provider_store import ProviderStoreError, open_provider_store
+from instrumentation import METRICS
+from live_feed import LiveFeed, open_source
+from route import RouteError, load_route
+from opening_hours import HoursError, parse_open_at
+from charging_estimate import ChargeEstimator, VehicleProfile
 
 class EVChargingWithProviders:
-    def __init__(self, root):
+    # Quiet period after the last slider/filter change before searching
+    SEARCH_DEBOUNCE_MS = 150
+    # Sort choices and the charge_estimate ranking behind each
+    RANKINGS = {"Distance": "distance", "Cost": "cost", "Charge time": "time", "Best value": "score"}
+    # Dataset stations added per batch while the catalog loads in the background
+    DATASET_BATCH = 20000
+    # Shortest gap between refreshes of the results as dataset batches arrive
+    LOAD_REFRESH_S = 1.0
+    
+    def __init__(self, root, dataset_files=(), feed=None, snapshot=None):
+        self.started = time.perf_counter()
         self.root = root
+        self.dataset_files = list(dataset_files)
+        # Binary snapshot of the full catalog, mapped instead of re-importing the datasets
+        self.snapshot_path = snapshot
+        self.feed_source = feed
         self.root.title("⚡ EV Charging Station Finder - Kerala")
         self.root.geometry("1250x850")
         self.root.configure(bg='#1e1e1e')
@@ -21,8 +49,24 @@ class EVChargingWithProviders:
         self.setup_styles()
         self.init_data()
         self.create_main_ui()
-        self.load_all_stations()
+        self.first_paint_binding = self.root.bind('<Expose>', self.on_first_paint, '+')
+        # Everything else waits until the window is up
+        self.root.after(0, self.start_up)
+    
+    def start_up(self):
+        self.load_providers()
         self.auto_detect_location()
+        self.load_all_stations()
+    
+    def mark_startup(self, name):
+        """Record how long after construction a startup milestone was first reached"""
+        if name not in self.startup_marks:
+            self.startup_marks[name] = time.perf_counter() - self.started
+            METRICS.record(f'startup_{name}', self.startup_marks[name])
+    
+    def on_first_paint(self, event=None):
+        self.root.unbind('<Expose>', self.first_paint_binding)
+        self.mark_startup('first_paint')
     
     def setup_styles(self):
         self.colors = {
@@ -38,27 +82,90 @@ class EVChargingWithProviders:
     def init_data(self):
         self.current_lat = None
         self.current_lon = None
-        self.stations = []
+        self.engine = StationEngine()
+        self.stations = self.engine.stations
         self.filtered_stations = []
-        self.providers_file = 'providers.json'
-        self.load_providers()
+        self.result_rows = np.empty(0, dtype=np.intp)
+        # Which result rows match the name/address text of a route search, so re-filtering keeps them out
+        self.result_text_mask = None
+        self.result_distances = []
+        self.last_query = None
+        self.route = None
+        self.live_feed = None
+        # One worker: a queued search that has not started yet can simply be cancelled
+        self.search_executor = ThreadPoolExecutor(max_workers=1)
+        self.search_future = None
+        self.search_after = None
+        self.search_generation = 0
+        # Rows changed by live updates while a search is running, re-checked when it lands
+        self.search_live_changes = None
+        self.map_cache = MapCache()
+        self.locator = GeoLocator()
+        self.providers_file = 'providers.db'
+        self.registered_providers = []
+        self.startup_marks = {}
+        # Datasets are streamed in on the search worker; the lock keeps those adds and
+        # the live updates applied on the Tk thread from interleaving
+        self.engine_lock = threading.Lock()
+        self.catalog_generation = 0
+        self.catalog_loading = False
+        self.dataset_rejected = 0
+        self.last_load_refresh = 0.0
     
     def load_providers(self):
         try:
-            if os.path.exists(self.providers_file):
-                with open(self.providers_file, 'r') as f:
-                    self.registered_providers = json.load(f)
-            else:
-                self.registered_providers = []
-        except:
-            self.registered_providers = []
+            self.provider_store = open_provider_store(self.providers_file)
+        except ProviderStoreError as e:
+            # Keep the unreadable legacy file untouched so it can be repaired and migrated later
+            messagebox.showwarning("Provider Data", f"Could not migrate registered providers: {str(e)}")
+            self.provider_store = open_provider_store(self.providers_file, legacy_json=None)
+        self.registered_providers = self.provider_store.load_all()
     
-    def save_providers(self):
+    def register_providers(self, providers) -> List[int]:
+        """Store validated providers under new ids and add them to the live catalog; returns the ids"""
+        ids = self.provider_store.add_new(providers)
+        self.registered_providers.extend(providers)
+        # Added on the search worker, between searches, like dataset batches
+        self.search_executor.submit(self.add_provider_stations, self.catalog_generation,
+                                    [provider_to_station(p) for p in providers])
+        return ids
+    
+    def add_provider_stations(self, generation, stations):
+        # A reload since the registration already picked them up from registered_providers
+        if generation != self.catalog_generation:
+            return
+        with self.engine_lock:
+            for station in stations:
+                self.engine.add_station(station)
+        self.root.after(0, self.debounced_search)
+    
+    def import_providers(self):
+        from tkinter import filedialog
+        path = filedialog.askopenfilename(title="Import providers",
+                                          filetypes=[("Provider lists", "*.csv *.json *.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            providers, report = read_providers(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import Providers", f"Could not read {path}: {str(e)}")
+            return
+        if report.rejected:
+            details = "\n".join(f"Row {n}: {reason}" for n, reason in report.errors[:10])
+            more = f"\n... and {report.rejected - 10} more" if report.rejected > 10 else ""
+            messagebox.showerror("Import Providers", f"{report.rejected} of {report.total} rows are invalid; "
+                                                     f"nothing was registered.\n\n{details}{more}")
+            return
+        if not providers:
+            messagebox.showinfo("Import Providers", "The file has no providers")
+            return
         try:
-            with open(self.providers_file, 'w') as f:
-                json.dump(self.registered_providers, f, indent=2)
-        except:
-            pass
+            ids = self.register_providers(providers)
+        except ProviderStoreError as e:
+            messagebox.showerror("Import Providers", f"Failed to register: {str(e)}")
+            return
+        self.status_bar.config(text=f"✅ Registered {len(ids)} providers (ids {ids[0]}-{ids[-1]})")
+        messagebox.showinfo("Import Providers", f"Registered {len(ids)} charging stations from {os.path.basename(path)}")
     
     def create_main_ui(self):
         self.create_header()
@@ -80,6 +187,13 @@ class EVChargingWithProviders:
                                    command=self.open_provider_registration)
         self.register_btn.pack(side='left', padx=(30, 10), pady=20)
         
+        self.import_providers_btn = tk.Button(header, text="📥 IMPORT PROVIDERS", 
+                                           font=('Segoe UI', 10, 'bold'), fg='#000000', bg='#ffaa00',
+                                           activebackground='#e59900', activeforeground='#000000',
+                                           relief='raised', bd=3, padx=15, pady=8,
+                                           command=self.import_providers)
+        self.import_providers_btn.pack(side='left', padx=(0, 10), pady=20)
+        
         # Add map button in header
         self.map_btn = tk.Button(header, text="🗺️ SHOW MAP", 
                                font=('Segoe UI', 10, 'bold'), fg='#000000', bg='#00ff88',
@@ -88,6 +202,13 @@ class EVChargingWithProviders:
                                command=self.show_map)
         self.map_btn.pack(side='left', padx=(0, 20), pady=20)
         
+        self.diagnostics_btn = tk.Button(header, text="📊 DIAGNOSTICS", 
+                                       font=('Segoe UI', 10, 'bold'), fg='#000000', bg='#4a9eff',
+                                       activebackground='#3a8eef', activeforeground='#000000',
+                                       relief='raised', bd=3, padx=15, pady=8,
+                                       command=self.open_diagnostics)
+        self.diagnostics_btn.pack(side='left', padx=(0, 20), pady=20)
+        
         self.status_indicator = tk.Label(header, text="🟢 Online", 
                                       font=self.fonts['normal'], fg=self.colors['success'], bg='#0d1117')
         self.status_indicator.pack(side='right', padx=30, pady=20)
@@ -149,6 +270,19 @@ class EVChargingWithProviders:
         self.lon_entry = tk.Entry(coord_input, font=self.fonts['small'], 
                                 bg='#404040', fg=self.colors['text'])
         self.lon_entry.pack(side='left', padx=5)
+        
+        # Name or address search, combined with the radius and filters
+        text_frame = tk.Frame(location_frame, bg=self.colors['card'])
+        text_frame.pack(fill='x', padx=15, pady=(0, 10))
+        
+        tk.Label(text_frame, text="Name or place:", 
+                font=self.fonts['small'], fg=self.colors['text_secondary'], bg=self.colors['card']).pack(anchor='w')
+        self.text_var = tk.StringVar()
+        self.text_combo = ttk.Combobox(text_frame, textvariable=self.text_var, font=self.fonts['small'])
+        self.text_combo.pack(fill='x', pady=5)
+        self.text_combo.bind("<KeyRelease>", self.on_text_typed)
+        self.text_combo.bind("<<ComboboxSelected>>", self.schedule_search)
+        self.text_combo.bind("<Return>", self.schedule_search)
     
     def create_filters_card(self, parent):
         filter_frame = tk.LabelFrame(parent, text="🔍 Search Filters", 
@@ -229,6 +363,16 @@ class EVChargingWithProviders:
                                   command=self.search_stations)
         self.search_btn.pack(fill='x', pady=(0, 8))
         
+        # Corridor search along a GPX/GeoJSON route; the radius slider sets the corridor width
+        route_frame = tk.Frame(button_frame, bg=self.colors['card'])
+        route_frame.pack(fill='x', pady=(0, 8))
+        self.route_btn = tk.Button(route_frame, text="🛣️ Search Along Route", 
+                                 font=self.fonts['button'], fg='#000000', bg=self.colors['accent'],
+                                 command=self.open_route)
+        self.route_btn.pack(side='left', fill='x', expand=True)
+        tk.Button(route_frame, text="✖", font=self.fonts['button'], fg='#000000', bg=self.colors['border'],
+                 command=self.clear_route).pack(side='left', padx=(5, 0))
+        
         # Add note about map button
         map_note = tk.Label(button_frame, text="🗺️ Map button is available in top header", 
                           font=('Segoe UI', 8), fg=self.colors['text_secondary'], bg=self.colors['card'])
@@ -258,6 +402,11 @@ class EVChargingWithProviders:
                                    font=self.fonts['normal'], fg=self.colors['accent'], bg=self.colors['card'])
         self.radius_label.pack(side='left', padx=10)
         
+        def on_radius_change(val):
+            self.radius_label.config(text=f"{float(val):.0f} km")
+            self.schedule_search()
+        self.radius_slider.config(command=on_radius_change)
+        
         # Access type
         tk.Label(filter_frame, text="Access Type:", 
                 font=self.fonts['normal'], fg=self.colors['text'], bg=self.colors['card']).pack(anchor='w', padx=15, pady=(15, 5))
@@ -270,7 +419,7 @@ class EVChargingWithProviders:
         for text, value in access_types:
             rb = tk.Radiobutton(access_frame, text=text, variable=self.access_var, value=value,
                                font=self.fonts['small'], fg=self.colors['text'], bg=self.colors['card'],
-                               selectcolor=self.colors['accent'])
+                               selectcolor=self.colors['accent'], command=self.schedule_search)
             rb.pack(anchor='w')
         
         # Power type
@@ -282,6 +431,58 @@ class EVChargingWithProviders:
                                   values=["all", "Type 2", "CCS", "CHAdeMO"], 
                                   state="readonly", width=20)
         power_combo.pack(padx=15, pady=5, fill='x')
+        power_combo.bind("<<ComboboxSelected>>", self.schedule_search)
+        
+        # Result mode
+        tk.Label(filter_frame, text="Show:", 
+                font=self.fonts['normal'], fg=self.colors['text'], bg=self.colors['card']).pack(anchor='w', padx=15, pady=(15, 5))
+        
+        self.nearest_var = tk.StringVar(value="All in radius")
+        nearest_combo = ttk.Combobox(filter_frame, textvariable=self.nearest_var, 
+                                    values=["All in radius", "Nearest 5", "Nearest 10", "Nearest 20", "Nearest 50"], 
+                                    state="readonly", width=20)
+        nearest_combo.pack(padx=15, pady=5, fill='x')
+        nearest_combo.bind("<<ComboboxSelected>>", self.schedule_search)
+        
+        # Opening hours: any time, now, or a typed time such as "Sat 9PM"
+        tk.Label(filter_frame, text="Open:", 
+                font=self.fonts['normal'], fg=self.colors['text'], bg=self.colors['card']).pack(anchor='w', padx=15, pady=(15, 5))
+        
+        self.open_var = tk.StringVar(value="Any time")
+        open_combo = ttk.Combobox(filter_frame, textvariable=self.open_var, 
+                                 values=["Any time", "Open now"], width=20)
+        open_combo.pack(padx=15, pady=5, fill='x')
+        open_combo.bind("<<ComboboxSelected>>", self.schedule_search)
+        open_combo.bind("<Return>", self.schedule_search)
+        
+        # Vehicle profile for the charging cost/time estimates, and how to rank them
+        tk.Label(filter_frame, text="Vehicle:", 
+                font=self.fonts['normal'], fg=self.colors['text'], bg=self.colors['card']).pack(anchor='w', padx=15, pady=(15, 5))
+        
+        vehicle_frame = tk.Frame(filter_frame, bg=self.colors['card'])
+        vehicle_frame.pack(fill='x', padx=15, pady=5)
+        self.vehicle_entries = {}
+        vehicle_fields = [("Battery kWh", "battery_kwh", "60"), ("Charge now %", "soc_now", "20"),
+                          ("Charge to %", "soc_target", "80"), ("Max kW", "max_kw", "100"),
+                          ("Connectors", "connectors", "Type 2;CCS")]
+        for i, (label_text, key, default) in enumerate(vehicle_fields):
+            tk.Label(vehicle_frame, text=label_text, font=self.fonts['small'], fg=self.colors['text_secondary'],
+                    bg=self.colors['card']).grid(row=i, column=0, sticky='w')
+            entry = tk.Entry(vehicle_frame, font=self.fonts['small'], bg='#404040', fg=self.colors['text'], width=14)
+            entry.grid(row=i, column=1, sticky='ew', padx=(10, 0), pady=1)
+            entry.insert(0, default)
+            entry.bind("<Return>", self.rerank_results)
+            entry.bind("<FocusOut>", self.rerank_results)
+            self.vehicle_entries[key] = entry
+        
+        tk.Label(filter_frame, text="Sort by:", 
+                font=self.fonts['normal'], fg=self.colors['text'], bg=self.colors['card']).pack(anchor='w', padx=15, pady=(15, 5))
+        
+        self.sort_var = tk.StringVar(value="Distance")
+        sort_combo = ttk.Combobox(filter_frame, textvariable=self.sort_var, 
+                                 values=list(self.RANKINGS), state="readonly", width=20)
+        sort_combo.pack(padx=15, pady=5, fill='x')
+        sort_combo.bind("<<ComboboxSelected>>", self.rerank_results)
         
         style = ttk.Style()
         style.theme_use('clam')
@@ -302,18 +503,7 @@ class EVChargingWithProviders:
         self.results_count.pack(side='right', pady=15)
         
         # Results list
-        canvas = tk.Canvas(parent, bg=self.colors['card'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(parent, orient="vertical", command=canvas.yview)
-        self.results_frame = tk.Frame(canvas, bg=self.colors['card'])
-        
-        self.results_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=self.results_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        canvas.pack(side="left", fill="both", expand=True, padx=20, pady=(0, 20))
-        scrollbar.pack(side="right", fill="y", padx=(0, 20), pady=(0, 20))
-        
-        self.show_empty_state()
+        self.results_list = VirtualResultsList(parent, self.colors, self.fonts)
     
     def create_status_bar(self):
         self.status_bar = tk.Label(self.root, text="🚀 Initializing...", 
@@ -322,73 +512,156 @@ class EVChargingWithProviders:
         self.status_bar.pack(side='bottom', fill='x', padx=20, pady=(0, 10))
     
     def show_empty_state(self):
-        for widget in self.results_frame.winfo_children():
-            widget.destroy()
-        
-        empty_frame = tk.Frame(self.results_frame, bg=self.colors['card'])
-        empty_frame.pack(expand=True, fill='both', pady=100)
-        
-        tk.Label(empty_frame, text="🔋", font=('Segoe UI', 48), 
-                fg=self.colors['text_secondary'], bg=self.colors['card']).pack()
-        tk.Label(empty_frame, text="No stations found", 
-                font=self.fonts['heading'], fg=self.colors['text_secondary'], bg=self.colors['card']).pack(pady=10)
-        tk.Label(empty_frame, text="Register as a provider or search for nearby stations", 
-                font=self.fonts['normal'], fg=self.colors['text_secondary'], bg=self.colors['card']).pack()
+        self.results_list.set_items([])
     
+    @METRICS.instrument('load_all_stations')
     def load_all_stations(self):
-        # Public stations
-        public_stations = [
-            {"id": 1, "name": "Tesla Supercharger - Kochi", "address": "MG Road, Ernakulam", 
-             "latitude": 9.9312, "longitude": 76.2673, "total_slots": 8, "available_slots": 3, 
-             "power_types": ["Type 2", "CCS", "CHAdeMO"], "max_power": 250, "price_per_kwh": 0.28, 
-             "status": "open", "access_type": "public", "owner_type": "commercial", "operating_hours": "24/7"},
-            
-            {"id": 2, "name": "ChargePoint Station - Lulu Mall", "address": "Lulu Mall, Edappally, Kochi", 
-             "latitude": 9.9836, "longitude": 76.2855, "total_slots": 4, "available_slots": 2, 
-             "power_types": ["Type 2", "CCS"], "max_power": 150, "price_per_kwh": 0.32, 
-             "status": "open", "access_type": "public", "owner_type": "commercial", "operating_hours": "10AM-10PM"},
-            
-            {"id": 3, "name": "EVgo Station - Cochin Airport", "address": "Cochin International Airport, Nedumbassery", 
-             "latitude": 10.1518, "longitude": 76.4019, "total_slots": 6, "available_slots": 1, 
-             "power_types": ["CCS", "CHAdeMO"], "max_power": 350, "price_per_kwh": 0.35, 
-             "status": "open", "access_type": "public", "owner_type": "commercial", "operating_hours": "24/7"},
-            
-            {"id": 4, "name": "Public Charging - Kalady Town", "address": "Near Sree Sankara Temple, Kalady", 
-             "latitude": 9.7480, "longitude": 76.4880, "total_slots": 4, "available_slots": 2, 
-             "power_types": ["Type 2", "CCS"], "max_power": 50, "price_per_kwh": 0.22, 
-             "status": "open", "access_type": "public", "owner_type": "commercial", "operating_hours": "8AM-8PM"}
-        ]
+        """Load the built-in and provider stations now and stream any datasets in behind them"""
+        provider_stations = [provider_to_station(p) for p in self.registered_providers]
         
-        # Add registered providers
-        provider_stations = []
-        for provider in self.registered_providers:
-            provider_stations.append({
-                "id": provider["id"], 
-                "name": provider["name"], 
-                "address": provider["address"],
-                "latitude": provider["latitude"], 
-                "longitude": provider["longitude"],
-                "total_slots": provider["total_slots"], 
-                "available_slots": provider["available_slots"],
-                "power_types": provider["power_types"], 
-                "max_power": provider["max_power"],
-                "price_per_kwh": provider["price_per_kwh"], 
-                "status": provider["status"],
-                "access_type": "provider", 
-                "owner_type": "provider",
-                "operating_hours": provider["operating_hours"],
-                "contact_info": provider.get("contact_info", ""),
-                "pricing_model": provider.get("pricing_model", "per_kwh"),
-                "time_limits": provider.get("time_limits", "no_limit")
-            })
-        
-        self.stations = public_stations + provider_stations
+        self.catalog_generation += 1
+        if self.load_snapshot():
+            return
+        with self.engine_lock:
+            self.engine.load(PUBLIC_STATIONS + provider_stations)
+        # Rows of the current results (and of any search in flight) are stale until the next search
+        self.last_query = None
+        self.search_generation += 1
+        self.search_live_changes = None
+        self.stations = self.engine.stations
         self.status_bar.config(text=f"✅ Loaded {len(self.stations)} charging stations ({len(provider_stations)} from providers)")
         
-        # Auto-search stations immediately after loading
-        self.root.after(500, self.auto_search_stations)
+        # First results come from the stations already loaded; dataset batches queue behind the search
+        self.auto_search_stations()
+        self.dataset_rejected = 0
+        self.catalog_loading = bool(self.dataset_files)
+        if self.catalog_loading:
+            self.last_load_refresh = time.perf_counter()
+            self.search_executor.submit(self.import_datasets, self.catalog_generation, list(self.dataset_files))
+        else:
+            self.finish_catalog_load(self.catalog_generation)
+    
+    def load_snapshot(self) -> bool:
+        """Swap in the catalog from the snapshot if it matches the datasets and providers; returns whether it did"""
+        if not self.snapshot_path or not self.dataset_files:
+            return False
+        try:
+            loaded = load_catalog(self.snapshot_path, PUBLIC_STATIONS, self.registered_providers, self.dataset_files)
+        except (SnapshotError, OSError) as e:
+            print(f"Ignoring catalog snapshot: {e}", file=sys.stderr)
+            return False
+        if loaded is None:
+            return False
+        engine, added = loaded
+        with self.engine_lock:
+            self.engine = engine
+        self.last_query = None
+        self.search_generation += 1
+        self.search_live_changes = None
+        self.stations = self.engine.stations
+        self.status_bar.config(text=f"✅ Loaded {len(self.stations)} charging stations "
+                                    f"({len(self.registered_providers)} from providers)")
+        self.auto_search_stations()
+        self.dataset_rejected = 0
+        self.catalog_loading = False
+        # Map station ids for live updates off the Tk thread, then fold any new providers into the file
+        self.search_executor.submit(self.index_station_ids, self.catalog_generation)
+        if added:
+            self.queue_snapshot_save()
+        self.finish_catalog_load(self.catalog_generation)
+        return True
+    
+    def index_station_ids(self, generation):
+        if generation == self.catalog_generation:
+            with self.engine_lock:
+                self.engine.row_by_id
+    
+    def queue_snapshot_save(self):
+        # The signature is taken now: registrations after this point are queued behind the save
+        signature = catalog_signature(PUBLIC_STATIONS, self.registered_providers, self.dataset_files)
+        self.search_executor.submit(self.write_snapshot, self.catalog_generation, signature)
+    
+    def write_snapshot(self, generation, signature):
+        """Search-worker job: write the loaded catalog to the snapshot file"""
+        if generation != self.catalog_generation:
+            return
+        try:
+            with self.engine_lock:
+                save_snapshot(self.engine, self.snapshot_path, signature)
+        except (OSError, SnapshotError) as e:
+            print(f"Could not write catalog snapshot: {e}", file=sys.stderr)
+    
+    def import_datasets(self, generation, paths, records=None, report=None):
+        """Search-worker job: add one batch of dataset stations, then queue the next behind any pending search"""
+        if generation != self.catalog_generation:
+            return
+        if records is None:
+            if not paths:
+                self.root.after(0, self.finish_catalog_load, generation)
+                return
+            report = ImportReport(paths[0])
+            records = iter_stations(paths[0], report)
+        try:
+            batch = list(itertools.islice(records, self.DATASET_BATCH))
+            with self.engine_lock:
+                for station in batch:
+                    self.engine.add_station(station)
+        except Exception as e:
+            # Anything escaping would end the job inside its future and leave the catalog loading for good
+            batch = []
+            message = f"Failed to import {paths[0]}: {str(e)}"
+            self.root.after(0, lambda: messagebox.showwarning("Dataset Import", message))
+        if batch:
+            self.root.after(0, self.dataset_progress, generation)
+            self.search_executor.submit(self.import_datasets, generation, paths, records, report)
+        else:
+            report.finish()
+            self.dataset_rejected += report.rejected
+            self.search_executor.submit(self.import_datasets, generation, paths[1:])
+    
+    def dataset_progress(self, generation):
+        if generation != self.catalog_generation:
+            return
+        self.status_bar.config(text=f"⏳ Loading stations... {len(self.engine)} so far")
+        # Show the growing catalog now and then rather than after every batch
+        if time.perf_counter() - self.last_load_refresh >= self.LOAD_REFRESH_S:
+            self.last_load_refresh = time.perf_counter()
+            self.debounced_search()
+    
+    def finish_catalog_load(self, generation):
+        if generation != self.catalog_generation:
+            return
+        was_loading, self.catalog_loading = self.catalog_loading, False
+        self.mark_startup('catalog_loaded')
+        if was_loading:
+            status = f"✅ Loaded {len(self.engine)} charging stations ({len(self.registered_providers)} from providers)"
+            if self.dataset_rejected:
+                status += f", {self.dataset_rejected} invalid dataset rows skipped"
+            self.status_bar.config(text=status)
+            self.debounced_search()
+            if self.snapshot_path:
+                self.queue_snapshot_save()
+        # Build the text index before the first name search needs it
+        self.search_executor.submit(self.engine.sync_text_index)
+        if self.feed_source and self.live_feed is None:
+            self.start_live_feed(self.feed_source)
+    
+    def find_nearby_stations(self, lat, lon, radius):
+        """Stations with free slots within radius km, nearest first"""
+        rows, distances = self.engine.radius_query(lat, lon, radius)
+        self.result_rows = rows
+        self.result_distances = distances.tolist()
+        self.result_text_mask = None
+        self.last_query = (lat, lon, radius, None, None, None, None)
+        return self.engine.materialize(rows, distances)
     
     def auto_detect_location(self):
+        # A recent detection from a previous run makes startup instant
+        cached = self.locator.cached()
+        if cached:
+            self.set_location(cached)
+            return
+        
         # Set default location to Kerala immediately
         self.current_lat = 9.9312  # Kochi
         self.current_lon = 76.2673
@@ -399,94 +672,43 @@ class EVChargingWithProviders:
         self.location_display.config(text="📍 Kochi, Kerala (Default)", fg=self.colors['success'])
         self.status_bar.config(text="✅ Using Kochi, Kerala as default location")
         
-        # Auto-search stations
-        threading.Thread(target=self.detect_location, daemon=True).start()
+        self.detect_location()
         
+    @METRICS.instrument('auto_search_stations')
     def auto_search_stations(self):
         """Automatically search for stations using default location"""
-        try:
-            if self.current_lat and self.current_lon:
-                radius = self.radius_var.get()
-                
-                nearby_stations = []
-                for station in self.stations:
-                    distance = self.calculate_distance(self.current_lat, self.current_lon, station['latitude'], station['longitude'])
-                    if distance <= radius and station['available_slots'] > 0:
-                        station_copy = station.copy()
-                        station_copy['distance_km'] = round(distance, 2)
-                        nearby_stations.append(station_copy)
-                
-                nearby_stations.sort(key=lambda x: x['distance_km'])
-                self.filtered_stations = nearby_stations
-                self.apply_filters()
-                
-                self.status_bar.config(text=f"🔍 Found {len(nearby_stations)} stations within {radius} km")
-        except Exception as e:
-            self.status_bar.config(text=f"❌ Auto-search failed: {str(e)}")
+        if self.current_lat and self.current_lon:
+            self.start_search(self.current_lat, self.current_lon)
+    
+    def set_location(self, location):
+        self.current_lat = location['lat']
+        self.current_lon = location['lon']
+        self.lat_entry.delete(0, tk.END)
+        self.lat_entry.insert(0, str(self.current_lat))
+        self.lon_entry.delete(0, tk.END)
+        self.lon_entry.insert(0, str(self.current_lon))
+        self.location_display.config(text=f"📍 {location['city']}, {location['country']}", fg=self.colors['success'])
+        self.status_bar.config(text=f"✅ Location detected: {location['city']}, {location['country']}")
     
     def detect_location(self):
-        def update_ui(text, color=None):
-            if color:
-                self.location_display.config(text=text, fg=color)
-            else:
-                self.location_display.config(text=text)
-        
-        update_ui("🔄 Detecting your location...", self.colors['warning'])
+        self.location_display.config(text="🔄 Detecting your location...", fg=self.colors['warning'])
         self.detect_btn.config(text="🔄 Detecting...", state='disabled')
         
         def detect():
             try:
-                services = ['https://ipinfo.io/json', 'https://ipapi.co/json/']
-                location_data = None
-                
-                for service in services:
-                    try:
-                        response = requests.get(service, timeout=5)
-                        if response.status_code == 200:
-                            location_data = response.json()
-                            break
-                    except:
-                        continue
-                
-                if location_data and 'loc' in location_data:
-                    lat, lon = location_data['loc'].split(',')
-                    self.current_lat = float(lat)
-                    self.current_lon = float(lon)
-                    city = location_data.get('city', 'Unknown')
-                    country = location_data.get('country', 'Unknown')
-                    
-                    location_text = f"📍 {city}, {country}"
-                    self.root.after(0, lambda: update_ui(location_text, self.colors['success']))
-                    self.root.after(0, lambda: self.lat_entry.delete(0, tk.END))
-                    self.root.after(0, lambda: self.lat_entry.insert(0, str(self.current_lat)))
-                    self.root.after(0, lambda: self.lon_entry.delete(0, tk.END))
-                    self.root.after(0, lambda: self.lon_entry.insert(0, str(self.current_lon)))
-                    self.root.after(0, lambda: self.status_bar.config(text=f"✅ Location detected: {city}, {country}"))
-                else:
-                    raise Exception("No location data received")
-                    
-            except Exception as e:
-                self.root.after(0, lambda: update_ui("❌ Location detection failed", self.colors['error']))
+                location = self.locator.locate(use_cache=False)
+                self.root.after(0, lambda: self.set_location(location))
+            except Exception:
+                self.root.after(0, lambda: self.location_display.config(text="❌ Location detection failed", fg=self.colors['error']))
             
             self.root.after(0, lambda: self.detect_btn.config(text="🔄 Detect My Location", state='normal'))
         
         threading.Thread(target=detect, daemon=True).start()
     
     def calculate_distance(self, lat1, lon1, lat2, lon2):
-        R = 6371
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
+        return haversine_km(lat1, lon1, lat2, lon2)
     
+    @METRICS.instrument('search_stations')
     def search_stations(self):
         try:
             lat = float(self.lat_entry.get()) if self.lat_entry.get() else self.current_lat
@@ -496,155 +718,609 @@ class EVChargingWithProviders:
                 messagebox.showwarning("Location Required", "Please detect location or enter coordinates")
                 return
             
-            radius = self.radius_var.get()
-            
-            nearby_stations = []
-            for station in self.stations:
-                distance = self.calculate_distance(lat, lon, station['latitude'], station['longitude'])
-                if distance <= radius and station['available_slots'] > 0:
-                    station_copy = station.copy()
-                    station_copy['distance_km'] = round(distance, 2)
-                    nearby_stations.append(station_copy)
-            
-            nearby_stations.sort(key=lambda x: x['distance_km'])
-            self.filtered_stations = nearby_stations
-            self.apply_filters()
+            self.start_search(lat, lon)
             
         except ValueError:
             messagebox.showerror("Invalid Input", "Please enter valid coordinates")
     
-    def apply_filters(self):
-        filtered = self.filtered_stations.copy()
-        
-        access_type = self.access_var.get()
-        if access_type != "all":
-            filtered = [s for s in filtered if s.get('access_type') == access_type]
-        
-        power_type = self.power_var.get()
-        if power_type != "all":
-            filtered = [s for s in filtered if power_type in s.get('power_types', [])]
-        
-        self.display_results(filtered)
+    def schedule_search(self, *args):
+        """Debounced search after a slider or filter change"""
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+        self.search_after = self.root.after(self.SEARCH_DEBOUNCE_MS, self.debounced_search)
     
-    def display_results(self, stations):
-        for widget in self.results_frame.winfo_children():
-            widget.destroy()
-        
-        if not stations:
-            self.show_empty_state()
-            self.results_count.config(text="0 stations found")
+    def on_text_typed(self, event=None):
+        """Search as the text changes; completions come back with the results"""
+        if event is not None and event.keysym in ('Up', 'Down', 'Left', 'Right', 'Escape', 'Return'):
             return
-        
+        self.schedule_search()
+    
+    def show_suggestions(self, generation, suggestions):
+        if generation == self.search_generation:
+            self.text_combo['values'] = suggestions
+    
+    def debounced_search(self):
+        self.search_after = None
+        try:
+            lat = float(self.lat_entry.get()) if self.lat_entry.get() else self.current_lat
+            lon = float(self.lon_entry.get()) if self.lon_entry.get() else self.current_lon
+        except ValueError:
+            return
+        if lat is not None and lon is not None:
+            self.start_search(lat, lon)
+    
+    def start_search(self, lat, lon):
+        """Run a search on the worker thread, superseding any search still pending or running"""
+        try:
+            open_at = self.open_at()
+        except HoursError as e:
+            self.status_bar.config(text=f"❌ Open: {str(e)}")
+            return
+        self.search_generation += 1
+        self.search_live_changes = []
+        if self.search_future is not None:
+            self.search_future.cancel()
+        self.search_future = self.search_executor.submit(
+            self.run_search, self.search_generation, lat, lon,
+            self.radius_var.get(), self.access_var.get(), self.power_var.get(), self.nearest_k(), self.route, open_at,
+            self.text_var.get().strip() or None)
+    
+    def nearest_k(self) -> Optional[int]:
+        """k of the 'Nearest N' mode, or None to show everything in the radius"""
+        choice = self.nearest_var.get()
+        return int(choice.split()[-1]) if choice.startswith("Nearest") else None
+    
+    def open_at(self) -> Optional[int]:
+        """Minute of the week stations must be open at, or None for any time; "Open now" is read when the search starts"""
+        choice = self.open_var.get().strip()
+        if not choice or choice == "Any time":
+            return None
+        return parse_open_at(choice)
+    
+    def run_search(self, generation, lat, lon, radius, access_type, power_type, k=None, route=None, open_at=None,
+                   text=None):
+        """Worker side of start_search; gives up as soon as a newer search has started"""
+        text_mask = None
+        try:
+            # Live updates, imports and registrations change the engine under this lock on other threads
+            with METRICS.timer('background_search'), self.engine_lock:
+                if route is not None:
+                    # Distances are from the route; results come in the order the route passes them
+                    rows, distances, _ = self.engine.corridor_query(route, radius)
+                    stations = self.engine.materialize(rows, distances)
+                    keep = self.engine.matches(rows, access_type, power_type, open_at=open_at)
+                    if text is not None:
+                        self.engine.sync_text_index()
+                        text_mask = np.isin(rows, self.engine.text_index.match(text)[0])
+                        keep &= text_mask
+                    positions = np.flatnonzero(keep)
+                    filtered = [stations[i] for i in positions.tolist()]
+                elif text is not None:
+                    # Best matches first, nearest first among equals
+                    rows, distances = self.engine.text_rows(text, lat, lon, radius, access_type, power_type, open_at, k)
+                    stations = filtered = self.engine.materialize(rows, distances)
+                    positions = np.arange(len(rows))
+                elif k is not None:
+                    # Filters are applied during the nearest search, so every hit is shown
+                    rows, distances = self.engine.search_rows(lat, lon, radius, access_type, power_type, k, open_at)
+                    stations = filtered = self.engine.materialize(rows, distances)
+                    positions = np.arange(len(rows))
+                else:
+                    rows, distances = self.engine.radius_query(lat, lon, radius)
+                    if generation != self.search_generation:
+                        return
+                    stations = self.engine.materialize(rows, distances)
+                    if generation != self.search_generation:
+                        return
+                    positions = np.flatnonzero(self.engine.matches(rows, access_type, power_type, open_at=open_at))
+                    filtered = [stations[i] for i in positions.tolist()]
+                layout = VirtualResultsList.layout(filtered)
+                if text is not None:
+                    # The index is up to date by now, so completing on this thread never waits for it
+                    self.root.after(0, self.show_suggestions, generation, self.engine.suggest(text))
+        except Exception as e:
+            if generation == self.search_generation:
+                message = f"❌ Search failed: {str(e)}"
+                self.root.after(0, lambda: self.status_bar.config(text=message))
+            return
+        self.root.after(0, self.finish_search, generation, (lat, lon, radius, k, route, open_at, text),
+                        rows, distances, stations, filtered, layout, positions, text_mask)
+    
+    def finish_search(self, generation, query, rows, distances, stations, filtered, layout, positions, text_mask=None):
+        if generation != self.search_generation:
+            METRICS.incr('stale_searches_discarded')
+            return
+        self.mark_startup('first_results')
+        self.last_query = query
+        self.result_rows = rows
+        self.result_distances = distances.tolist()
+        self.result_text_mask = text_mask
+        self.filtered_stations = stations
+        self.display_results(filtered, layout=layout, positions=positions)
+        live_changes, self.search_live_changes = self.search_live_changes, None
+        if live_changes:
+            self.patch_results(live_changes)
+        if self.catalog_loading:
+            self.status_bar.config(text=f"⏳ Loading stations... {len(self.engine)} so far, "
+                                        f"{len(self.filtered_stations)} found within {query[2]:.0f} km")
+        elif query[4] is not None:
+            self.status_bar.config(text=f"🛣️ {len(self.filtered_stations)} stations within {query[2]:.0f} km of route {query[4].name}")
+        elif query[6] is not None:
+            self.status_bar.config(text=f"🔍 {len(self.filtered_stations)} stations matching \"{query[6]}\" within {query[2]:.0f} km")
+        else:
+            found = "Nearest" if query[3] is not None else "Found"
+            self.status_bar.config(text=f"🔍 {found} {len(self.filtered_stations)} stations within {query[2]:.0f} km")
+    
+    def open_route(self):
+        from tkinter import filedialog
+        path = filedialog.askopenfilename(title="Open route",
+                                          filetypes=[("Routes", "*.gpx *.geojson *.json"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            self.route = load_route(path)
+        except (OSError, RouteError) as e:
+            messagebox.showerror("Route Error", str(e))
+            return
+        self.route_btn.config(text=f"🛣️ {self.route.name} ({self.route.length_km:.0f} km)")
+        self.start_search(self.current_lat, self.current_lon)
+    
+    def clear_route(self):
+        if self.route is None:
+            return
+        self.route = None
+        self.route_btn.config(text="🛣️ Search Along Route")
+        self.debounced_search()
+    
+    @METRICS.instrument('apply_filters')
+    def apply_filters(self, keep_scroll=False):
+        open_at = self.last_query[5] if self.last_query else None
+        keep = self.engine.matches(self.result_rows, self.access_var.get(), self.power_var.get(), open_at=open_at)
+        if self.result_text_mask is not None:
+            keep &= self.result_text_mask
+        positions = np.flatnonzero(keep)
+        filtered = [self.filtered_stations[i] for i in positions.tolist()]
+        self.display_results(filtered, keep_scroll, positions=positions)
+    
+    def rerank_results(self, *args):
+        """Re-estimate and re-order the current results after a vehicle or sort change"""
+        if self.last_query is not None:
+            self.apply_filters()
+    
+    def vehicle_profile(self) -> VehicleProfile:
+        values = {key: entry.get() for key, entry in self.vehicle_entries.items()}
+        connectors = values.pop("connectors").replace(',', ';').split(';')
+        return VehicleProfile(connectors=connectors, **{key: float(value) for key, value in values.items()})
+    
+    @METRICS.instrument('display_results')
+    def display_results(self, stations, keep_scroll=False, layout=None, positions=None):
+        """Show stations; positions (their indexes in result_rows) lets them be estimated and ranked for the vehicle"""
+        estimates = None
+        if positions is not None and len(positions):
+            try:
+                profile = self.vehicle_profile()
+            except ValueError as e:
+                self.status_bar.config(text=f"❌ Vehicle: {str(e)}")
+            else:
+                with METRICS.timer('rank_results'):
+                    estimator = ChargeEstimator(self.engine, self.result_rows[positions],
+                                                np.asarray(self.result_distances)[positions])
+                    order, charge = estimator.rank(profile, self.RANKINGS[self.sort_var.get()])
+                if self.sort_var.get() != "Distance":
+                    stations = [stations[i] for i in order.tolist()]
+                    layout = None
+                order = order.tolist()
+                estimates = lambda index: charge.to_dict(order[index])
         self.results_count.config(text=f"{len(stations)} stations found")
+        self.results_list.set_items(stations, keep_scroll, layout, estimates)
+    
+    def start_live_feed(self, spec):
+        """Follow slot/status updates from a JSON-lines file or udp:PORT"""
+        try:
+            source = open_source(spec)
+        except ValueError as e:
+            messagebox.showwarning("Live Feed", f"Invalid feed {spec}: {str(e)}")
+            return
+        # Batches arrive on the feed thread; apply them on the Tk thread
+        self.live_feed = LiveFeed(source, lambda batch: self.root.after(0, self.apply_live_updates, batch)).start()
+        self.status_indicator.config(text="🟢 Live")
+    
+    @METRICS.instrument('apply_live_updates')
+    def apply_live_updates(self, batch):
+        """Apply a batch of live updates in place and patch only the affected results"""
+        changed = []
+        with self.engine_lock:
+            for update in batch:
+                row = self.engine.update_availability(update['id'], update.get('available_slots'), update.get('status'))
+                if row is not None:
+                    changed.append(row)
+        if self.search_live_changes is not None:
+            self.search_live_changes.extend(changed)
+        if changed and self.last_query is not None:
+            self.patch_results(changed)
+    
+    def patch_results(self, changed):
+        """Bring the current results up to date with the engine for the given rows"""
+        lat, lon, radius, k, route, _, text = self.last_query
+        if k is not None and len(self.result_distances) >= k:
+            # A newly free station only matters if it beats the current k-th nearest
+            radius = min(radius, self.result_distances[-1])
+        position = {row: i for i, row in enumerate(self.result_rows.tolist())}
+        removed = set()
+        added = []
+        patched = set()
+        for row in dict.fromkeys(changed):
+            station = self.engine.stations[row]
+            i = position.get(row)
+            if i is None:
+                if station.available_slots > 0 and route is not None:
+                    if route.near_bounds(station.latitude, station.longitude, radius):
+                        added.append((None, row))
+                elif station.available_slots > 0:
+                    distance = self.engine.distance_to(row, lat, lon)
+                    if distance <= radius:
+                        added.append((distance, row))
+            elif station.available_slots > 0:
+                # Results are views of the engine's records, so they already show the new state
+                patched.add(id(self.filtered_stations[i]))
+            else:
+                removed.add(i)
+        
+        if (removed or added) and (k is not None or route is not None or text is not None):
+            # Top-k, corridor and text results are cheap to recompute but awkward to patch; just search again
+            self.start_search(lat, lon)
+        elif removed or added:
+            # Keep results in the order radius_query would return them
+            entries = [(d, r, s) for i, (d, r, s) in enumerate(zip(self.result_distances, self.result_rows.tolist(),
+                                                                   self.filtered_stations)) if i not in removed]
+            for distance, row in added:
+                station = self.engine.materialize(np.array([row], dtype=np.intp), np.array([distance]))[0]
+                bisect.insort(entries, (distance, row, station), key=lambda e: (e[0], e[1]))
+            self.result_distances = [e[0] for e in entries]
+            self.result_rows = np.array([e[1] for e in entries], dtype=np.intp)
+            self.result_text_mask = None
+            self.filtered_stations = [e[2] for e in entries]
+            self.apply_filters(keep_scroll=True)
+        elif patched:
+            self.results_list.refresh_stations(patched)
+    
+    @METRICS.instrument('show_map')
+    def show_map(self):
+        if not self.filtered_stations:
+            messagebox.showinfo("No Stations", "Please search for stations first")
+            return
         
-        for i, station in enumerate(stations):
-            self.create_station_card(station, i)
+        try:
+            lat = self.current_lat or 9.9312
+            lon = self.current_lon or 76.2673
+            
+            route = self.last_query[4] if self.last_query else None
+            path = render_map(self.filtered_stations, lat, lon, self.map_cache, route)
+            import webbrowser
+            webbrowser.open(f'file://{path}')
+            self.status_bar.config(text="🗺️ Map opened in browser")
+            
+        except Exception as e:
+            messagebox.showerror("Map Error", f"Failed to create map: {str(e)}")
     
-    def create_station_card(self, station, index):
-        card = tk.Frame(self.results_frame, bg='#3a3a3a', relief='flat', borderwidth=1)
-        card.pack(fill='x', padx=20, pady=10)
+    def open_provider_registration(self):
+        ProviderRegistrationWindow(self.root, self)
+    
+    def open_diagnostics(self):
+        DiagnosticsWindow(self.root, METRICS)
+
+class StationCard:
+    """Result card whose widgets are built once and reconfigured per station"""
+    
+    def __init__(self, canvas, colors, fonts):
+        self.station = None
+        self.estimate = None
+        bg = '#3a3a3a'
+        self.frame = tk.Frame(canvas, bg=bg, relief='flat', borderwidth=1)
         
-        header_frame = tk.Frame(card, bg='#3a3a3a')
+        header_frame = tk.Frame(self.frame, bg=bg)
         header_frame.pack(fill='x', padx=15, pady=(15, 10))
         
-        icon_map = {"public": "🏢", "private": "🏠", "provider": "👤"}
-        icon = icon_map.get(station.get('access_type'), "🔋")
-        
-        name_label = tk.Label(header_frame, text=f"{icon} {station['name']}", 
-                            font=self.fonts['heading'], fg=self.colors['text'], bg='#3a3a3a')
-        name_label.pack(side='left')
+        self.name_label = tk.Label(header_frame, font=fonts['heading'], fg=colors['text'], bg=bg)
+        self.name_label.pack(side='left')
         
-        distance_badge = tk.Label(header_frame, text=f"{station['distance_km']} km", 
-                                font=self.fonts['button'], fg='#000000', bg=self.colors['accent'],
-                                relief='flat')
-        distance_badge.pack(side='right')
+        self.distance_badge = tk.Label(header_frame, font=fonts['button'], fg='#000000', bg=colors['accent'],
+                                     relief='flat')
+        self.distance_badge.pack(side='right')
         
-        address_label = tk.Label(card, text=f"📍 {station['address']}", 
-                               font=self.fonts['normal'], fg=self.colors['text_secondary'], bg='#3a3a3a')
-        address_label.pack(anchor='w', padx=15, pady=(0, 5))
+        self.address_label = tk.Label(self.frame, font=fonts['normal'], fg=colors['text_secondary'], bg=bg)
+        self.address_label.pack(anchor='w', padx=15, pady=(0, 5))
         
-        details_frame = tk.Frame(card, bg='#3a3a3a')
+        details_frame = tk.Frame(self.frame, bg=bg)
         details_frame.pack(fill='x', padx=15, pady=(0, 10))
         
-        row1 = tk.Frame(details_frame, bg='#3a3a3a')
+        row1 = tk.Frame(details_frame, bg=bg)
         row1.pack(fill='x', pady=2)
         
-        tk.Label(row1, text=f"🔌 {station['available_slots']}/{station['total_slots']} slots", 
-                font=self.fonts['small'], fg=self.colors['success'], bg='#3a3a3a').pack(side='left', padx=(0, 20))
-        tk.Label(row1, text=f"⚡ {station['max_power']} kW", 
-                font=self.fonts['small'], fg=self.colors['text'], bg='#3a3a3a').pack(side='left', padx=(0, 20))
-        tk.Label(row1, text=f"💰 ${station['price_per_kwh']}/kWh", 
-                font=self.fonts['small'], fg=self.colors['text'], bg='#3a3a3a').pack(side='left')
+        self.slots_label = tk.Label(row1, font=fonts['small'], fg=colors['success'], bg=bg)
+        self.slots_label.pack(side='left', padx=(0, 20))
+        self.power_label = tk.Label(row1, font=fonts['small'], fg=colors['text'], bg=bg)
+        self.power_label.pack(side='left', padx=(0, 20))
+        self.price_label = tk.Label(row1, font=fonts['small'], fg=colors['text'], bg=bg)
+        self.price_label.pack(side='left')
         
-        row2 = tk.Frame(details_frame, bg='#3a3a3a')
+        row2 = tk.Frame(details_frame, bg=bg)
         row2.pack(fill='x', pady=2)
         
-        tk.Label(row2, text=f"🔧 {', '.join(station['power_types'])}", 
-                font=self.fonts['small'], fg=self.colors['text_secondary'], bg='#3a3a3a').pack(side='left', padx=(0, 20))
-        tk.Label(row2, text=f"⏰ {station.get('operating_hours', 'Unknown')}", 
-                font=self.fonts['small'], fg=self.colors['text_secondary'], bg='#3a3a3a').pack(side='left')
+        self.types_label = tk.Label(row2, font=fonts['small'], fg=colors['text_secondary'], bg=bg)
+        self.types_label.pack(side='left', padx=(0, 20))
+        self.hours_label = tk.Label(row2, font=fonts['small'], fg=colors['text_secondary'], bg=bg)
+        self.hours_label.pack(side='left', padx=(0, 20))
+        self.estimate_label = tk.Label(row2, font=fonts['small'], fg=colors['secondary'], bg=bg)
+        self.estimate_label.pack(side='left')
+        
+        # Provider specific info, packed only for registered providers
+        self.provider_frame = tk.Frame(self.frame, bg='#2a2a2a')
+        tk.Label(self.provider_frame, text="👤 Registered Provider", 
+                font=fonts['small'], fg=colors['warning'], bg='#2a2a2a').pack(anchor='w')
+        self.provider_labels = [
+            ('contact_info', "📞 {}", tk.Label(self.provider_frame, font=fonts['small'], fg=colors['text_secondary'], bg='#2a2a2a')),
+            ('pricing_model', "💳 Pricing: {}", tk.Label(self.provider_frame, font=fonts['small'], fg=colors['text_secondary'], bg='#2a2a2a')),
+            ('time_limits', "⏱️ Time Limit: {}", tk.Label(self.provider_frame, font=fonts['small'], fg=colors['text_secondary'], bg='#2a2a2a'))
+        ]
+        
+        self.item = canvas.create_window(0, 0, window=self.frame, anchor='nw', state='hidden')
+    
+    @METRICS.instrument('station_card_update')
+    def show(self, station, force=False, estimate=None):
+        if station is self.station and estimate == self.estimate and not force:
+            return
+        self.station = station
+        self.estimate = estimate
+        
+        icon_map = {"public": "🏢", "private": "🏠", "provider": "👤"}
+        icon = icon_map.get(station.get('access_type'), "🔋")
+        
+        self.name_label.config(text=f"{icon} {station['name']}")
+        self.distance_badge.config(text=f"{station['distance_km']} km")
+        self.address_label.config(text=f"📍 {station['address']}")
+        self.slots_label.config(text=f"🔌 {station['available_slots']}/{station['total_slots']} slots")
+        self.power_label.config(text=f"⚡ {station['max_power']} kW")
+        price = station['price_per_kwh']
+        self.price_label.config(text=f"💰 ${price}/kWh" if price is not None else "💰 Price n/a")
+        self.types_label.config(text=f"🔧 {', '.join(station['power_types'])}")
+        self.hours_label.config(text=f"⏰ {station.get('operating_hours', 'Unknown')}")
+        self.estimate_label.config(text=self.estimate_text(estimate))
         
-        # Provider specific info
         if station.get('access_type') == 'provider':
-            provider_frame = tk.Frame(card, bg='#2a2a2a')
-            provider_frame.pack(fill='x', padx=15, pady=(0, 15))
-            
-            tk.Label(provider_frame, text="👤 Registered Provider", 
-                    font=self.fonts['small'], fg=self.colors['warning'], bg='#2a2a2a').pack(anchor='w')
-            
-            if station.get('contact_info'):
-                tk.Label(provider_frame, text=f"📞 {station['contact_info']}", 
-                        font=self.fonts['small'], fg=self.colors['text_secondary'], bg='#2a2a2a').pack(anchor='w')
-            
-            if station.get('pricing_model'):
-                tk.Label(provider_frame, text=f"💳 Pricing: {station['pricing_model']}", 
-                        font=self.fonts['small'], fg=self.colors['text_secondary'], bg='#2a2a2a').pack(anchor='w')
-            
-            if station.get('time_limits'):
-                tk.Label(provider_frame, text=f"⏱️ Time Limit: {station['time_limits']}", 
-                        font=self.fonts['small'], fg=self.colors['text_secondary'], bg='#2a2a2a').pack(anchor='w')
+            for key, template, label in self.provider_labels:
+                label.pack_forget()
+                if station.get(key):
+                    label.config(text=template.format(station[key]))
+                    label.pack(anchor='w')
+            self.provider_frame.pack(fill='x', padx=15, pady=(0, 15))
+        else:
+            self.provider_frame.pack_forget()
     
-    def show_map(self):
-        if not self.filtered_stations:
-            messagebox.showinfo("No Stations", "Please search for stations first")
+    @staticmethod
+    def estimate_text(estimate) -> str:
+        if estimate is None:
+            return ""
+        text = f"🔋 {estimate['minutes']:.0f} min"
+        if estimate['cost'] is not None:
+            text += f" · ${estimate['cost']:.2f}"
+        if estimate['truncated']:
+            text += f" · ⚠️ time limit, {estimate['soc_reached']:.0f}%"
+        return text
+
+
+class VirtualResultsList:
+    """Scrollable results list that only materializes cards for the visible rows.
+    
+    Rows have fixed heights so their offsets are known without rendering; cards
+    scrolled out of view go back to a pool and are reconfigured for the next
+    rows that come into view.
+    """
+    
+    CARD_HEIGHT = 150
+    PROVIDER_CARD_HEIGHT = 240
+    CARD_GAP = 20
+    CARD_PADX = 20
+    OVERSCAN = 2
+    
+    def __init__(self, parent, colors, fonts):
+        self.colors = colors
+        self.fonts = fonts
+        self.items = []
+        self.estimates = None
+        self.offsets = [0]
+        self.heights = []
+        self.visible = {}
+        self.pool = []
+        
+        self.canvas = tk.Canvas(parent, bg=colors['card'], highlightthickness=0)
+        scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        
+        self.canvas.pack(side="left", fill="both", expand=True, padx=20, pady=(0, 20))
+        scrollbar.pack(side="right", fill="y", padx=(0, 20), pady=(0, 20))
+        
+        self.canvas.bind("<Configure>", lambda e: self.render())
+        self.canvas.bind("<Enter>", self._bind_wheel)
+        self.canvas.bind("<Leave>", self._unbind_wheel)
+        
+        self.empty_item = self.canvas.create_window(0, 0, window=self._create_empty_state(), anchor='nw')
+    
+    def _create_empty_state(self):
+        empty_frame = tk.Frame(self.canvas, bg=self.colors['card'])
+        
+        tk.Label(empty_frame, text="🔋", font=('Segoe UI', 48), 
+                fg=self.colors['text_secondary'], bg=self.colors['card']).pack(pady=(100, 0))
+        tk.Label(empty_frame, text="No stations found", 
+                font=self.fonts['heading'], fg=self.colors['text_secondary'], bg=self.colors['card']).pack(pady=10)
+        tk.Label(empty_frame, text="Register as a provider or search for nearby stations", 
+                font=self.fonts['normal'], fg=self.colors['text_secondary'], bg=self.colors['card']).pack()
+        return empty_frame
+    
+    def _bind_wheel(self, event):
+        self.canvas.bind_all("<MouseWheel>", self._on_wheel)
+        self.canvas.bind_all("<Button-4>", self._on_wheel)
+        self.canvas.bind_all("<Button-5>", self._on_wheel)
+    
+    def _unbind_wheel(self, event):
+        self.canvas.unbind_all("<MouseWheel>")
+        self.canvas.unbind_all("<Button-4>")
+        self.canvas.unbind_all("<Button-5>")
+    
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.yview('scroll', -1, 'units')
+        else:
+            self.yview('scroll', 1, 'units')
+    
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.render()
+    
+    @classmethod
+    def layout(cls, stations):
+        """Row heights and offsets for stations; pure, so it can be computed off the Tk thread"""
+        heights = [cls.PROVIDER_CARD_HEIGHT if s.get('access_type') == 'provider' else cls.CARD_HEIGHT
+                   for s in stations]
+        offsets = list(itertools.accumulate((h + cls.CARD_GAP for h in heights), initial=0))
+        return heights, offsets
+    
+    def set_items(self, stations, keep_scroll=False, layout=None, estimates=None):
+        """Show a new result list, reusing the existing cards; estimates(index) gives a row's charging estimate"""
+        self.items = list(stations)
+        self.estimates = estimates
+        self.heights, self.offsets = layout or self.layout(self.items)
+        
+        # Cards still showing a station that stays in the list are kept as they are
+        previous = {id(card.station): card for card in self.visible.values()}
+        self.visible = {}
+        
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), self.offsets[-1]))
+        if not keep_scroll:
+            self.canvas.yview_moveto(0)
+        self.render(previous)
+    
+    def refresh(self, indexes=None):
+        """Reconfigure visible cards whose station changed in place"""
+        for index, card in self.visible.items():
+            if indexes is None or index in indexes:
+                card.show(self.items[index], force=True, estimate=self.estimate(index))
+    
+    def refresh_stations(self, station_ids):
+        """Reconfigure the visible cards showing any of the given station objects (by id())"""
+        for index, card in self.visible.items():
+            if id(card.station) in station_ids:
+                card.show(card.station, force=True, estimate=self.estimate(index))
+    
+    def estimate(self, index):
+        return self.estimates(index) if self.estimates else None
+    
+    @METRICS.instrument('results_list_render')
+    def render(self, previous=None):
+        previous = previous or {}
+        if not self.items:
+            for card in previous.values():
+                self.canvas.itemconfigure(card.item, state='hidden')
+                self.pool.append(card)
+            self.canvas.itemconfigure(self.empty_item, state='normal', width=self.canvas.winfo_width())
             return
+        self.canvas.itemconfigure(self.empty_item, state='hidden')
+        
+        top = self.canvas.canvasy(0)
+        bottom = top + max(self.canvas.winfo_height(), 1)
+        first = max(bisect.bisect_right(self.offsets, top) - 1 - self.OVERSCAN, 0)
+        last = min(bisect.bisect_left(self.offsets, bottom) + self.OVERSCAN, len(self.items))
+        
+        for index in [i for i in self.visible if i < first or i >= last]:
+            card = self.visible.pop(index)
+            self.canvas.itemconfigure(card.item, state='hidden')
+            self.pool.append(card)
+        
+        width = max(self.canvas.winfo_width() - 2 * self.CARD_PADX, 1)
+        for index in range(first, last):
+            card = self.visible.get(index)
+            if card is None:
+                card = previous.pop(id(self.items[index]), None)
+            if card is None:
+                card = self.pool.pop() if self.pool else StationCard(self.canvas, self.colors, self.fonts)
+            self.visible[index] = card
+            card.show(self.items[index], estimate=self.estimate(index))
+            self.canvas.coords(card.item, self.CARD_PADX, self.offsets[index] + self.CARD_GAP // 2)
+            self.canvas.itemconfigure(card.item, state='normal', width=width, height=self.heights[index])
+        
+        for card in previous.values():
+            self.canvas.itemconfigure(card.item, state='hidden')
+            self.pool.append(card)
+
+class DiagnosticsWindow:
+    """Live view of the per-stage latency histograms and counters"""
+    
+    REFRESH_MS = 1000
+    
+    def __init__(self, parent, metrics):
+        self.metrics = metrics
+        self.window = tk.Toplevel(parent)
+        self.window.title("Diagnostics")
+        self.window.geometry("860x520")
+        self.window.configure(bg='#1e1e1e')
         
-        try:
-            lat = self.current_lat or 9.9312
-            lon = self.current_lon or 76.2673
-            
-            m = folium.Map(location=[lat, lon], zoom_start=12)
-            
-            folium.Marker([lat, lon], popup="Your Location",
-                         icon=folium.Icon(color='blue', icon='user', prefix='fa')).add_to(m)
-            
-            for station in self.filtered_stations:
-                color_map = {"public": "green", "private": "orange", "provider": "purple"}
-                color = color_map.get(station.get('access_type'), "blue")
-                
-                popup_html = f"""
-                <b>{station['name']}</b><br>
-                {station['address']}<br>
-                Distance: {station['distance_km']} km<br>
-                Available: {station['available_slots']}/{station['total_slots']} slots<br>
-                Power: {station['max_power']} kW<br>
-                Price: ${station['price_per_kwh']}/kWh
-                """
-                
-                folium.Marker([station['latitude'], station['longitude']],
-                             popup=folium.Popup(popup_html, max_width=300),
-                             icon=folium.Icon(color=color, icon='bolt', prefix='fa')).add_to(m)
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.html', mode='w') as f:
-                m.save(f.name)
-                webbrowser.open(f'file://{f.name}')
-                self.status_bar.config(text="🗺️ Map opened in browser")
-            
-        except Exception as e:
-            messagebox.showerror("Map Error", f"Failed to create map: {str(e)}")
+        controls = tk.Frame(self.window, bg='#1e1e1e')
+        controls.pack(fill='x', padx=20, pady=(20, 10))
+        
+        self.enabled_var = tk.BooleanVar(value=metrics.enabled)
+        tk.Checkbutton(controls, text="Collect metrics", variable=self.enabled_var, command=self.toggle,
+                      font=('Segoe UI', 10), fg='#ffffff', bg='#1e1e1e', selectcolor='#404040').pack(side='left')
+        self.alloc_var = tk.BooleanVar(value=metrics.track_allocations)
+        tk.Checkbutton(controls, text="Track allocations", variable=self.alloc_var, command=self.toggle,
+                      font=('Segoe UI', 10), fg='#ffffff', bg='#1e1e1e', selectcolor='#404040').pack(side='left', padx=(15, 0))
+        
+        for text, command in [("⬇️ Prometheus", lambda: self.export('prometheus')),
+                              ("⬇️ JSON", lambda: self.export('json')),
+                              ("🔄 Reset", self.metrics.reset)]:
+            tk.Button(controls, text=text, font=('Segoe UI', 10, 'bold'), fg='#000000', bg='#4a9eff',
+                     command=command).pack(side='right', padx=(10, 0))
+        
+        self.text = tk.Text(self.window, font=('Consolas', 10), bg='#2d2d2d', fg='#ffffff',
+                           relief='flat', wrap='none')
+        self.text.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        
+        self.refresh()
     
-    def open_provider_registration(self):
-        ProviderRegistrationWindow(self.root, self)
+    def toggle(self):
+        self.metrics.enabled = self.enabled_var.get()
+        self.metrics.track_allocations = self.alloc_var.get()
+    
+    def format_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        lines = [f"{'stage':<24}{'count':>8}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}{'blocks/call':>13}"]
+        for name, stats in snapshot['stages'].items():
+            lines.append(f"{name:<24}{stats['count']:>8}{stats['p50_ms']:>11.3f}{stats['p95_ms']:>11.3f}"
+                         f"{stats['p99_ms']:>11.3f}{stats['max_ms']:>11.3f}{stats['allocated_blocks_per_call']:>13.1f}")
+        if snapshot['counters']:
+            lines.append("")
+            for name, value in snapshot['counters'].items():
+                lines.append(f"{name:<24}{value:>8}")
+        return "\n".join(lines)
+    
+    def refresh(self):
+        if not self.window.winfo_exists():
+            return
+        self.text.config(state='normal')
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', self.format_snapshot())
+        self.text.config(state='disabled')
+        self.window.after(self.REFRESH_MS, self.refresh)
+    
+    def export(self, fmt):
+        from tkinter import filedialog
+        extension = '.prom' if fmt == 'prometheus' else '.json'
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=extension,
+                                            initialfile=f"ev_metrics{extension}")
+        if not path:
+            return
+        with open(path, 'w') as f:
+            f.write(self.metrics.to_prometheus() if fmt == 'prometheus' else self.metrics.to_json())
+
 
 class ProviderRegistrationWindow:
     def __init__(self, parent, main_app):
@@ -730,8 +1406,7 @@ class ProviderRegistrationWindow:
     
     def register_provider(self):
         try:
-            provider_data = {
-                "id": 1000 + len(self.main_app.registered_providers),
+            provider_data = validate_provider({
                 "name": self.entries["name"].get(),
                 "address": self.entries["address"].get(),
                 "contact_info": self.entries["contact_info"].get(),
@@ -745,14 +1420,10 @@ class ProviderRegistrationWindow:
                 "price_per_kwh": float(self.entries["price_per_kwh"].get()),
                 "pricing_model": self.entries["pricing_model"].get(),
                 "time_limits": self.entries["time_limits"].get(),
-                "operating_hours": self.entries["operating_hours"].get(),
-                "status": "available",
-                "registered_date": datetime.now().isoformat()
-            }
+                "operating_hours": self.entries["operating_hours"].get()
+            }, 1)
             
-            self.main_app.registered_providers.append(provider_data)
-            self.main_app.save_providers()
-            self.main_app.load_all_stations()
+            self.main_app.register_providers([provider_data])
             
             messagebox.showinfo("Success", "Your charging station has been registered successfully!")
             self.window.destroy()
@@ -761,8 +1432,18 @@ class ProviderRegistrationWindow:
             messagebox.showerror("Registration Error", f"Failed to register: {str(e)}")
 
 def main():
+    parser = argparse.ArgumentParser(description="EV Charging Station Finder")
+    # Optional external datasets (CSV / JSON / Open Charge Map exports) to load alongside the built-in catalog
+    parser.add_argument("datasets", nargs="*")
+    parser.add_argument("--feed", help="live availability updates: a JSON-lines file to follow, or udp:PORT")
+    parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH,
+                        help="binary catalog snapshot for fast restarts with datasets (default: %(default)s)")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_const", const=None,
+                        help="always import the datasets")
+    args = parser.parse_args()
+    
     root = tk.Tk()
-    app = EVChargingWithProviders(root)
+    app = EVChargingWithProviders(root, dataset_files=args.datasets, feed=args.feed, snapshot=args.snapshot)
     root.mainloop()
 
 if __name__ == "__main__":
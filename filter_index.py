@@ -0,0 +1,83 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class BitmapIndex:
+    """Per-value boolean row masks for the categorical station fields.
+
+    Each (field, value) pair owns a bool array with one entry per catalog row,
+    so a filter is an AND of masks gathered at the radius-candidate rows
+    instead of another scan over station dicts. power_types is multi-valued:
+    a station sets the mask of every connector it lists.
+    """
+
+    FIELDS = ('access_type', 'power_types', 'status', 'owner_type')
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.capacity = capacity
+        self.masks: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.size = 0
+        self.masks.clear()
+
+    def _grow(self, needed):
+        if needed <= self.capacity:
+            return
+        while self.capacity < needed:
+            self.capacity *= 2
+        for key, mask in self.masks.items():
+            grown = np.zeros(self.capacity, dtype=bool)
+            grown[:self.size] = mask[:self.size]
+            self.masks[key] = grown
+
+    def _mask(self, field, value):
+        mask = self.masks.get((field, value))
+        if mask is None:
+            mask = self.masks[(field, value)] = np.zeros(self.capacity, dtype=bool)
+        return mask
+
+    def _values(self, station, field):
+        value = getattr(station, field)
+        if value is None:
+            return []
+        if isinstance(value, (list, tuple)):
+            return value
+        return [value]
+
+    def add(self, row, station):
+        self._grow(row + 1)
+        self.size = max(self.size, row + 1)
+        for field in self.FIELDS:
+            for value in self._values(station, field):
+                self._mask(field, value)[row] = True
+
+    def update(self, row, field, old_value, new_value):
+        """Move a row between the masks of a single-valued field"""
+        if old_value is not None and (field, old_value) in self.masks:
+            self.masks[(field, old_value)][row] = False
+        if new_value is not None:
+            self._mask(field, new_value)[row] = True
+
+    def values(self, field) -> List[str]:
+        return sorted(v for f, v in self.masks if f == field and self.masks[(f, v)][:self.size].any())
+
+    def mask(self, field, value) -> np.ndarray:
+        mask = self.masks.get((field, value))
+        if mask is None:
+            return np.zeros(self.size, dtype=bool)
+        return mask[:self.size]
+
+    def matches(self, rows, **filters) -> np.ndarray:
+        """Boolean array saying which of rows pass every filter; 'all' or None means unfiltered"""
+        keep = np.ones(len(rows), dtype=bool)
+        for field, value in filters.items():
+            if value is None or value == "all":
+                continue
+            keep &= self.mask(field, value)[rows]
+        return keep
@@ -0,0 +1,131 @@
+"""IP geolocation raced across several providers, with an on-disk cache.
+
+All providers are queried at once over a shared pooled session and the first
+valid answer wins, so one slow service no longer delays startup. The answer
+is cached with a TTL so later launches don't need the network at all.
+"""
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from instrumentation import METRICS
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'ev_charging', 'location.json')
+DEFAULT_TTL = 6 * 3600
+
+
+class LocationError(Exception):
+    pass
+
+
+def parse_ipinfo(data) -> Optional[Dict]:
+    if 'loc' not in data:
+        return None
+    lat, lon = data['loc'].split(',')
+    return {"lat": float(lat), "lon": float(lon),
+            "city": data.get('city', 'Unknown'), "country": data.get('country', 'Unknown')}
+
+
+def parse_ipapi(data) -> Optional[Dict]:
+    if data.get('latitude') is None or data.get('longitude') is None:
+        return None
+    return {"lat": float(data['latitude']), "lon": float(data['longitude']),
+            "city": data.get('city', 'Unknown'), "country": data.get('country_name', data.get('country', 'Unknown'))}
+
+
+class LocationProvider:
+    def __init__(self, name, url, parse: Callable[[Dict], Optional[Dict]]):
+        self.name = name
+        self.url = url
+        self.parse = parse
+
+
+DEFAULT_PROVIDERS = [
+    LocationProvider('ipinfo', 'https://ipinfo.io/json', parse_ipinfo),
+    LocationProvider('ipapi', 'https://ipapi.co/json/', parse_ipapi),
+]
+
+
+class GeoLocator:
+    def __init__(self, providers: Optional[List[LocationProvider]] = None,
+                 cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, timeout=5):
+        self.providers = providers if providers is not None else DEFAULT_PROVIDERS
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.timeout = timeout
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(self.providers) or 1, pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def cached(self) -> Optional[Dict]:
+        """Cached location if it is younger than the TTL"""
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path, 'r') as f:
+                entry = json.load(f)
+            if time.time() - entry['timestamp'] <= self.ttl:
+                return entry['location']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _store(self, location):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({"timestamp": time.time(), "location": location}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def _query(self, provider) -> Optional[Dict]:
+        response = self.session.get(provider.url, timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        location = provider.parse(response.json())
+        if location:
+            location['source'] = provider.name
+        return location
+
+    @METRICS.instrument('detect_location')
+    def locate(self, use_cache=True) -> Dict:
+        """Location from the cache, else the first provider to give a valid answer"""
+        if use_cache:
+            location = self.cached()
+            if location:
+                return location
+
+        executor = ThreadPoolExecutor(max_workers=max(len(self.providers), 1))
+        try:
+            pending = {executor.submit(self._query, p) for p in self.providers}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        location = future.result()
+                    except Exception:
+                        continue
+                    if location:
+                        self._store(location)
+                        return location
+        finally:
+            # Don't wait for slower providers once we have an answer
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise LocationError("No location data received")
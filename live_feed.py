@@ -0,0 +1,168 @@
+"""Live slot/status updates from charger telemetry.
+
+Updates are JSON objects, one per line:
+
+    {"id": 3, "available_slots": 0, "status": "open"}
+
+They can arrive by appending to a file (FileTailSource) or as UDP datagrams
+on localhost (UDPSource). LiveFeed reads them on a background thread,
+coalesces repeated updates for the same station and hands batches to a
+callback, which is expected to apply them to the engine in place.
+
+    python live_feed.py send --port 9876 '{"id": 3, "available_slots": 0}'
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from instrumentation import METRICS
+
+
+def parse_update(line) -> Optional[Dict]:
+    """The update on a line, or None if it is malformed or names a station by anything but an int or str id"""
+    try:
+        update = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(update, dict) or not isinstance(update.get('id'), (int, str)) or isinstance(update['id'], bool):
+        return None
+    if 'available_slots' not in update and 'status' not in update:
+        return None
+    slots = update.get('available_slots')
+    if slots is not None and (not isinstance(slots, int) or isinstance(slots, bool)):
+        return None
+    status = update.get('status')
+    if status is not None and not isinstance(status, str):
+        return None
+    return update
+
+
+class FileTailSource:
+    """Follow a JSON-lines file like tail -f, starting at its current end"""
+
+    def __init__(self, path, poll_interval=0.1, from_start=False):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.from_start = from_start
+
+    def lines(self, stop: threading.Event) -> Iterator[Optional[str]]:
+        """Yield complete lines as they are appended; None when idle"""
+        while not os.path.exists(self.path):
+            if stop.wait(self.poll_interval):
+                return
+        with open(self.path, 'r') as f:
+            if not self.from_start:
+                f.seek(0, os.SEEK_END)
+            partial = ''
+            while not stop.is_set():
+                chunk = f.readline()
+                if not chunk:
+                    yield None
+                    stop.wait(self.poll_interval)
+                    continue
+                partial += chunk
+                if partial.endswith('\n'):
+                    yield partial
+                    partial = ''
+
+
+class UDPSource:
+    """Receive JSON-lines datagrams on a local UDP port"""
+
+    def __init__(self, host='127.0.0.1', port=9876, poll_interval=0.1):
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+
+    def lines(self, stop: threading.Event) -> Iterator[Optional[str]]:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((self.host, self.port))
+            sock.settimeout(self.poll_interval)
+            while not stop.is_set():
+                try:
+                    data, _ = sock.recvfrom(65536)
+                except socket.timeout:
+                    yield None
+                    continue
+                for line in data.decode('utf-8', errors='replace').splitlines():
+                    yield line
+        finally:
+            sock.close()
+
+
+def open_source(spec):
+    """'udp:PORT' or 'udp:HOST:PORT' for a UDP source, anything else is a file to tail"""
+    if spec.startswith('udp:'):
+        parts = spec.split(':')
+        if len(parts) == 3:
+            return UDPSource(parts[1], int(parts[2]))
+        return UDPSource(port=int(parts[1]))
+    return FileTailSource(spec)
+
+
+class LiveFeed:
+    def __init__(self, source, on_batch: Callable[[List[Dict]], None], max_batch=500, flush_interval=0.1):
+        self.source = source
+        self.on_batch = on_batch
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        pending: Dict = {}
+        last_flush = time.monotonic()
+        for line in self.source.lines(self._stop):
+            if line is not None:
+                update = parse_update(line)
+                if update is None:
+                    METRICS.incr('live_updates_rejected')
+                else:
+                    # Only the latest state of each station matters
+                    merged = pending.setdefault(update['id'], {})
+                    merged.update(update)
+            now = time.monotonic()
+            if pending and (len(pending) >= self.max_batch or now - last_flush >= self.flush_interval):
+                batch = list(pending.values())
+                pending = {}
+                last_flush = now
+                METRICS.incr('live_updates', len(batch))
+                try:
+                    self.on_batch(batch)
+                except Exception as e:
+                    # One bad batch must not stop the feed for the rest of the session
+                    METRICS.incr('live_batches_failed')
+                    print(f"Live update batch failed: {e}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send live availability updates to a running app")
+    parser.add_argument("command", choices=["send"])
+    parser.add_argument("updates", nargs="+", help="JSON update objects")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9876)
+    args = parser.parse_args(argv)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.sendto("\n".join(args.updates).encode('utf-8'), (args.host, args.port))
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Load generator for station_server.py.
+
+Runs a number of client threads, each holding one keep-alive connection, that
+send a mix of radius searches, nearest-N searches and provider registrations
+from the same Kerala origins the benchmarks use. Reports throughput and
+latency percentiles per request kind:
+
+    python station_server.py --synthetic 100000 --workers 8 &
+    python load_test.py --concurrency 16 --duration 20
+    python load_test.py --requests 5000 --mix search=8,nearest=2,register=0 --output load.json
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+from urllib.parse import urlencode, urlparse
+
+from benchmark import SEARCH_RADII, generate_origins
+
+DEFAULT_MIX = "search=8,nearest=2,register=0"
+POWER_TYPES = ["all", "all", "CCS", "Type 2", "CHAdeMO"]
+ACCESS_TYPES = ["all", "all", "public", "private", "provider"]
+
+
+def parse_mix(spec) -> Dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("search", "nearest", "register"):
+            raise argparse.ArgumentTypeError(f"Unknown request kind {kind!r}")
+        mix[kind] = int(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("Request mix has no weight")
+    return mix
+
+
+def percentile(ordered, q) -> float:
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def build_request(kind, rng, origin, limit):
+    lat, lon = origin
+    if kind == "register":
+        body = json.dumps({
+            "name": f"Load test station {rng.randrange(10 ** 9)}",
+            "address": "Load test",
+            "latitude": lat,
+            "longitude": lon,
+            "total_slots": 4,
+            "available_slots": rng.randint(0, 4),
+            "power_types": [rng.choice(POWER_TYPES[2:])],
+            "max_power": 50,
+            "price_per_kwh": 0.25,
+            "operating_hours": "24/7",
+        })
+        return "POST", "/providers", body
+    params = {"lat": f"{lat:.5f}", "lon": f"{lon:.5f}", "radius": rng.choice(SEARCH_RADII),
+              "access_type": rng.choice(ACCESS_TYPES), "power_type": rng.choice(POWER_TYPES),
+              "limit": limit}
+    if kind == "nearest":
+        params["k"] = 10
+    return "GET", "/search?" + urlencode(params), None
+
+
+class Client(threading.Thread):
+    def __init__(self, host, port, mix, origins, deadline, remaining, limit, seed):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.kinds, self.weights = list(mix), list(mix.values())
+        self.origins = origins
+        self.deadline = deadline
+        self.remaining = remaining
+        self.limit = limit
+        self.rng = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def take(self) -> bool:
+        if self.deadline is not None:
+            return time.perf_counter() < self.deadline
+        with self.remaining["lock"]:
+            if self.remaining["n"] <= 0:
+                return False
+            self.remaining["n"] -= 1
+            return True
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        while self.take():
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            method, path, body = build_request(kind, self.rng, self.rng.choice(self.origins), self.limit)
+            headers = {"Content-Type": "application/json"} if body else {}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException) as e:
+                self.errors[f"{kind}: {type(e).__name__}"] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                continue
+            self.latencies[kind].append(time.perf_counter() - start)
+            if not ok:
+                self.errors[f"{kind}: HTTP {response.status}"] += 1
+        conn.close()
+
+
+def summarize(latencies, elapsed) -> Dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "rps": round(len(ordered) / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def run(url, concurrency, duration=None, requests=None, mix=None, limit=50, seed=1) -> Dict:
+    target = urlparse(url)
+    origins = generate_origins(1000, seed=seed)
+    deadline = None
+    remaining = {"lock": threading.Lock(), "n": requests or 0}
+    start = time.perf_counter()
+    if requests is None:
+        deadline = start + duration
+    clients = [Client(target.hostname, target.port or 80, mix or parse_mix(DEFAULT_MIX), origins,
+                      deadline, remaining, limit, seed + i) for i in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    by_kind = defaultdict(list)
+    errors = defaultdict(int)
+    for client in clients:
+        for kind, samples in client.latencies.items():
+            by_kind[kind].extend(samples)
+        for key, count in client.errors.items():
+            errors[key] += count
+    everything = [s for samples in by_kind.values() for s in samples]
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "total": summarize(everything, elapsed) if everything else {"requests": 0},
+        "by_kind": {kind: summarize(samples, elapsed) for kind, samples in sorted(by_kind.items())},
+        "errors": dict(errors),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a running station_server.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads, one connection each")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, help="stop after this many requests instead")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="weights, e.g. search=8,nearest=2,register=1")
+    parser.add_argument("--limit", type=int, default=50, help="stations returned per search")
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.url, args.concurrency, args.duration, args.requests, args.mix, args.limit)
+    for kind, stats in [("total", report["total"])] + list(report["by_kind"].items()):
+        if stats["requests"]:
+            print(f"  {kind:<10} {stats['requests']:>8} req {stats['rps']:>9.1f} rps   p50 {stats['p50_ms']:>8.2f} ms"
+                  f"   p95 {stats['p95_ms']:>8.2f} ms   p99 {stats['p99_ms']:>8.2f} ms   max {stats['max_ms']:>8.2f} ms",
+                  file=sys.stderr)
+    for key, count in report["errors"].items():
+        print(f"  error {key}: {count}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
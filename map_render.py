@@ -0,0 +1,209 @@
+"""Folium map rendering for search results, with an on-disk cache.
+
+Three levels of detail keep the generated page small as result sets grow:
+  * up to DETAIL_LIMIT stations: one marker per station with a full HTML popup
+  * up to CLUSTER_LIMIT: client-side clustering over a compact data array;
+    popups are built in the browser only when a marker is clicked
+  * beyond that: stations pre-aggregated into grid cells, one circle per cell
+
+Rendered pages are stored under a content hash of the origin and the station
+data shown, so repeated clicks on an unchanged result set reuse the file.
+"""
+import hashlib
+import html
+import math
+import os
+import tempfile
+from typing import Dict, List, Tuple
+
+from instrumentation import METRICS
+
+DETAIL_LIMIT = 200
+CLUSTER_LIMIT = 20000
+MAX_GRID_CELLS = 2000
+
+ACCESS_COLORS = {"public": "green", "private": "orange", "provider": "purple"}
+
+# Builds a circle marker from a compact data row [lat, lon, color, name, address,
+# distance, available, total, power, price]; the popup is rendered on click.
+CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]),
+                                {radius: 7, color: row[2], fillColor: row[2], fillOpacity: 0.8});
+    marker.bindPopup(function () {
+        var div = document.createElement('div');
+        var lines = [row[3], row[4], 'Distance: ' + row[5] + ' km',
+                     'Available: ' + row[6] + '/' + row[7] + ' slots',
+                     'Power: ' + row[8] + ' kW',
+                     row[9] === null ? 'Price: n/a' : 'Price: $' + row[9] + '/kWh'];
+        lines.forEach(function (text, i) {
+            var line = document.createElement(i === 0 ? 'b' : 'div');
+            line.textContent = text;
+            div.appendChild(line);
+        });
+        return div;
+    }, {maxWidth: 300});
+    return marker;
+}
+"""
+
+
+class MapCache:
+    """Directory of rendered map pages, evicting least recently used files past max_bytes"""
+
+    def __init__(self, directory=None, max_bytes=50 * 1024 * 1024):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'ev_charging_maps')
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.html")
+
+    def get(self, key):
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
+
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.html'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def map_key(stations, lat, lon, route=None) -> str:
+    """Content hash of everything the rendered page shows"""
+    digest = hashlib.sha256()
+    digest.update(f"{lat:.6f},{lon:.6f}".encode())
+    if route is not None:
+        digest.update(repr(route.parts).encode())
+    shown = [(s['id'], s['latitude'], s['longitude'], s['name'], s['address'],
+              s['distance_km'], s['available_slots'], s['total_slots'],
+              s['max_power'], s['price_per_kwh'], s.get('access_type')) for s in stations]
+    digest.update(repr(shown).encode())
+    return digest.hexdigest()[:32]
+
+
+def _price_text(price):
+    return "n/a" if price is None else f"${price}/kWh"
+
+
+def _add_detail_markers(m, stations):
+    import folium
+    from folium.plugins import MarkerCluster
+
+    cluster = MarkerCluster().add_to(m)
+    for station in stations:
+        color = ACCESS_COLORS.get(station.get('access_type'), "blue")
+
+        popup_html = f"""
+        <b>{html.escape(station['name'])}</b><br>
+        {html.escape(station['address'])}<br>
+        Distance: {station['distance_km']} km<br>
+        Available: {station['available_slots']}/{station['total_slots']} slots<br>
+        Power: {station['max_power']} kW<br>
+        Price: {_price_text(station['price_per_kwh'])}
+        """
+
+        folium.Marker([station['latitude'], station['longitude']],
+                      popup=folium.Popup(popup_html, max_width=300),
+                      icon=folium.Icon(color=color, icon='bolt', prefix='fa')).add_to(cluster)
+
+
+def _add_clustered_markers(m, stations):
+    from folium.plugins import FastMarkerCluster
+
+    data = [[s['latitude'], s['longitude'], ACCESS_COLORS.get(s.get('access_type'), "blue"),
+             s['name'], s['address'], s['distance_km'], s['available_slots'], s['total_slots'],
+             s['max_power'], s['price_per_kwh']] for s in stations]
+    FastMarkerCluster(data, callback=CLUSTER_CALLBACK).add_to(m)
+
+
+def aggregate_grid(stations, max_cells=MAX_GRID_CELLS) -> List[Tuple[float, float, int, int]]:
+    """Group stations into lat/lon cells: (mean lat, mean lon, stations, free slots) per cell"""
+    lats = [s['latitude'] for s in stations]
+    lons = [s['longitude'] for s in stations]
+    span = max(max(lats) - min(lats), max(lons) - min(lons), 1e-6)
+    cell = span / math.sqrt(max_cells)
+
+    cells: Dict[Tuple[int, int], List] = {}
+    for s in stations:
+        key = (math.floor(s['latitude'] / cell), math.floor(s['longitude'] / cell))
+        agg = cells.setdefault(key, [0.0, 0.0, 0, 0])
+        agg[0] += s['latitude']
+        agg[1] += s['longitude']
+        agg[2] += 1
+        agg[3] += s['available_slots']
+    return [(a[0] / a[2], a[1] / a[2], a[2], a[3]) for a in cells.values()]
+
+
+def _add_grid_cells(m, stations):
+    import folium
+
+    cells = aggregate_grid(stations)
+    largest = max(count for _, _, count, _ in cells)
+    for lat, lon, count, free_slots in cells:
+        folium.CircleMarker([lat, lon], radius=4 + 16 * math.sqrt(count / largest),
+                            color='#00ff88', fill=True, fill_opacity=0.6,
+                            tooltip=f"{count} stations, {free_slots} free slots").add_to(m)
+
+
+def build_map(stations, lat, lon, route=None):
+    import folium
+
+    m = folium.Map(location=[lat, lon], zoom_start=12)
+
+    folium.Marker([lat, lon], popup="Your Location",
+                  icon=folium.Icon(color='blue', icon='user', prefix='fa')).add_to(m)
+
+    if route is not None:
+        folium.PolyLine(route.parts, color='#4a9eff', weight=5, opacity=0.8,
+                        tooltip=html.escape(route.name)).add_to(m)
+        lat_min, lat_max, lon_min, lon_max = route.bounds
+        m.fit_bounds([[lat_min, lon_min], [lat_max, lon_max]])
+
+    if len(stations) <= DETAIL_LIMIT:
+        _add_detail_markers(m, stations)
+    elif len(stations) <= CLUSTER_LIMIT:
+        _add_clustered_markers(m, stations)
+    else:
+        _add_grid_cells(m, stations)
+    return m
+
+
+@METRICS.instrument('show_map_render')
+def render_map(stations, lat, lon, cache, route=None) -> str:
+    """Path of an HTML map for stations around (lat, lon) or along route, rendering only on a cache miss"""
+    key = map_key(stations, lat, lon, route)
+    path = cache.get(key)
+    if path:
+        METRICS.incr('map_cache_hits')
+        return path
+    METRICS.incr('map_cache_misses')
+
+    path = cache.path_for(key)
+    tmp_path = path + '.tmp'
+    build_map(stations, lat, lon, route).save(tmp_path)
+    os.replace(tmp_path, path)
+    cache.evict(keep=path)
+    return path
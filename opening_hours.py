@@ -0,0 +1,337 @@
+"""Operating hours: parsing free-text hours once, and an index for "open at" filters.
+
+Hours arrive as free text ("24/7", "10AM-10PM", "Mon-Fri 8AM-8PM; Sat 9AM-1PM",
+"22:00-06:00", "8AM-12PM, 2PM-8PM", "Sun closed"). parse_hours turns one into
+the minute-of-week intervals it is open, Monday 00:00 being minute 0;
+overnight ranges run into the next day and Sunday night wraps to Monday.
+Rules are read in order and a later rule replaces earlier hours for the
+days it names, so "Daily 8AM-8PM, Sun closed" closes Sundays. A rule with
+no days covers the whole week. Days no rule names are unknown, like
+missing hours: "Mon-Fri 8AM-8PM" says nothing about weekends, and
+"Mon closed" only closes Mondays.
+
+Catalogs repeat a handful of distinct strings, so HoursIndex parses each
+distinct string once into a week-long bitmap (one bit per minute, 1,260
+bytes) and keeps one small schedule id per station row. "Open at minute m"
+is then one bit of each schedule's bitmap gathered at the candidate rows,
+with no string handling per search. Stations with missing ("Unknown") or
+unrecognised hours are never filtered out: not knowing when a station is
+open is not a reason to hide it. Unrecognised strings are counted so they
+can be reported and fixed.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# Bytes in a packed week bitmap; a week is a whole number of bytes
+WEEK_BYTES = MINUTES_PER_WEEK // 8
+UNKNOWN_HOURS = frozenset(("", "unknown", "n/a", "na", "-", "not specified"))
+
+DAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+DAY_ALIASES = {"daily": range(7), "everyday": range(7), "all": range(7), "week": range(7),
+               "weekdays": range(5), "weekday": range(5), "weekends": (5, 6), "weekend": (5, 6)}
+# Words that carry no meaning for the schedule ("Open: Mon-Fri from 9AM to 5PM")
+FILLER_WORDS = frozenset(("open", "opens", "from", "hours", "hrs", "timings", "timing", "and", "on", "every", "day", "days"))
+
+TIME = r'(?:\d{1,2}(?:[:.]\d{2})?\s*(?:[ap]\.?m\.?)?|noon|midnight)'
+TOKENS = re.compile(rf'''
+    (?P<always>24\s*/\s*7|24\s*x\s*7|24\s*(?:hours|hrs|hr|h)\b|all\s+day|round\s+the\s+clock)
+  | (?P<range>{TIME}\s*-\s*{TIME})
+  | (?P<closed>closed|off|shut)\b
+  | (?P<days>[a-z]+(?:\s*-\s*[a-z]+)?)
+  | (?P<sep>[\s,;&|/:]+)
+''', re.VERBOSE)
+TIME_PARTS = re.compile(r'(\d{1,2})(?:[:.](\d{2}))?([ap])?m?')
+
+
+class HoursError(ValueError):
+    pass
+
+
+def _normalise(text) -> str:
+    text = text.strip().lower()
+    for dash in ('–', '—', '‒', ' to ', ' till ', ' until '):
+        text = text.replace(dash, '-')
+    return text
+
+
+def _day(word) -> int:
+    if len(word) >= 2:
+        for i, name in enumerate(DAY_NAMES):
+            if name.startswith(word):
+                return i
+    raise HoursError(f"unrecognised day {word!r}")
+
+
+def _days(token) -> List[int]:
+    words = [w.strip() for w in token.split('-')]
+    if len(words) == 1 and words[0] in DAY_ALIASES:
+        return list(DAY_ALIASES[words[0]])
+    first = _day(words[0])
+    if len(words) == 1:
+        return [first]
+    last = _day(words[1])
+    return [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+
+
+def _clock(text) -> Tuple[int, Optional[str], bool]:
+    """Minutes after midnight, the am/pm suffix ('a', 'p' or None) and whether it was a bare hour ("9")"""
+    text = text.strip()
+    if text == 'noon':
+        return 12 * 60, None, False
+    if text == 'midnight':
+        return 0, None, False
+    match = TIME_PARTS.fullmatch(text.replace(' ', '').replace('.m.', 'm').replace('.m', 'm'))
+    if match is None:
+        raise HoursError(f"unrecognised time {text!r}")
+    hour, minute, suffix = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if minute >= 60 or hour > 24 or (suffix and not 1 <= hour <= 12) or (hour == 24 and minute):
+        raise HoursError(f"invalid time {text!r}")
+    return hour * 60 + minute, suffix, suffix is None and match.group(2) is None
+
+
+def _with_suffix(minutes, suffix) -> int:
+    if suffix is None:
+        return minutes
+    minutes %= 12 * 60
+    return minutes + 12 * 60 if suffix == 'p' else minutes
+
+
+def _time_range(token) -> Tuple[int, int]:
+    """(start, end) minutes after midnight; end is past MINUTES_PER_DAY for overnight ranges"""
+    left, right = token.split('-', 1)
+    (start, start_suffix, start_bare), (end, end_suffix, end_bare) = _clock(left), _clock(right)
+    if start_suffix is None and end_suffix is not None:
+        # "6-10PM" is 6PM-10PM, but "10-2PM" is 10AM-2PM
+        start_suffix = end_suffix
+        if end_suffix == 'p' and _with_suffix(start, 'p') >= _with_suffix(end, 'p'):
+            start_suffix = 'a'
+    elif end_suffix is None and start_suffix is not None:
+        # "9AM-5" is 9AM-5PM
+        end_suffix = start_suffix
+        if start_suffix == 'a' and _with_suffix(end, 'a') <= _with_suffix(start, 'a'):
+            end_suffix = 'p'
+    start, end = _with_suffix(start, start_suffix), _with_suffix(end, end_suffix)
+    if start_bare and end_bare and start <= 12 * 60 and end <= start:
+        # Bare hours like "9-5" are a working day, not an overnight shift
+        end += 12 * 60
+    if start >= MINUTES_PER_DAY:
+        raise HoursError(f"invalid range {token!r}")
+    if end <= start:
+        # Overnight ("10PM-6AM"), or the same time at both ends for a full day
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def parse_hours(text) -> Tuple[Tuple[int, int], ...]:
+    """Minute-of-week [start, end) intervals a station is open, sorted and merged.
+
+    Raises HoursError for text it cannot read. Missing hours are not an error
+    but unknown; check with is_unknown() first. Days the text does not name
+    have no intervals here; parse_week also says which they are.
+    """
+    return parse_week(text)[0]
+
+
+def parse_week(text) -> Tuple[Tuple[Tuple[int, int], ...], Tuple[int, ...]]:
+    """parse_hours' intervals, and the days (0 = Monday) no rule names, whose hours are unknown"""
+    text = _normalise(text)
+    rules: List[Tuple[List[int], List[Tuple[int, int]], bool]] = []
+    days: List[int] = []
+    ranges: List[Tuple[int, int]] = []
+    closed = False
+    position = 0
+    for match in TOKENS.finditer(text):
+        if match.start() != position:
+            raise HoursError(f"unrecognised {text[position:match.start()]!r} in {text!r}")
+        position = match.end()
+        kind = match.lastgroup
+        token = match.group()
+        if kind == 'sep':
+            continue
+        if kind == 'days':
+            if token in FILLER_WORDS:
+                continue
+            if ranges or closed:
+                rules.append((days, ranges, closed))
+                days, ranges, closed = [], [], False
+            days.extend(_days(token))
+        elif kind == 'always':
+            ranges.append((0, MINUTES_PER_DAY))
+        elif kind == 'range':
+            ranges.append(_time_range(token))
+        elif kind == 'closed':
+            closed = True
+    if position != len(text):
+        raise HoursError(f"unrecognised {text[position:]!r} in {text!r}")
+    if ranges or closed:
+        rules.append((days, ranges, closed))
+    elif days:
+        raise HoursError(f"days without hours in {text!r}")
+    if not rules:
+        raise HoursError(f"no hours in {text!r}")
+
+    by_day: Dict[int, List[Tuple[int, int]]] = {}
+    for rule_days, rule_ranges, rule_closed in rules:
+        for day in rule_days or range(7):
+            by_day[day] = [] if rule_closed else list(rule_ranges)
+    unknown_days = tuple(day for day in range(7) if day not in by_day)
+
+    intervals = []
+    for day, day_ranges in by_day.items():
+        for start, end in day_ranges:
+            start, end = day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end
+            if end > MINUTES_PER_WEEK:
+                intervals.append((0, end - MINUTES_PER_WEEK))
+                end = MINUTES_PER_WEEK
+            intervals.append((start, end))
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return tuple(merged), unknown_days
+
+
+def is_unknown(text) -> bool:
+    return text is None or _normalise(str(text)) in UNKNOWN_HOURS
+
+
+@lru_cache(maxsize=4096)
+def hours_problem(text) -> Optional[str]:
+    """Why an hours string cannot be read, or None if it is readable or simply unknown"""
+    if is_unknown(text):
+        return None
+    try:
+        parse_hours(str(text))
+    except HoursError as e:
+        return str(e)
+    return None
+
+
+def week_mask(intervals, unknown_days=()) -> np.ndarray:
+    """Minute-of-week mask that is True while open; days with unknown hours count as open all day"""
+    mask = np.zeros(MINUTES_PER_WEEK, dtype=bool)
+    for start, end in intervals:
+        mask[start:end] = True
+    for day in unknown_days:
+        mask[day * MINUTES_PER_DAY:(day + 1) * MINUTES_PER_DAY] = True
+    return mask
+
+
+def minute_of_week(when: datetime) -> int:
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+def parse_open_at(text, now: Optional[datetime] = None) -> int:
+    """Minute of week for "now", an ISO date-time, or "[day] time" ("Sat 9PM", "18:30", today if no day)"""
+    now = now or datetime.now()
+    text = _normalise(str(text))
+    if text in ("now", "open now"):
+        return minute_of_week(now)
+    try:
+        return minute_of_week(datetime.fromisoformat(text.upper()))
+    except ValueError:
+        pass
+    day, _, rest = text.partition(' ')
+    if rest and not day[0].isdigit():
+        day_index, text = _day(day), rest
+    else:
+        day_index = now.weekday()
+    minutes, suffix, _ = _clock(text)
+    minutes = _with_suffix(minutes, suffix)
+    if minutes >= MINUTES_PER_DAY:
+        raise HoursError(f"invalid time {text!r}")
+    return day_index * MINUTES_PER_DAY + minutes
+
+
+class HoursIndex:
+    """Schedule id per station row, and a week-long open/closed bitmap per distinct schedule.
+
+    Bitmaps are np.packbits of week_mask: bit 7 - m % 8 of byte m // 8 is
+    minute m. Schedule 0 stands for unknown hours and is open all week.
+    """
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.rows = np.zeros(capacity, dtype=np.int32)
+        self.ids: Dict[str, int] = {}
+        self.week = np.full((8, WEEK_BYTES), 0xFF, dtype=np.uint8)
+        self.n_schedules = 1
+        # Unrecognised hours text -> number of stations using it
+        self.unparsed: Dict[str, int] = {}
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.size = 0
+        for text in self.unparsed:
+            self.unparsed[text] = 0
+
+    def schedule_id(self, text) -> int:
+        """Id of the schedule for an hours string, parsing it the first time it is seen"""
+        schedule = self.ids.get(text)
+        if schedule is not None:
+            return schedule
+        if is_unknown(text):
+            schedule = 0
+        else:
+            try:
+                intervals, unknown_days = parse_week(str(text))
+            except HoursError:
+                schedule = 0
+                self.unparsed.setdefault(text, 0)
+            else:
+                schedule = self.n_schedules
+                if schedule == len(self.week):
+                    grown = np.full((2 * len(self.week), WEEK_BYTES), 0xFF, dtype=np.uint8)
+                    grown[:schedule] = self.week
+                    self.week = grown
+                self.week[schedule] = np.packbits(week_mask(intervals, unknown_days))
+                self.n_schedules += 1
+        self.ids[text] = schedule
+        return schedule
+
+    def _grow(self, needed):
+        if needed <= len(self.rows):
+            return
+        capacity = max(len(self.rows), 1)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros(capacity, dtype=np.int32)
+        grown[:self.size] = self.rows[:self.size]
+        self.rows = grown
+
+    def add(self, row, text):
+        self._grow(row + 1)
+        schedule = self.schedule_id(text)
+        self.rows[row] = schedule
+        self.size = max(self.size, row + 1)
+        if text in self.unparsed:
+            self.unparsed[text] += 1
+
+    def assign(self, texts, inverse):
+        """Set every row at once: row i gets the hours texts[inverse[i]]"""
+        schedules = np.array([self.schedule_id(text) for text in texts], dtype=np.int32)
+        self.rows = schedules[inverse]
+        self.size = len(inverse)
+        counts = np.bincount(inverse, minlength=len(texts))
+        for text, count in zip(texts, counts.tolist()):
+            if text in self.unparsed:
+                self.unparsed[text] += count
+
+    def open_at(self, rows, minute) -> np.ndarray:
+        """Boolean array saying which of rows are open (or have unknown hours) at minute of the week"""
+        minute %= MINUTES_PER_WEEK
+        open_schedules = (self.week[:self.n_schedules, minute >> 3] >> (7 - (minute & 7))) & 1
+        return open_schedules.astype(bool)[self.rows[rows]]
+
+    def unparsed_counts(self) -> Dict[str, int]:
+        return {text: count for text, count in self.unparsed.items() if count}
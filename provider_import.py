@@ -0,0 +1,162 @@
+"""Batch registration of charging providers.
+
+Onboarding an apartment complex or a fleet depot means registering dozens of
+chargers at once. Rows come from a CSV, JSON array or JSON-lines file (or an
+API request body); every row is validated before anything is written, then
+the whole batch is stored in one transaction under freshly allocated ids and
+added to the live station index row by row, without a catalog rebuild.
+
+    python provider_import.py complex_chargers.csv --providers providers.db
+
+CSV columns follow the registration form: name, address, latitude,
+longitude, total_slots, available_slots, power_types (separated by ';'),
+max_power, price_per_kwh, plus optional operating_hours, pricing_model,
+time_limits, contact_info and email.
+"""
+import argparse
+import csv
+import sys
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from charging_estimate import tariff_problem
+from opening_hours import hours_problem
+from provider_store import open_provider_store
+from station_engine import provider_to_station
+from station_import import (ImportReport, InvalidRecord, _check_coordinates, _number, _power_types, detect_format,
+                            iter_json_array, iter_json_lines)
+
+OPTIONAL_FIELDS = {"operating_hours": "24/7", "pricing_model": "per_kwh", "time_limits": "no_limit",
+                   "contact_info": "", "email": ""}
+
+
+def _text(record, key) -> str:
+    value = record.get(key)
+    if value is None or not str(value).strip():
+        raise InvalidRecord(f"missing {key}")
+    return str(value).strip()
+
+
+def validate_provider(record, record_no) -> Dict:
+    """A provider record ready to store, from a form, file row or API body; any id in it is ignored"""
+    if isinstance(record, InvalidRecord):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord("not an object")
+    lat = _number(record, 'latitude')
+    lon = _number(record, 'longitude')
+    _check_coordinates(lat, lon)
+
+    power_types = _power_types(record)
+    if not power_types:
+        raise InvalidRecord("missing power_types")
+
+    total_slots = _number(record, 'total_slots', int)
+    available_slots = _number(record, 'available_slots', int, total_slots)
+    if total_slots <= 0 or not 0 <= available_slots <= total_slots:
+        raise InvalidRecord(f"invalid slots: {available_slots}/{total_slots}")
+    max_power = _number(record, 'max_power')
+    price = _number(record, 'price_per_kwh')
+    if max_power <= 0 or price < 0:
+        raise InvalidRecord(f"invalid max_power/price_per_kwh: {max_power}/{price}")
+
+    provider = {
+        "name": _text(record, 'name'),
+        "address": _text(record, 'address'),
+        "latitude": lat,
+        "longitude": lon,
+        "total_slots": total_slots,
+        "available_slots": available_slots,
+        "max_power": max_power,
+        "power_types": [str(p) for p in power_types],
+        "price_per_kwh": price,
+    }
+    for key, default in OPTIONAL_FIELDS.items():
+        value = record.get(key)
+        provider[key] = str(value).strip() if value not in (None, '') else default
+    # Providers enter their own hours, so unreadable ones are sent back rather than shown as unknown
+    problem = hours_problem(provider["operating_hours"])
+    if problem:
+        raise InvalidRecord(f"invalid operating_hours: {problem}")
+    problem = tariff_problem(provider["pricing_model"], provider["time_limits"])
+    if problem:
+        raise InvalidRecord(f"invalid tariff: {problem}")
+    provider["status"] = "available"
+    provider["registered_date"] = datetime.now().isoformat()
+    return provider
+
+
+def validate_providers(records, source="request") -> Tuple[List[Dict], ImportReport]:
+    """Validate every record; the same station (name and position) may only appear once per batch"""
+    report = ImportReport(source)
+    providers = []
+    seen = {}
+    for record_no, record in enumerate(records, 1):
+        try:
+            provider = validate_provider(record, record_no)
+            key = (provider["name"].lower(), round(provider["latitude"], 6), round(provider["longitude"], 6))
+            if key in seen:
+                raise InvalidRecord(f"duplicate: same station as record {seen[key]}")
+        except InvalidRecord as e:
+            report.reject(record_no, str(e))
+            continue
+        seen[key] = record_no
+        providers.append(provider)
+        report.accepted += 1
+    report.finish()
+    return providers, report
+
+
+def read_providers(path, fmt=None) -> Tuple[List[Dict], ImportReport]:
+    """Validated providers from a CSV, JSON array or JSON-lines file"""
+    fmt = fmt or detect_format(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            records = csv.DictReader(f)
+        elif fmt == 'jsonl':
+            records = iter_json_lines(f)
+        else:
+            records = iter_json_array(f)
+        return validate_providers(records, path)
+
+
+def register_providers(providers, store, engine=None) -> List[int]:
+    """Store validated providers in one transaction and add them to engine, if given; returns their ids"""
+    ids = store.add_new(providers)
+    if engine is not None:
+        for provider in providers:
+            engine.add_station(provider_to_station(provider))
+    return ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and register a batch of charging providers")
+    parser.add_argument("file", help="CSV, JSON array or JSON-lines file of providers")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl"], help="override format detection")
+    parser.add_argument("--providers", default="providers.db", help="provider store (.db, or legacy .json)")
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    parser.add_argument("--skip-invalid", action="store_true", help="register the valid rows even if some are rejected")
+    args = parser.parse_args(argv)
+
+    providers, report = read_providers(args.file, args.format)
+    print(report.summary())
+    for record_no, reason in report.errors:
+        print(f"  record {record_no}: {reason}")
+    if args.dry_run:
+        return
+    if report.rejected and not args.skip_invalid:
+        print("Nothing registered; fix the rejected rows or pass --skip-invalid", file=sys.stderr)
+        sys.exit(1)
+    if not providers:
+        return
+
+    store = open_provider_store(args.providers)
+    try:
+        ids = register_providers(providers, store)
+    finally:
+        store.close()
+    print(f"Registered {len(ids)} providers with ids {ids[0]}-{ids[-1]}")
+
+
+if __name__ == "__main__":
+    main()
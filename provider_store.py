@@ -0,0 +1,201 @@
+"""Persistent storage for registered charging providers.
+
+SQLiteProviderStore is the default: each registration is a single-row
+transaction in a WAL-mode database, so inserts don't rewrite the whole
+catalog and a crash mid-write leaves the previous state intact. The first
+time it opens, providers from a legacy providers.json are migrated in one
+transaction. JsonProviderStore keeps the old single-file format available
+behind the same interface.
+
+Registrations get their ids from add_new, which allocates them inside the
+insert transaction from a counter that only moves forward, so concurrent
+writers never collide and ids of removed providers are never handed out again.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+# Registered providers are numbered from here, clear of the built-in stations
+FIRST_PROVIDER_ID = 1000
+
+
+class ProviderStoreError(Exception):
+    pass
+
+
+class ProviderStore(ABC):
+    @abstractmethod
+    def load_all(self) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    def add(self, provider):
+        pass
+
+    @abstractmethod
+    def add_new(self, providers) -> List[int]:
+        """Store providers under newly allocated ids, all or none; sets and returns the ids"""
+
+    @abstractmethod
+    def update(self, provider):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonProviderStore(ProviderStore):
+    """All providers in one JSON file, replaced atomically on every write"""
+
+    def __init__(self, path):
+        self.path = path
+        self.providers = self.load_all()
+        self.next_id = FIRST_PROVIDER_ID
+
+    def load_all(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r') as f:
+                providers = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ProviderStoreError(f"Could not read {self.path}: {e}")
+        if not isinstance(providers, list):
+            raise ProviderStoreError(f"{self.path} does not contain a provider list")
+        return providers
+
+    def _write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.providers, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError):
+            os.unlink(tmp_path)
+            raise
+
+    def add(self, provider):
+        self.providers.append(provider)
+        self._write()
+
+    def add_new(self, providers) -> List[int]:
+        # Only safe against writers in this process; use the SQLite store when that matters
+        first = max([FIRST_PROVIDER_ID, self.next_id] + [p["id"] + 1 for p in self.providers if isinstance(p.get("id"), int)])
+        ids = list(range(first, first + len(providers)))
+        for provider, provider_id in zip(providers, ids):
+            provider["id"] = provider_id
+        self.providers.extend(providers)
+        try:
+            self._write()
+        except (OSError, TypeError, ValueError):
+            del self.providers[-len(providers):]
+            raise
+        self.next_id = first + len(providers)
+        return ids
+
+    def update(self, provider):
+        for i, existing in enumerate(self.providers):
+            if existing["id"] == provider["id"]:
+                self.providers[i] = provider
+                self._write()
+                return
+        raise ProviderStoreError(f"Unknown provider id {provider['id']}")
+
+
+class SQLiteProviderStore(ProviderStore):
+    """Providers as JSON documents keyed by id in a WAL-mode SQLite database"""
+
+    def __init__(self, path, legacy_json=None):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS providers (id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if legacy_json:
+            try:
+                self.migrate_json(legacy_json)
+            except (ProviderStoreError, sqlite3.Error):
+                self.conn.close()
+                raise
+
+    def migrate_json(self, json_path) -> int:
+        """Import a legacy providers.json once; returns the number of providers migrated
+
+        The old 1000 + len(providers) scheme could hand out an id twice. The first
+        provider keeps a shared id and later ones, or ones clashing with a row already
+        in the database, get fresh ids after the largest.
+        """
+        done = self.conn.execute("SELECT value FROM meta WHERE key = 'migrated_json'").fetchone()
+        if done or not os.path.exists(json_path):
+            return 0
+
+        providers = JsonProviderStore(json_path).providers
+        for number, provider in enumerate(providers, 1):
+            if not isinstance(provider, dict) or not isinstance(provider.get("id"), int) or isinstance(provider["id"], bool):
+                raise ProviderStoreError(f"{json_path}: provider {number} has no integer id")
+        seen = {provider_id for provider_id, in self.conn.execute("SELECT id FROM providers")}
+        next_id = max([FIRST_PROVIDER_ID] + [p["id"] + 1 for p in providers] + [i + 1 for i in seen])
+        for provider in providers:
+            if provider["id"] in seen:
+                provider["id"] = next_id
+                next_id += 1
+            seen.add(provider["id"])
+        with self.conn:
+            self.conn.executemany("INSERT INTO providers (id, data) VALUES (?, ?)",
+                                  [(p["id"], json.dumps(p)) for p in providers])
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_json', ?)",
+                              (os.path.abspath(json_path),))
+        return len(providers)
+
+    def load_all(self) -> List[Dict]:
+        rows = self.conn.execute("SELECT data FROM providers ORDER BY id").fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def add(self, provider):
+        try:
+            with self.conn:
+                self.conn.execute("INSERT INTO providers (id, data) VALUES (?, ?)",
+                                  (provider["id"], json.dumps(provider)))
+        except sqlite3.IntegrityError:
+            raise ProviderStoreError(f"Provider id {provider['id']} already exists")
+
+    def add_new(self, providers) -> List[int]:
+        with self.conn:
+            # Take the write lock before reading the counter so no other writer can allocate the same ids
+            self.conn.execute("BEGIN IMMEDIATE")
+            largest, = self.conn.execute("SELECT MAX(id) FROM providers").fetchone()
+            counter = self.conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+            first = max(FIRST_PROVIDER_ID, (largest or 0) + 1, int(counter[0]) if counter else 0)
+            ids = list(range(first, first + len(providers)))
+            for provider, provider_id in zip(providers, ids):
+                provider["id"] = provider_id
+            self.conn.executemany("INSERT INTO providers (id, data) VALUES (?, ?)",
+                                  [(p["id"], json.dumps(p)) for p in providers])
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)",
+                              (str(first + len(providers)),))
+        return ids
+
+    def update(self, provider):
+        with self.conn:
+            cursor = self.conn.execute("UPDATE providers SET data = ? WHERE id = ?",
+                                       (json.dumps(provider), provider["id"]))
+        if cursor.rowcount == 0:
+            raise ProviderStoreError(f"Unknown provider id {provider['id']}")
+
+    def close(self):
+        self.conn.close()
+
+
+def open_provider_store(path='providers.db', legacy_json='providers.json') -> ProviderStore:
+    """Open the store at path; a .json path selects the single-file backend"""
+    if path.endswith('.json'):
+        return JsonProviderStore(path)
+    return SQLiteProviderStore(path, legacy_json=legacy_json)
@@ -0,0 +1,137 @@
+"""LRU cache of search results with area-precise invalidation.
+
+Most searches repeat: the default Kochi origin, the default 25 km radius and
+a handful of filter combinations. Results are cached under the exact origin,
+the radius, the filters and k, so repeats cost a dictionary lookup. Origins
+are not snapped to a grid: two origins a few metres apart differ in every
+distance shown and can differ in which stations fall just inside the radius,
+so they must not share an entry.
+
+Each entry remembers its origin and reach (the radius, or the distance of
+the k-th hit for a full top-k). When a station is added or its availability
+changes, only entries whose reach covers that station are dropped; entries
+are found through a grid over their origins. The cache is bounded by entry
+count and by the bytes held in result arrays, evicting least recently used
+entries first.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+from instrumentation import METRICS
+from spatial_index import GridIndex, haversine_km
+
+MAX_ENTRIES = 256
+MAX_BYTES = 64 * 1024 * 1024
+# Rough per-entry cost of the key, the entry and the grid bookkeeping
+ENTRY_OVERHEAD = 512
+
+
+class CacheEntry:
+    __slots__ = ('lat', 'lon', 'reach', 'value', 'nbytes')
+
+    def __init__(self, lat, lon, reach, value, nbytes):
+        self.lat = lat
+        self.lon = lon
+        self.reach = reach
+        self.value = value
+        self.nbytes = nbytes
+
+
+class QueryCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[tuple, CacheEntry]' = OrderedDict()
+        self.origins = GridIndex()
+        self.max_reach = 0.0
+        self.nbytes = 0
+        # Bumped by every invalidation, so a result computed before one is not stored after it
+        self.version = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, kind, lat, lon, radius, *filters) -> tuple:
+        return (kind, float(lat), float(lon), radius) + filters
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            METRICS.incr('query_cache_misses')
+            return None
+        METRICS.incr('query_cache_hits')
+        return entry.value
+
+    def put(self, key, version, lat, lon, reach, value, nbytes):
+        """Store value for key unless the cache was invalidated since version was read"""
+        nbytes += ENTRY_OVERHEAD
+        if self.max_entries <= 0 or nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if version != self.version or key in self.entries:
+                return
+            self.entries[key] = CacheEntry(lat, lon, reach, value, nbytes)
+            self.origins.insert(key, lat, lon)
+            self.max_reach = max(self.max_reach, reach)
+            self.nbytes += nbytes
+            while len(self.entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self.origins.remove(key, entry.lat, entry.lon)
+        self.nbytes -= entry.nbytes
+
+    def invalidate(self, lat, lon) -> int:
+        """Drop the entries whose results a change at (lat, lon) could affect; returns how many"""
+        with self.lock:
+            self.version += 1
+            if not self.entries:
+                return 0
+            stale = []
+            for cell in self.origins.cells_in_radius(lat, lon, self.max_reach):
+                for key in self.origins.cells[cell]:
+                    entry = self.entries[key]
+                    if haversine_km(entry.lat, entry.lon, lat, lon) <= entry.reach + 1e-6:
+                        stale.append(key)
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+            if not self.entries:
+                self.max_reach = 0.0
+        if stale:
+            METRICS.incr('query_cache_invalidations', len(stale))
+        return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+            self.origins.clear()
+            self.max_reach = 0.0
+            self.nbytes = 0
+
+    def token(self) -> int:
+        return self.version
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,148 @@
+"""Trip routes for corridor searches.
+
+A route is one or more polylines of (lat, lon) points read from a GPX
+track/route or a GeoJSON LineString / MultiLineString (bare geometry, Feature
+or FeatureCollection). Each GPX segment, LineString and MultiLineString part
+stays a polyline of its own: the gap between two of them is not a road, so
+it is never searched. Long segments are split so that each piece's bounding
+box stays tight when it is used to prune the spatial index.
+"""
+import json
+import math
+import os
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from spatial_index import KM_PER_DEG_LAT, haversine_km
+
+# Longest piece a segment is split into; keeps bounding boxes tight and the
+# flat-earth projection used for point-to-segment distances accurate
+MAX_SEGMENT_KM = 10.0
+
+
+class RouteError(ValueError):
+    pass
+
+
+class Route:
+    def __init__(self, parts, name="Route"):
+        """parts: the route's polylines, each a list of (lat, lon) points"""
+        parts = [densify(part) for part in parts if len(part)]
+        if not parts:
+            raise RouteError("Route has no points")
+        self.name = name
+        self.parts = parts
+        self.points = [point for part in parts for point in part]
+        self.length_km = sum(haversine_km(*a, *b) for part in parts for a, b in zip(part, part[1:]))
+        lats = [p[0] for p in self.points]
+        lons = [p[1] for p in self.points]
+        self.bounds = (min(lats), max(lats), min(lons), max(lons))
+
+    def __len__(self):
+        return len(self.points)
+
+    def segments(self) -> Iterator[Tuple[Tuple[float, float], Tuple[float, float]]]:
+        """Consecutive point pairs within each part; a single-point part is a segment of length zero"""
+        for part in self.parts:
+            if len(part) == 1:
+                yield part[0], part[0]
+            else:
+                yield from zip(part, part[1:])
+
+    def near_bounds(self, lat, lon, width_km) -> bool:
+        """Whether (lat, lon) falls in the route's bounding box grown by width_km"""
+        lat_min, lat_max, lon_min, lon_max = self.bounds
+        dlat = width_km / KM_PER_DEG_LAT
+        dlon = dlat / max(math.cos(math.radians(max(abs(lat_min), abs(lat_max)) + dlat)), 1e-6)
+        return lat_min - dlat <= lat <= lat_max + dlat and lon_min - dlon <= lon <= lon_max + dlon
+
+
+def densify(points, max_km=MAX_SEGMENT_KM) -> List[Tuple[float, float]]:
+    """Points with extra vertices interpolated so that no segment is longer than max_km"""
+    dense = [tuple(points[0])]
+    for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+        pieces = max(1, math.ceil(haversine_km(lat1, lon1, lat2, lon2) / max_km))
+        for i in range(1, pieces + 1):
+            t = i / pieces
+            dense.append((lat1 + (lat2 - lat1) * t, lon1 + (lon2 - lon1) * t))
+    return dense
+
+
+def segment_length(a, b) -> float:
+    """Length (km) of segment a-b in the same projection segment_distances uses"""
+    kx = KM_PER_DEG_LAT * math.cos(math.radians((a[0] + b[0]) / 2))
+    return math.hypot((b[1] - a[1]) * kx, (b[0] - a[0]) * KM_PER_DEG_LAT)
+
+
+def segment_distances(lat, lon, a, b):
+    """Distance (km) from stations to segment a-b, and how far along the segment (km) their nearest point is.
+
+    lat/lon are arrays of station coordinates in degrees. Uses an
+    equirectangular projection around the segment, which is accurate to well
+    under a percent for segments of MAX_SEGMENT_KM.
+    """
+    lat0 = math.radians((a[0] + b[0]) / 2)
+    kx = KM_PER_DEG_LAT * math.cos(lat0)
+    bx, by = (b[1] - a[1]) * kx, (b[0] - a[0]) * KM_PER_DEG_LAT
+    px, py = (lon - a[1]) * kx, (lat - a[0]) * KM_PER_DEG_LAT
+    length_sq = bx * bx + by * by
+    if length_sq == 0:
+        t = np.zeros_like(px)
+    else:
+        t = np.clip((px * bx + py * by) / length_sq, 0.0, 1.0)
+    dx, dy = px - t * bx, py - t * by
+    return np.sqrt(dx * dx + dy * dy), t * math.sqrt(length_sq)
+
+
+def _tag(element) -> str:
+    # Namespaced tags look like {http://www.topografix.com/GPX/1/1}trkpt
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _gpx_parts(path) -> List[List[Tuple[float, float]]]:
+    """One polyline per track segment and per route"""
+    parts = []
+    for element in ET.parse(path).iter():
+        if _tag(element) in ('trkseg', 'rte'):
+            points = [(float(point.get('lat')), float(point.get('lon')))
+                      for point in element if _tag(point) in ('trkpt', 'rtept')]
+            if points:
+                parts.append(points)
+    return parts
+
+
+def _geojson_parts(data) -> List[List[Tuple[float, float]]]:
+    """One polyline per LineString and per MultiLineString part"""
+    kind = data.get('type')
+    if kind == 'FeatureCollection':
+        parts = []
+        for feature in data.get('features', []):
+            parts.extend(_geojson_parts(feature))
+        return parts
+    if kind == 'Feature':
+        return _geojson_parts(data.get('geometry') or {})
+    if kind == 'LineString':
+        lines = [data['coordinates']]
+    elif kind == 'MultiLineString':
+        lines = data['coordinates']
+    else:
+        return []
+    # GeoJSON positions are [lon, lat(, elevation)]
+    return [[(float(c[1]), float(c[0])) for c in line] for line in lines if line]
+
+
+def load_route(path) -> Route:
+    """Read a route from a .gpx or .geojson/.json file"""
+    try:
+        if path.lower().endswith('.gpx'):
+            parts = _gpx_parts(path)
+        else:
+            with open(path, 'r') as f:
+                parts = _geojson_parts(json.load(f))
+    except (ET.ParseError, ValueError, KeyError, TypeError, IndexError) as e:
+        raise RouteError(f"Could not read route from {path}: {e}") from e
+    if not parts:
+        raise RouteError(f"No track, route or LineString points in {path}")
+    return Route(parts, name=os.path.splitext(os.path.basename(path))[0])
@@ -0,0 +1,449 @@
+"""Multi-process search over geographic shards of the catalog.
+
+One Python process answers one search at a time, which caps batch jobs such
+as finding the nearest chargers for every pincode centroid. ShardedSearch
+splits the catalog into shards, each a band of neighbouring grid tiles
+holding about the same number of stations, and gives every shard its own
+process. A shard is a StationEngine over its own stations (indexes and
+columns only, no records), so it answers radius and k-nearest queries
+exactly as the full engine does.
+
+The coordinator sends each origin only to the shards whose tiles intersect
+its search circle and merges what they return by distance. Batches are cut
+into chunks and every shard works through its queue independently, so shards
+stay busy while others finish; throughput grows with the number of shards
+as long as the origins spread over them, which they do when origins follow
+the stations.
+
+A ShardedSearch is a copy of the catalog taken when it is built: stations
+added or updated in the engine afterwards are not seen until it is rebuilt.
+
+    python sharded_search.py pincodes.csv --k 5 --radius 50 --dataset ocm_india.json --output nearest.jsonl
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from filter_index import BitmapIndex
+from query_cache import QueryCache
+from spatial_index import KM_PER_DEG_LAT, GridIndex
+from station_columns import StationColumns
+from station_engine import StationEngine, build_engine
+
+# Shards are built from square tiles of this many grid cells a side (0.3 degrees with 0.1 degree cells)
+SHARD_TILE_CELLS = 3
+CHUNK_ORIGINS = 8192
+# A nearest search without a radius starts here and widens until it has k hits
+NEAREST_START_KM = 25.0
+MAX_RADIUS_KM = math.pi * 6371.0
+SHARD_FILTER_FIELDS = ('access_type', 'power_types')
+
+
+class ShardError(Exception):
+    pass
+
+
+class Shard:
+    """The part of the catalog in one shard, searchable like the full engine"""
+
+    def __init__(self, rows, cell_size, cells, columns, masks):
+        # Global row of each local row, in catalog order
+        self.rows = rows
+        self.engine = StationEngine()
+        self.engine.query_cache = QueryCache(max_entries=0)
+        index = GridIndex(cell_size)
+        index.cells = cells
+        index.count = len(rows)
+        self.engine.station_index = index
+        station_columns = StationColumns(capacity=1)
+        # Only what searches read: positions and free slots
+        station_columns._data = dict(columns)
+        station_columns.size = len(rows)
+        self.engine.station_columns = station_columns
+        bitmaps = BitmapIndex(capacity=max(1, len(rows)))
+        bitmaps.masks = masks
+        bitmaps.size = len(rows)
+        self.engine.filter_index = bitmaps
+
+    def batch(self, lats, lons, radius, access_type="all", power_type="all", k=None):
+        """Matches for each origin: hits per origin, then global rows and distances, origin by origin"""
+        counts = np.zeros(len(lats), dtype=np.int64)
+        found_rows, found_distances = [], []
+        for i, (lat, lon) in enumerate(zip(lats.tolist(), lons.tolist())):
+            rows, distances = self.engine.search_rows(lat, lon, radius, access_type, power_type, k)
+            counts[i] = len(rows)
+            found_rows.append(rows)
+            found_distances.append(distances)
+        if not found_rows:
+            return counts, np.empty(0, dtype=np.int64), np.empty(0)
+        return counts, self.rows[np.concatenate(found_rows)], np.concatenate(found_distances)
+
+
+def _shard_main(conn, shard_args):
+    shard = Shard(*shard_args)
+    conn.send("ready")
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        try:
+            conn.send((True, shard.batch(*request)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class ShardProcess:
+    """A shard served by its own process; calls go over a pipe, one at a time"""
+
+    def __init__(self, context, shard_args):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_shard_main, args=(child, shard_args), daemon=True)
+        self.process.start()
+        child.close()
+
+    def wait_ready(self):
+        self._recv()
+
+    def _recv(self):
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            raise ShardError(f"Shard process {self.process.pid} exited (code {self.process.exitcode})")
+
+    def batch(self, *request):
+        try:
+            self.conn.send(request)
+        except OSError as e:
+            raise ShardError(f"Shard process {self.process.pid} is gone: {e}")
+        ok, result = self._recv()
+        if not ok:
+            raise ShardError(result)
+        return result
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class BatchResult:
+    """Per-origin results of a batch: origin i's rows and distances are rows[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, offsets, rows, distances):
+        self.offsets = offsets
+        self.rows = rows
+        self.distances = distances
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.rows[start:end], self.distances[start:end]
+
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+
+class ShardedSearch:
+    """Radius and k-nearest search over a catalog split across shard processes.
+
+    shards defaults to the number of CPUs. With processes=False the shards
+    are searched in this process, which gives the same answers (useful for
+    checking results, and on a single core).
+    """
+
+    def __init__(self, engine, shards=None, processes=True, tile_cells=SHARD_TILE_CELLS):
+        self.n_shards = max(1, shards or os.cpu_count() or 1)
+        grid = engine.station_index
+        self.cell_lat = grid.lat_size
+        self.cell_lon = grid.lon_size
+        self.n_cols = grid.n_cols
+        self.tile_cells = tile_cells
+        self.n_tile_cols = -(-grid.n_cols // tile_cells)
+
+        cells = sorted(grid.cells)
+        tiles = sorted({(r // tile_cells, c // tile_cells) for r, c in cells})
+        tile_counts = {tile: 0 for tile in tiles}
+        for r, c in cells:
+            tile_counts[(r // tile_cells, c // tile_cells)] += len(grid.cells[(r, c)])
+        # Cut the tiles, in row-major order, into runs holding about the same number of stations
+        total = sum(tile_counts.values())
+        shard_of_tile = {}
+        running = 0
+        for tile in tiles:
+            shard_of_tile[tile] = running * self.n_shards // max(total, 1)
+            running += tile_counts[tile]
+        # A tile bigger than a shard's share leaves some shards empty; number the others 0..n-1
+        used = {shard: i for i, shard in enumerate(sorted(set(shard_of_tile.values())))}
+        shard_of_tile = {tile: used[shard] for tile, shard in shard_of_tile.items()}
+        self.n_shards = max(len(used), 1)
+
+        # Dense tile -> shard table over the occupied latitude band, -1 where a tile is empty
+        self.tile_row_min = min((t[0] for t in tiles), default=0)
+        tile_rows = max((t[0] for t in tiles), default=0) - self.tile_row_min + 1
+        self.tile_shard = np.full((tile_rows, self.n_tile_cols), -1, dtype=np.int32)
+        for (tr, tc), shard in shard_of_tile.items():
+            self.tile_shard[tr - self.tile_row_min, tc] = shard
+
+        shard_args = self._partition(engine, shard_of_tile)
+        self.sizes = [len(args[0]) for args in shard_args]
+        if processes:
+            context = multiprocessing.get_context()
+            self.shards = [ShardProcess(context, args) for args in shard_args]
+            try:
+                for shard in self.shards:
+                    shard.wait_ready()
+            except ShardError:
+                self.close()
+                raise
+        else:
+            self.shards = [Shard(*args) for args in shard_args]
+        # One thread per shard keeps each shard's requests in order while the shards run side by side
+        self.io = [ThreadPoolExecutor(max_workers=1) for _ in self.shards]
+
+    def _partition(self, engine, shard_of_tile) -> List[tuple]:
+        n = len(engine.station_columns)
+        tile_cells = self.tile_cells
+        shard_of_row = np.empty(n, dtype=np.int32)
+        for (r, c), rows in engine.station_index.cells.items():
+            shard_of_row[rows] = shard_of_tile[(r // tile_cells, c // tile_cells)]
+        shard_cells: List[Dict] = [{} for _ in range(self.n_shards)]
+        for (r, c), rows in engine.station_index.cells.items():
+            shard_cells[shard_of_tile[(r // tile_cells, c // tile_cells)]][(r, c)] = rows
+
+        columns = engine.station_columns
+        masks = {key: engine.filter_index.mask(*key) for key in engine.filter_index.masks
+                 if key[0] in SHARD_FILTER_FIELDS}
+        shard_args = []
+        for shard in range(self.n_shards):
+            rows = np.flatnonzero(shard_of_row == shard)
+            cells = {cell: np.searchsorted(rows, members).tolist() for cell, members in shard_cells[shard].items()}
+            shard_columns = {name: np.ascontiguousarray(getattr(columns, name)[rows])
+                             for name in ('lat_rad', 'lon_rad', 'available_slots')}
+            shard_masks = {key: mask[rows] for key, mask in masks.items() if mask[rows].any()}
+            shard_args.append((rows, self.cell_lat, cells, shard_columns, shard_masks))
+        return shard_args
+
+    def close(self):
+        for executor in getattr(self, 'io', []):
+            executor.shutdown(wait=True)
+        for shard in self.shards:
+            if isinstance(shard, ShardProcess):
+                shard.close()
+        self.shards = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def route(self, lats, lons, radius):
+        """(origin, shard) pairs for every shard with a tile touching each origin's search circle"""
+        dlat = radius / KM_PER_DEG_LAT
+        lat_min = np.maximum(lats - dlat, -90.0)
+        lat_max = np.minimum(lats + dlat, 90.0)
+        widest = np.maximum(np.abs(lat_min), np.abs(lat_max))
+        cos_lat = np.cos(np.radians(widest))
+        # Near the poles, or for huge radii, every column is in reach
+        everywhere = (widest >= 90) | (dlat >= 180 * cos_lat)
+        dlon = np.where(everywhere, 0.0, dlat / np.maximum(cos_lat, 1e-12))
+        lons = (lons + 180) % 360 - 180
+
+        t = self.tile_cells
+        row_first = np.floor(lat_min / self.cell_lat).astype(np.int64) // t
+        row_last = np.floor(lat_max / self.cell_lat).astype(np.int64) // t
+        col_first = np.floor((lons - dlon + 180) / self.cell_lon).astype(np.int64) // t
+        col_last = np.floor((lons + dlon + 180) / self.cell_lon).astype(np.int64) // t
+        col_span = np.where(everywhere, self.n_tile_cols - 1, np.minimum(col_last - col_first, self.n_tile_cols - 1))
+        col_first = np.where(everywhere, 0, col_first)
+        # Only the occupied latitude band has shards
+        row_first = np.maximum(row_first, self.tile_row_min)
+        row_last = np.minimum(row_last, self.tile_row_min + self.tile_shard.shape[0] - 1)
+
+        origins, shards = [], []
+        index = np.arange(len(lats))
+        for dr in range(int((row_last - row_first).max(initial=-1)) + 1):
+            in_rows = dr <= row_last - row_first
+            for dc in range(int(col_span[in_rows].max(initial=-1)) + 1):
+                hit = in_rows & (dc <= col_span)
+                tr = row_first[hit] + dr - self.tile_row_min
+                tc = (col_first[hit] + dc) % self.n_tile_cols
+                shard = self.tile_shard[tr, tc]
+                keep = shard >= 0
+                origins.append(index[hit][keep])
+                shards.append(shard[keep])
+        if not origins:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        pairs = np.unique(np.concatenate(origins) * self.n_shards + np.concatenate(shards))
+        return pairs // self.n_shards, (pairs % self.n_shards).astype(np.int32)
+
+    def _chunk(self, lats, lons, radius, access_type, power_type, k):
+        """Send one chunk of origins to the shards its circles touch; returns the pending calls"""
+        origins, shards = self.route(lats, lons, radius)
+        pending = []
+        for shard in np.unique(shards).tolist():
+            mine = origins[shards == shard]
+            future = self.io[shard].submit(self.shards[shard].batch, lats[mine], lons[mine],
+                                           radius, access_type, power_type, k)
+            pending.append((mine, future))
+        return pending
+
+    @staticmethod
+    def _merge(n, pending, k):
+        """Combine the shards' answers for a chunk into per-origin lists, nearest first"""
+        origin_parts, row_parts, distance_parts = [], [], []
+        for mine, future in pending:
+            counts, rows, distances = future.result()
+            origin_parts.append(np.repeat(mine, counts))
+            row_parts.append(rows)
+            distance_parts.append(distances)
+        if not origin_parts:
+            return np.zeros(n, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        origin = np.concatenate(origin_parts)
+        rows = np.concatenate(row_parts)
+        distances = np.concatenate(distance_parts)
+        # Nearest first within each origin; equally near stations keep catalog order
+        order = np.lexsort((rows, distances, origin))
+        origin, rows, distances = origin[order], rows[order], distances[order]
+        if k is not None:
+            starts = np.searchsorted(origin, origin, side='left')
+            keep = np.arange(len(origin)) - starts < k
+            origin, rows, distances = origin[keep], rows[keep], distances[keep]
+        return np.bincount(origin, minlength=n), rows, distances
+
+    def search_batch(self, lats, lons, radius=25.0, access_type="all", power_type="all", k=None) -> BatchResult:
+        """Matching stations with free slots for every origin, nearest first.
+
+        With k only the k nearest within radius are kept; k with radius None
+        finds the k nearest at any distance.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if radius is None:
+            if k is None:
+                raise ValueError("radius is required unless k is given")
+            return self._nearest_unbounded(lats, lons, access_type, power_type, k)
+        starts = range(0, len(lats), CHUNK_ORIGINS)
+        # Every chunk is queued before any is merged, so no shard waits on a slower one between chunks
+        pending = [self._chunk(lats[s:s + CHUNK_ORIGINS], lons[s:s + CHUNK_ORIGINS], radius, access_type, power_type, k)
+                   for s in starts]
+        counts, rows, distances = [], [], []
+        for s, chunk in zip(starts, pending):
+            c, r, d = self._merge(min(CHUNK_ORIGINS, len(lats) - s), chunk, k)
+            counts.append(c)
+            rows.append(r)
+            distances.append(d)
+        offsets = np.zeros(len(lats) + 1, dtype=np.int64)
+        if counts:
+            np.cumsum(np.concatenate(counts), out=offsets[1:])
+            return BatchResult(offsets, np.concatenate(rows), np.concatenate(distances))
+        return BatchResult(offsets, np.empty(0, dtype=np.int64), np.empty(0))
+
+    def _nearest_unbounded(self, lats, lons, access_type, power_type, k) -> BatchResult:
+        # Any k found within a radius are the true k nearest; origins short of k retry with a wider circle
+        found: List[Optional[tuple]] = [None] * len(lats)
+        todo = np.arange(len(lats))
+        radius = NEAREST_START_KM
+        while len(todo):
+            result = self.search_batch(lats[todo], lons[todo], radius, access_type, power_type, k)
+            counts = result.counts()
+            final = (counts >= k) | (radius >= MAX_RADIUS_KM)
+            for i in np.flatnonzero(final).tolist():
+                found[todo[i]] = result[i]
+            todo = todo[~final]
+            radius = min(radius * 4, MAX_RADIUS_KM)
+        offsets = np.zeros(len(lats) + 1, dtype=np.int64)
+        np.cumsum([len(rows) for rows, _ in found], out=offsets[1:])
+        if not found:
+            return BatchResult(offsets, np.empty(0, dtype=np.int64), np.empty(0))
+        return BatchResult(offsets, np.concatenate([rows for rows, _ in found]),
+                           np.concatenate([distances for _, distances in found]))
+
+    def search(self, lat, lon, radius=25.0, access_type="all", power_type="all", k=None):
+        """Rows and distances for one origin, as StationEngine.search_rows returns them"""
+        return self.search_batch([lat], [lon], radius, access_type, power_type, k)[0]
+
+
+def read_origins(path):
+    """Origins from a CSV file (lat,lon per line, header optional) or JSON lines with lat/lon keys"""
+    lats, lons, labels = [], [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                lat, lon, label = record["lat"], record["lon"], record.get("id")
+            else:
+                parts = [p.strip() for p in line.split(',')]
+                try:
+                    lat, lon = float(parts[0]), float(parts[1])
+                except ValueError:
+                    # Header row
+                    continue
+                label = parts[2] if len(parts) > 2 else None
+            lats.append(float(lat))
+            lons.append(float(lon))
+            labels.append(label)
+    return np.array(lats), np.array(lons), labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search many origins at once over a sharded catalog")
+    parser.add_argument("origins", help="CSV (lat,lon[,id]) or JSON-lines file of origins")
+    parser.add_argument("--radius", type=float, default=25.0, help="search radius in km")
+    parser.add_argument("--k", type=int, help="keep only the k nearest per origin")
+    parser.add_argument("--unbounded", action="store_true", help="with --k, ignore the radius")
+    parser.add_argument("--access-type", default="all")
+    parser.add_argument("--power-type", default="all")
+    parser.add_argument("--shards", type=int, help="shard processes (default: CPU count)")
+    parser.add_argument("--providers", default="providers.db", help="provider store (.db, or legacy .json)")
+    parser.add_argument("--dataset", action="append", default=[], help="external station dataset to import (repeatable)")
+    parser.add_argument("--snapshot", help="binary catalog snapshot to load from, or write after building")
+    parser.add_argument("--output", default="-", help="JSON-lines output file, '-' for stdout")
+    args = parser.parse_args(argv)
+    if args.unbounded and args.k is None:
+        parser.error("--unbounded needs --k")
+
+    engine = build_engine(args.providers, args.dataset, snapshot=args.snapshot)
+    lats, lons, labels = read_origins(args.origins)
+    with ShardedSearch(engine, args.shards) as sharded:
+        start = time.perf_counter()
+        result = sharded.search_batch(lats, lons, None if args.unbounded else args.radius,
+                                      args.access_type, args.power_type, args.k)
+        elapsed = time.perf_counter() - start
+        print(f"{len(lats)} origins over {len(sharded.shards)} shards ({sharded.sizes} stations) "
+              f"in {elapsed:.2f}s ({len(lats) / max(elapsed, 1e-9):,.0f} origins/sec)", file=sys.stderr)
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        stations = engine.stations
+        for i, label in enumerate(labels):
+            rows, distances = result[i]
+            out.write(json.dumps({"origin": i if label is None else label, "lat": lats[i], "lon": lons[i],
+                                  "stations": [{"id": stations[row].id, "distance_km": round(distance, 3)}
+                                               for row, distance in zip(rows.tolist(), distances.tolist())]}) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
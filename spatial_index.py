@@ -0,0 +1,174 @@
+import math
+from typing import Dict, Iterator, List, Tuple
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between two lat/lon points"""
+    lat1_rad = math.radians(lat1)
+    lon1_rad = math.radians(lon1)
+    lat2_rad = math.radians(lat2)
+    lon2_rad = math.radians(lon2)
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+
+class GridIndex:
+    """Buckets station keys into fixed lat/lon cells.
+
+    A radius query only visits the cells overlapping the bounding box of the
+    search circle, so callers run the exact haversine check on a handful of
+    candidates instead of the whole catalog.
+    """
+
+    def __init__(self, cell_size_deg=0.1):
+        # Longitude columns wrap around the antimeridian, so the column width
+        # is nudged to divide 360 exactly.
+        self.n_cols = max(1, round(360 / cell_size_deg))
+        self.lat_size = cell_size_deg
+        self.lon_size = 360 / self.n_cols
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _row(self, lat):
+        return math.floor(lat / self.lat_size)
+
+    def _col(self, lon):
+        return math.floor((lon + 180) / self.lon_size) % self.n_cols
+
+    def clear(self):
+        self.cells.clear()
+        self.count = 0
+
+    def insert(self, key, lat, lon):
+        self.cells.setdefault((self._row(lat), self._col(lon)), []).append(key)
+        self.count += 1
+
+    def remove(self, key, lat, lon):
+        cell = (self._row(lat), self._col(lon))
+        bucket = self.cells.get(cell)
+        if bucket and key in bucket:
+            bucket.remove(key)
+            self.count -= 1
+            if not bucket:
+                del self.cells[cell]
+
+    def cells_in_radius(self, lat, lon, radius_km) -> Iterator[Tuple[int, int]]:
+        """Yield the occupied cells overlapping the circle's bounding box"""
+        return self.cells_in_box(lat, lat, lon, lon, pad_km=radius_km)
+
+    def cells_in_box(self, lat_min, lat_max, lon_min, lon_max, pad_km=0.0) -> Iterator[Tuple[int, int]]:
+        """Yield the occupied cells overlapping a lat/lon box grown by pad_km on every side"""
+        dlat = pad_km / KM_PER_DEG_LAT
+        lat_min = max(lat_min - dlat, -90.0)
+        lat_max = min(lat_max + dlat, 90.0)
+
+        # Longitude degrees shrink towards the poles, so widen the box using
+        # the latitude furthest from the equator.
+        widest = max(abs(lat_min), abs(lat_max))
+        cos_lat = math.cos(math.radians(widest))
+        if widest >= 90 or dlat >= 180 * cos_lat:
+            cols = range(self.n_cols)
+        else:
+            dlon = dlat / cos_lat
+            first = math.floor((lon_min - dlon + 180) / self.lon_size)
+            last = math.floor((lon_max + dlon + 180) / self.lon_size)
+            if last - first + 1 >= self.n_cols:
+                cols = range(self.n_cols)
+            else:
+                cols = [c % self.n_cols for c in range(first, last + 1)]
+
+        rows = range(self._row(lat_min), self._row(lat_max) + 1)
+        # Sparse catalogs have far fewer occupied cells than the box covers.
+        if len(rows) * len(cols) > len(self.cells):
+            row_set = set(rows)
+            col_set = set(cols)
+            for cell in self.cells:
+                if cell[0] in row_set and cell[1] in col_set:
+                    yield cell
+            return
+        for r in rows:
+            for c in cols:
+                if (r, c) in self.cells:
+                    yield (r, c)
+
+    def rings(self, lat, lon) -> Iterator[Tuple[List[int], float]]:
+        """Keys in square rings of cells around (lat, lon), innermost first.
+
+        Each step yields the keys of one ring plus a lower bound in km on the
+        distance to any key in the rings still to come, so a nearest-neighbour
+        search can stop as soon as it has enough matches closer than that.
+        """
+        lon = (lon + 180) % 360 - 180
+        row0, col0 = self._row(lat), self._col(lon)
+        row_min, row_max = self._row(-90.0), self._row(90.0)
+        seen = set()
+        r = 0
+        while True:
+            rows_done = row0 - r <= row_min and row0 + r >= row_max
+            cols_done = 2 * r + 1 >= self.n_cols
+            ring_size = 8 * r if r else 1
+            if (rows_done and cols_done) or ring_size > len(self.cells):
+                # Everything left fits in one pass over the occupied cells
+                yield self._gather(bucket for cell, bucket in self.cells.items() if cell not in seen), math.inf
+                return
+
+            buckets = []
+            for cell in self._ring_cells(row0, col0, r):
+                if cell in self.cells and cell not in seen:
+                    seen.add(cell)
+                    buckets.append(self.cells[cell])
+            yield self._gather(buckets), self._ring_bound(lat, lon, row0, col0, r)
+            r += 1
+
+    def _ring_cells(self, row0, col0, r) -> Iterator[Tuple[int, int]]:
+        if r == 0:
+            yield (row0, col0)
+            return
+        for c in range(col0 - r, col0 + r + 1):
+            yield (row0 - r, c % self.n_cols)
+            yield (row0 + r, c % self.n_cols)
+        for row in range(row0 - r + 1, row0 + r):
+            yield (row, (col0 - r) % self.n_cols)
+            yield (row, (col0 + r) % self.n_cols)
+
+    def _ring_bound(self, lat, lon, row0, col0, r) -> float:
+        """Lower bound (km) on the distance from (lat, lon) to anything outside rings 0..r"""
+        lat_lo = (row0 - r) * self.lat_size
+        lat_hi = (row0 + r + 1) * self.lat_size
+        lat_gap = min(lat - lat_lo if lat_lo > -90 else math.inf,
+                      lat_hi - lat if lat_hi < 90 else math.inf)
+        bound = lat_gap * KM_PER_DEG_LAT
+
+        if 2 * r + 1 < self.n_cols:
+            lon_lo = (col0 - r) * self.lon_size - 180
+            lon_hi = (col0 + r + 1) * self.lon_size - 180
+            lon_gap = min(lon - lon_lo, lon_hi - lon, 90.0)
+            # Distance from the origin to the great circle of that meridian
+            meridian = math.asin(math.cos(math.radians(lat)) * math.sin(math.radians(lon_gap)))
+            bound = min(bound, EARTH_RADIUS_KM * meridian)
+        return bound
+
+    def _gather(self, buckets) -> List[int]:
+        """The keys of several cells as one sequence"""
+        keys = []
+        for bucket in buckets:
+            keys.extend(bucket)
+        return keys
+
+    def candidates(self, lat, lon, radius_km) -> List[int]:
+        """Keys of every station that could lie within radius_km, in insertion-key order"""
+        keys = self._gather(self.cells[cell] for cell in self.cells_in_radius(lat, lon, radius_km))
+        keys.sort()
+        return keys
@@ -0,0 +1,100 @@
+from typing import Dict
+
+import numpy as np
+
+from spatial_index import EARTH_RADIUS_KM
+
+
+def haversine_batch(lat, lon, lat_rad, lon_rad):
+    """Vectorized great-circle distance in km.
+
+    lat/lon are origins in degrees: a scalar gives a 1-D array of distances to
+    every station, an array of origins gives a (n_origins, n_stations) matrix.
+    lat_rad/lon_rad are station coordinates already converted to radians.
+    """
+    lat1 = np.radians(np.asarray(lat, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon, dtype=np.float64))
+    if lat1.ndim:
+        lat1 = lat1[:, np.newaxis]
+        lon1 = lon1[:, np.newaxis]
+
+    dlat = lat_rad - lat1
+    dlon = lon_rad - lon1
+
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat_rad) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+
+class StationColumns:
+    """Contiguous per-field arrays mirroring the station list.
+
+    Row i describes the station at position i in the catalog. Arrays grow by
+    doubling so appending a registered provider is amortised O(1).
+    """
+
+    FIELDS = {
+        'lat_rad': np.float64,
+        'lon_rad': np.float64,
+        'available_slots': np.int32,
+        'total_slots': np.int32,
+        'max_power': np.float64,
+        'price_per_kwh': np.float64,
+    }
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self._data: Dict[str, np.ndarray] = {
+            name: np.empty(capacity, dtype=dtype) for name, dtype in self.FIELDS.items()
+        }
+
+    def __len__(self):
+        return self.size
+
+    def __getattr__(self, name):
+        data = self.__dict__.get('_data')
+        if data is not None and name in data:
+            return data[name][:self.size]
+        raise AttributeError(name)
+
+    def clear(self):
+        self.size = 0
+
+    def _grow(self, needed):
+        capacity = len(self._data['lat_rad'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, array in self._data.items():
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self._data[name] = grown
+
+    def append(self, station) -> int:
+        row = self.size
+        self._grow(row + 1)
+        self._data['lat_rad'][row] = np.radians(station.latitude)
+        self._data['lon_rad'][row] = np.radians(station.longitude)
+        self._data['available_slots'][row] = station.available_slots
+        self._data['total_slots'][row] = station.total_slots
+        self._data['max_power'][row] = station.max_power
+        # Imported datasets often have no tariff; NaN keeps it out of price comparisons
+        price = station.price_per_kwh
+        self._data['price_per_kwh'][row] = np.nan if price is None else price
+        self.size += 1
+        return row
+
+    def set(self, row, name, value):
+        self._data[name][row] = value
+
+    def extend(self, stations):
+        for station in stations:
+            self.append(station)
+
+    def distances(self, lat, lon, rows=None):
+        """Distances from one origin (or an array of origins) to the given rows, or to all stations"""
+        if rows is None:
+            return haversine_batch(lat, lon, self.lat_rad, self.lon_rad)
+        return haversine_batch(lat, lon, self.lat_rad[rows], self.lon_rad[rows])
@@ -0,0 +1,525 @@
+"""Headless station catalog and search engine.
+
+Everything here runs without tkinter so searches can be served from scripts,
+batch jobs and servers. The Tk app in ev_charging_with_providers.py is a thin
+front end over StationEngine.
+
+Batch queries from the command line:
+
+    python station_engine.py queries.jsonl --providers providers.db
+
+Each input line is either JSON ({"lat": 9.93, "lon": 76.27, "radius": 25,
+"access_type": "public", "power_type": "CCS", "k": 10, "open_at": "Sat 9PM"}) or
+CSV (lat,lon,radius[,access_type[,power_type[,k[,open_at]]]]). With k only
+the k nearest matches are returned; with open_at ("now", an ISO date-time or
+"[day] time") only stations open then. A JSON query may also carry "q", a
+station name or address to match (typos allowed): the best matches come first,
+from anywhere unless it gives a radius. One JSON result is written per query line.
+"""
+import argparse
+import json
+import math
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from charging_estimate import TariffIndex
+from filter_index import BitmapIndex
+from instrumentation import METRICS
+from opening_hours import HoursIndex, parse_open_at
+from provider_store import open_provider_store
+from query_cache import QueryCache
+from route import segment_distances, segment_length
+from spatial_index import GridIndex
+from station_columns import StationColumns
+from station_import import import_stations
+from station_record import StationRecord, StationResult
+from text_index import TextIndex, best_first
+
+# Text matches tied for the last places are ranked through the grid once they are
+# more than 1/TEXT_GRID_SHARE of the catalog, rather than measured one by one
+TEXT_GRID_SHARE = 4
+
+PUBLIC_STATIONS = [
+    {"id": 1, "name": "Tesla Supercharger - Kochi", "address": "MG Road, Ernakulam",
+     "latitude": 9.9312, "longitude": 76.2673, "total_slots": 8, "available_slots": 3,
+     "power_types": ["Type 2", "CCS", "CHAdeMO"], "max_power": 250, "price_per_kwh": 0.28,
+     "status": "open", "access_type": "public", "owner_type": "commercial", "operating_hours": "24/7"},
+
+    {"id": 2, "name": "ChargePoint Station - Lulu Mall", "address": "Lulu Mall, Edappally, Kochi",
+     "latitude": 9.9836, "longitude": 76.2855, "total_slots": 4, "available_slots": 2,
+     "power_types": ["Type 2", "CCS"], "max_power": 150, "price_per_kwh": 0.32,
+     "status": "open", "access_type": "public", "owner_type": "commercial", "operating_hours": "10AM-10PM"},
+
+    {"id": 3, "name": "EVgo Station - Cochin Airport", "address": "Cochin International Airport, Nedumbassery",
+     "latitude": 10.1518, "longitude": 76.4019, "total_slots": 6, "available_slots": 1,
+     "power_types": ["CCS", "CHAdeMO"], "max_power": 350, "price_per_kwh": 0.35,
+     "status": "open", "access_type": "public", "owner_type": "commercial", "operating_hours": "24/7"},
+
+    {"id": 4, "name": "Public Charging - Kalady Town", "address": "Near Sree Sankara Temple, Kalady",
+     "latitude": 9.7480, "longitude": 76.4880, "total_slots": 4, "available_slots": 2,
+     "power_types": ["Type 2", "CCS"], "max_power": 50, "price_per_kwh": 0.22,
+     "status": "open", "access_type": "public", "owner_type": "commercial", "operating_hours": "8AM-8PM"}
+]
+
+
+def provider_to_station(provider) -> Dict:
+    """Map a registered provider record onto the station schema"""
+    return {
+        "id": provider["id"],
+        "name": provider["name"],
+        "address": provider["address"],
+        "latitude": provider["latitude"],
+        "longitude": provider["longitude"],
+        "total_slots": provider["total_slots"],
+        "available_slots": provider["available_slots"],
+        "power_types": provider["power_types"],
+        "max_power": provider["max_power"],
+        "price_per_kwh": provider["price_per_kwh"],
+        "status": provider["status"],
+        "access_type": "provider",
+        "owner_type": "provider",
+        "operating_hours": provider["operating_hours"],
+        "contact_info": provider.get("contact_info", ""),
+        "pricing_model": provider.get("pricing_model", "per_kwh"),
+        "time_limits": provider.get("time_limits", "no_limit")
+    }
+
+
+class StationEngine:
+    """Station catalog with spatial, columnar and bitmap indexes for filtered radius search"""
+
+    def __init__(self, stations=None):
+        self.stations: List[StationRecord] = []
+        self.station_index = GridIndex()
+        self.station_columns = StationColumns()
+        self.filter_index = BitmapIndex()
+        self.hours_index = HoursIndex()
+        self.tariff_index = TariffIndex()
+        # Built on the first text search and kept up to date from then on
+        self.text_index = TextIndex()
+        self._row_by_id: Optional[Dict] = {}
+        self.query_cache = QueryCache()
+        if stations:
+            self.load(stations)
+
+    def __len__(self):
+        return len(self.stations)
+
+    @property
+    def row_by_id(self) -> Dict:
+        # A snapshot-loaded catalog maps its ids on first use rather than at startup
+        if self._row_by_id is None:
+            self._row_by_id = {station_id: row for row, station_id in enumerate(self.stations.ids())}
+        return self._row_by_id
+
+    @METRICS.instrument('engine_load')
+    def load(self, stations):
+        """Replace the catalog and rebuild the index"""
+        self.stations = []
+        self.station_index.clear()
+        self.station_columns.clear()
+        self.filter_index.clear()
+        self.hours_index.clear()
+        self.tariff_index.clear()
+        self.text_index.clear()
+        self._row_by_id = {}
+        self.query_cache.clear()
+        for station in stations:
+            self.add_station(station)
+
+    def add_station(self, station) -> int:
+        """Add a station (a dict in the station schema, or a StationRecord); returns its row"""
+        if not isinstance(station, StationRecord):
+            station = StationRecord.from_dict(station)
+        row = len(self.stations)
+        self.stations.append(station)
+        self.station_index.insert(row, station['latitude'], station['longitude'])
+        self.station_columns.append(station)
+        self.filter_index.add(row, station)
+        self.hours_index.add(row, station.operating_hours)
+        self.tariff_index.add(row, station.extra)
+        self.row_by_id[station.id] = row
+        self.query_cache.invalidate(station.latitude, station.longitude)
+        return row
+
+    def update_availability(self, station_id, available_slots=None, status=None) -> Optional[int]:
+        """Apply a live slot/status change in place; returns the affected row, or None if unknown or unchanged"""
+        row = self.row_by_id.get(station_id)
+        if row is None:
+            return None
+        station = self.stations[row]
+        changed = False
+        if available_slots is not None:
+            available_slots = max(0, min(int(available_slots), station.total_slots))
+        if available_slots is not None and available_slots != station.available_slots:
+            station.available_slots = available_slots
+            self.station_columns.set(row, 'available_slots', available_slots)
+            changed = True
+        if status is not None and status != station.status:
+            self.filter_index.update(row, 'status', station.status, status)
+            station['status'] = status
+            changed = True
+        if not changed:
+            return None
+        self.query_cache.invalidate(station.latitude, station.longitude)
+        return row
+
+    def distance_to(self, row, lat, lon) -> float:
+        return float(self.station_columns.distances(lat, lon, np.array([row], dtype=np.intp))[0])
+
+    @METRICS.instrument('radius_search')
+    def radius_query(self, lat, lon, radius):
+        """Rows and distances (km) of stations with free slots within radius, nearest first"""
+        key = self.query_cache.key('radius', lat, lon, radius)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+        version = self.query_cache.token()
+        rows = np.array(self.station_index.candidates(lat, lon, radius), dtype=np.intp)
+        distances = self.station_columns.distances(lat, lon, rows)
+        hits = (distances <= radius) & (self.station_columns.available_slots[rows] > 0)
+        rows, distances = rows[hits], distances[hits]
+
+        order = np.argsort(distances, kind='stable')
+        return self._remember(key, version, lat, lon, radius, rows[order], distances[order])
+
+    def _remember(self, key, version, lat, lon, reach, rows, distances):
+        """Cache a result; reach is how far from the origin a station change can affect it"""
+        # Cached arrays are shared between callers
+        rows.flags.writeable = False
+        distances.flags.writeable = False
+        self.query_cache.put(key, version, lat, lon, reach, (rows, distances), rows.nbytes + distances.nbytes)
+        return rows, distances
+
+    @METRICS.instrument('nearest_search')
+    def nearest(self, lat, lon, k, access_type="all", power_type="all", max_radius=None, open_at=None, among=None):
+        """Rows and distances (km) of the k nearest stations with free slots passing the filters, nearest first.
+
+        Grid rings are searched outward from the origin and the search stops once
+        k matches are closer than anything the remaining rings could hold. among,
+        a boolean array over rows, limits the search to the rows it marks.
+        """
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        limit = math.inf if max_radius is None else max_radius
+        # The best k so far, nearest first; ties keep the lower row, like radius_query
+        best_rows = np.empty(0, dtype=np.intp)
+        best_distances = np.empty(0, dtype=np.float64)
+        for keys, bound in self.station_index.rings(lat, lon):
+            if len(keys):
+                rows = np.array(keys, dtype=np.intp)
+                rows = rows[self.station_columns.available_slots[rows] > 0]
+                if among is not None:
+                    rows = rows[among[rows]]
+                rows = rows[self.matches(rows, access_type, power_type, open_at=open_at)]
+                distances = self.station_columns.distances(lat, lon, rows)
+                cutoff = best_distances[-1] if len(best_rows) == k else limit
+                close = distances <= min(cutoff, limit)
+                if close.any():
+                    rows = np.concatenate((best_rows, rows[close]))
+                    distances = np.concatenate((best_distances, distances[close]))
+                    order = np.lexsort((rows, distances))[:k]
+                    best_rows, best_distances = rows[order], distances[order]
+            if (len(best_rows) == k and best_distances[-1] <= bound) or bound > limit:
+                break
+        return best_rows, best_distances
+
+    @METRICS.instrument('corridor_search')
+    def corridor_query(self, route, width_km):
+        """Stations with free slots within width_km of a route, in the order the route passes them.
+
+        Returns rows, distances from the route and positions along it (both km).
+        Each segment only checks the stations in grid cells overlapping its
+        bounding box grown by width_km. The gaps between the route's parts are
+        not searched.
+        """
+        points = route.points
+        if len(points) == 1:
+            rows, distances = self.radius_query(points[0][0], points[0][1], width_km)
+            return rows, distances, np.zeros(len(rows))
+
+        columns = self.station_columns
+        # Neighbouring segments overlap in most of their cells; gather each cell's free stations once
+        cell_stations = {}
+
+        def stations_in(cell):
+            entry = cell_stations.get(cell)
+            if entry is None:
+                rows = np.array(self.station_index.cells[cell], dtype=np.intp)
+                rows = rows[columns.available_slots[rows] > 0]
+                entry = cell_stations[cell] = (rows, np.degrees(columns.lat_rad[rows]), np.degrees(columns.lon_rad[rows]))
+            return entry
+
+        found_rows, found_distances, found_along = [], [], []
+        start_km = 0.0
+        for a, b in route.segments():
+            cells = [stations_in(cell) for cell in self.station_index.cells_in_box(
+                min(a[0], b[0]), max(a[0], b[0]), min(a[1], b[1]), max(a[1], b[1]), width_km)]
+            if cells:
+                rows = np.concatenate([c[0] for c in cells])
+                distances, along = segment_distances(np.concatenate([c[1] for c in cells]),
+                                                     np.concatenate([c[2] for c in cells]), a, b)
+                near = distances <= width_km
+                found_rows.append(rows[near])
+                found_distances.append(distances[near])
+                found_along.append(along[near] + start_km)
+            start_km += segment_length(a, b)
+
+        if not found_rows:
+            return np.empty(0, dtype=np.intp), np.empty(0), np.empty(0)
+        rows = np.concatenate(found_rows)
+        distances = np.concatenate(found_distances)
+        along = np.concatenate(found_along)
+        # A station near several segments counts where the route passes closest to it
+        order = np.lexsort((distances, rows))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = rows[order][1:] != rows[order][:-1]
+        keep = order[first]
+        rows, distances, along = rows[keep], distances[keep], along[keep]
+
+        order = np.lexsort((rows, along))
+        return rows[order], distances[order], along[order]
+
+    @METRICS.instrument('filter_match')
+    def matches(self, rows, access_type="all", power_type="all", status=None, owner_type=None, open_at=None):
+        """Boolean array saying which rows pass the categorical filters, and are open at minute-of-week open_at if given"""
+        keep = self.filter_index.matches(rows, access_type=access_type, power_types=power_type,
+                                         status=status, owner_type=owner_type)
+        if open_at is not None:
+            keep &= self.hours_index.open_at(rows, open_at)
+        return keep
+
+    @METRICS.instrument('materialize_results')
+    def materialize(self, rows, distances) -> List[StationResult]:
+        """Result views (station + distance) for the given rows"""
+        rows = rows.tolist()
+        take = getattr(self.stations, 'take', None)
+        # A snapshot-backed catalog builds the records it has not handed out yet in bulk
+        stations = take(rows) if take else [self.stations[i] for i in rows]
+        return [StationResult(station, distance) for station, distance in zip(stations, distances.tolist())]
+
+    def nearby(self, lat, lon, radius) -> List[StationResult]:
+        """Stations with free slots within radius km, nearest first"""
+        return self.materialize(*self.radius_query(lat, lon, radius))
+
+    def search_rows(self, lat, lon, radius, access_type="all", power_type="all", k=None, open_at=None):
+        """Rows and distances of matching stations within radius km, nearest first; only the k nearest if k is given.
+
+        open_at (minute of the week, see opening_hours) keeps only stations open then.
+        """
+        if k is None and access_type == "all" and power_type == "all" and open_at is None:
+            return self.radius_query(lat, lon, radius)
+        key = self.query_cache.key('search', lat, lon, radius, access_type, power_type, k, open_at)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+        version = self.query_cache.token()
+        if k is not None:
+            rows, distances = self.nearest(lat, lon, k, access_type, power_type, radius, open_at)
+            # A full top-k only changes if something closer than its k-th hit does
+            reach = float(distances[-1]) if len(rows) == k else radius
+            return self._remember(key, version, lat, lon, reach, rows, distances)
+        rows, distances = self.radius_query(lat, lon, radius)
+        keep = self.matches(rows, access_type, power_type, open_at=open_at)
+        return self._remember(key, version, lat, lon, radius, rows[keep], distances[keep])
+
+    def search(self, lat, lon, radius, access_type="all", power_type="all", k=None, open_at=None) -> List[StationResult]:
+        """Matching stations within radius km, nearest first; only the k nearest if k is given"""
+        return self.materialize(*self.search_rows(lat, lon, radius, access_type, power_type, k, open_at))
+
+    def station_texts(self, start, stop) -> List[str]:
+        """Name and address of rows start to stop, as the text index reads them"""
+        texts = getattr(self.stations, 'texts', None)
+        if texts:
+            return texts(start, stop)
+        return [f"{s.name} {s.address}" for s in self.stations[start:stop]]
+
+    def sync_text_index(self):
+        """Index the names and addresses of stations added since the last text search"""
+        with METRICS.timer('text_index_sync'):
+            self.text_index.sync(len(self.stations), self.station_texts)
+
+    @METRICS.instrument('text_search')
+    def text_rows(self, query, lat, lon, radius=None, access_type="all", power_type="all", open_at=None,
+                  limit=None):
+        """Rows and distances of stations with free slots whose name or address match query, best match first.
+
+        With a radius only stations within it are matched; the filters work as in
+        search_rows. Equally good matches come nearest first.
+        """
+        self.sync_text_index()
+        # The matches are usually far fewer than the stations in the radius, so filter them rather than search it
+        rows, scores = self.text_index.match(query)
+        keep = self.matches(rows, access_type, power_type, open_at=open_at)
+        keep &= self.station_columns.available_slots[rows] > 0
+        rows, scores = rows[keep], scores[keep]
+        if limit is not None and len(rows) > limit:
+            best = self._best_text_rows(rows, scores, lat, lon, radius, limit)
+            if best is not None:
+                return best
+        distances = self.station_columns.distances(lat, lon, rows)
+        if radius is not None:
+            near = distances <= radius
+            rows, scores, distances = rows[near], scores[near], distances[near]
+        order = best_first(scores, distances, limit)
+        return rows[order], distances[order]
+
+    def _best_text_rows(self, rows, scores, lat, lon, radius, limit):
+        """text_rows for more matches than limit, measuring only those that can make it; None if the radius leaves too few.
+
+        Matches scoring above the limit-th best are all in. Among the ones tied
+        with it the nearest win, found through the grid when they are a large
+        part of the catalog.
+        """
+        cutoff = -np.partition(-scores, limit - 1)[limit - 1]
+        above = scores > cutoff
+        tied = rows[scores == cutoff]
+        rows, scores = rows[above], scores[above]
+        distances = self.station_columns.distances(lat, lon, rows)
+        if radius is not None:
+            near = distances <= radius
+            rows, scores, distances = rows[near], scores[near], distances[near]
+        need = limit - len(rows)
+        if len(tied) * TEXT_GRID_SHARE > len(self.stations):
+            among = np.zeros(len(self.stations), dtype=bool)
+            among[tied] = True
+            tied, tied_distances = self.nearest(lat, lon, need, max_radius=radius, among=among)
+        else:
+            tied_distances = self.station_columns.distances(lat, lon, tied)
+            if radius is not None:
+                near = tied_distances <= radius
+                tied, tied_distances = tied[near], tied_distances[near]
+        if len(tied) < need:
+            # Only possible with a radius: lower scoring matches inside it fill the rest
+            return None
+        rows = np.concatenate((rows, tied))
+        scores = np.concatenate((scores, np.full(len(tied), cutoff)))
+        distances = np.concatenate((distances, tied_distances))
+        order = best_first(scores, distances, limit)
+        return rows[order], distances[order]
+
+    def suggest(self, query, limit=8) -> List[str]:
+        """Completions of the last word of query, from the words indexed so far"""
+        return self.text_index.complete(query, limit)
+
+
+def build_engine(providers_path='providers.db', datasets=(), store=None, snapshot=None) -> StationEngine:
+    """Engine over the public stations, registered providers and any datasets; store is left open if given.
+
+    With snapshot, the catalog is mapped from that snapshot file when it was
+    built from the same inputs, and otherwise built from source and the
+    snapshot rewritten.
+    """
+    if store is not None:
+        providers = store.load_all()
+    else:
+        store = open_provider_store(providers_path)
+        try:
+            providers = store.load_all()
+        finally:
+            store.close()
+    if snapshot:
+        from catalog_snapshot import SnapshotError, catalog_signature, load_catalog, save_snapshot
+        try:
+            loaded = load_catalog(snapshot, PUBLIC_STATIONS, providers, datasets)
+        except SnapshotError as e:
+            print(f"Ignoring snapshot: {e}", file=sys.stderr)
+            loaded = None
+        if loaded is not None:
+            engine, added = loaded
+            print(f"Loaded {len(engine)} stations from {snapshot}", file=sys.stderr)
+            if added:
+                save_snapshot(engine, snapshot, catalog_signature(PUBLIC_STATIONS, providers, datasets))
+            return engine
+    stations = PUBLIC_STATIONS + [provider_to_station(p) for p in providers]
+    engine = StationEngine(stations)
+    for path in datasets:
+        report = import_stations(path, engine)
+        print(report.summary(), file=sys.stderr)
+    if snapshot:
+        save_snapshot(engine, snapshot, catalog_signature(PUBLIC_STATIONS, providers, datasets))
+    return engine
+
+
+def parse_query(line) -> Dict:
+    """Parse one JSON or CSV query line"""
+    line = line.strip()
+    if line.startswith('{'):
+        raw = json.loads(line)
+        text = str(raw.get("q") or "").strip() or None
+        query = {
+            "lat": float(raw["lat"]),
+            "lon": float(raw["lon"]),
+            "radius": float(raw["radius"]) if raw.get("radius") is not None else None if text else 25.0,
+            "access_type": raw.get("access_type", "all"),
+            "power_type": raw.get("power_type", "all"),
+            "k": int(raw["k"]) if raw.get("k") is not None else None,
+            "open_at": parse_open_at(raw["open_at"]) if raw.get("open_at") else None,
+            "q": text
+        }
+        if not isinstance(query["access_type"], str) or not isinstance(query["power_type"], str):
+            raise TypeError("access_type and power_type must be strings")
+    else:
+        parts = [p.strip() for p in line.split(',')]
+        query = {
+            "lat": float(parts[0]),
+            "lon": float(parts[1]),
+            "radius": float(parts[2]) if len(parts) > 2 and parts[2] else 25.0,
+            "access_type": parts[3] if len(parts) > 3 and parts[3] else "all",
+            "power_type": parts[4] if len(parts) > 4 and parts[4] else "all",
+            "k": int(parts[5]) if len(parts) > 5 and parts[5] else None,
+            "open_at": parse_open_at(parts[6]) if len(parts) > 6 and parts[6] else None,
+            "q": None
+        }
+    return query
+
+
+def run_queries(engine, lines, out):
+    """Answer each query line, writing one JSON result per line to out"""
+    count = 0
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        try:
+            query = parse_query(line)
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            out.write(json.dumps({"line": line_no, "error": f"Invalid query: {e}"}) + "\n")
+            continue
+        if query["q"] is not None:
+            rows, distances = engine.text_rows(query["q"], query["lat"], query["lon"], query["radius"],
+                                               query["access_type"], query["power_type"], query["open_at"], query["k"])
+            stations = engine.materialize(rows, distances)
+        else:
+            stations = engine.search(query["lat"], query["lon"], query["radius"],
+                                     query["access_type"], query["power_type"], query["k"], query["open_at"])
+        out.write(json.dumps({"line": line_no, "query": query,
+                              "count": len(stations), "stations": [s.to_dict() for s in stations]}) + "\n")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run EV station searches without the GUI")
+    parser.add_argument("queries", help="file of JSON or CSV queries, '-' for stdin")
+    parser.add_argument("--providers", default="providers.db", help="provider store (.db, or legacy .json)")
+    parser.add_argument("--dataset", action="append", default=[], help="external station dataset to import (repeatable)")
+    parser.add_argument("--output", default="-", help="JSON-lines output file, '-' for stdout")
+    parser.add_argument("--snapshot", help="binary catalog snapshot to load from, or write after building")
+    args = parser.parse_args(argv)
+
+    engine = build_engine(args.providers, args.dataset, snapshot=args.snapshot)
+    src = sys.stdin if args.queries == '-' else open(args.queries, 'r')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        run_queries(engine, src, out)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
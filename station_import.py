@@ -0,0 +1,387 @@
+"""Streaming import of external station datasets.
+
+Supported inputs:
+  * CSV with station-schema headers (latitude, longitude, name, address,
+    power_types separated by ';', max_power, price_per_kwh, ...)
+  * JSON arrays and JSON-lines files of either station-schema records or
+    Open Charge Map POIs (detected by their AddressInfo block)
+
+Files are parsed incrementally, one record at a time, and each valid record
+goes straight into StationEngine.add_station, so memory stays bounded by the
+catalog itself rather than by the size of the export.
+
+    python station_import.py ocm_india.json --report import_report.json
+"""
+import argparse
+import csv
+import json
+import math
+import re
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from instrumentation import METRICS
+from opening_hours import hours_problem
+
+# Bumped when records map to different stations (ids, fields), so catalog snapshots of datasets are rebuilt
+MAPPING_VERSION = 3
+CHUNK_SIZE = 1 << 16
+MAX_REPORTED_ERRORS = 100
+NUMBER_TAIL = re.compile(r'[0-9.eE+\-\s]*')
+WHITESPACE = re.compile(r'\s*')
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, source):
+        self.source = source
+        self.accepted = 0
+        self.rejected = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.reasons: Dict[str, int] = {}
+        # Records imported with a problem, such as hours that will be treated as unknown
+        self.warned = 0
+        self.warnings: List[Tuple[int, str]] = []
+        self.warning_reasons: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def total(self):
+        return self.accepted + self.rejected
+
+    @property
+    def rows_per_sec(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, record_no, reason):
+        self.rejected += 1
+        key = reason.split(':')[0]
+        self.reasons[key] = self.reasons.get(key, 0) + 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((record_no, reason))
+
+    def warn(self, record_no, reason):
+        self.warned += 1
+        key = reason.split(':')[0]
+        self.warning_reasons[key] = self.warning_reasons.get(key, 0) + 1
+        if len(self.warnings) < MAX_REPORTED_ERRORS:
+            self.warnings.append((record_no, reason))
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self):
+        return (f"{self.source}: {self.accepted} imported, {self.rejected} rejected, {self.warned} warnings "
+                f"in {self.elapsed:.2f}s ({self.rows_per_sec:,.0f} rows/sec)")
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "elapsed_sec": round(self.elapsed, 4),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+            "reasons": self.reasons,
+            "errors": [{"record": n, "reason": r} for n, r in self.errors],
+            "warned": self.warned,
+            "warning_reasons": self.warning_reasons,
+            "warnings": [{"record": n, "reason": r} for n, r in self.warnings]
+        }
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE) -> Iterator[Dict]:
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    raise
+                break
+            # A number at the end of the buffer may be cut short
+            if not eof and NUMBER_TAIL.match(buffer, end).end() == len(buffer):
+                break
+            following = WHITESPACE.match(buffer, end).end()
+            if following < len(buffer) and buffer[following] not in ',]':
+                raise ValueError(f"Unexpected {buffer[following]!r} after array element")
+            yield record
+            pos = end
+        buffer = buffer[pos:]
+        if eof:
+            if buffer.strip():
+                raise ValueError("Unterminated JSON array")
+            return
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+
+def iter_json_lines(f) -> Iterator[Dict]:
+    """Records of a JSON-lines file; a malformed line comes through as an InvalidRecord so it can be rejected"""
+    for line in f:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield InvalidRecord("invalid JSON")
+
+
+def _number(record, key, cast=float, default=None):
+    value = record.get(key)
+    if value is None or value == '':
+        if default is None:
+            raise InvalidRecord(f"missing {key}")
+        return default
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"invalid {key}: {value!r}")
+    if isinstance(number, float) and not math.isfinite(number):
+        raise InvalidRecord(f"invalid {key}: {value!r}")
+    return number
+
+
+def _text(record, key, default=None) -> Optional[str]:
+    value = record.get(key)
+    if value is None or value == '':
+        return default
+    if not isinstance(value, str):
+        raise InvalidRecord(f"invalid {key}: {value!r}")
+    return value
+
+
+def _object(record, key) -> Dict:
+    value = record.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise InvalidRecord(f"invalid {key}: {value!r}")
+    return value
+
+
+def _record_id(record, key, default):
+    value = record.get(key)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise InvalidRecord(f"invalid {key}: {value!r}")
+    return value
+
+
+def _power_types(record) -> List[str]:
+    power_types = record.get('power_types') or []
+    if isinstance(power_types, str):
+        return [p.strip() for p in power_types.split(';') if p.strip()]
+    if not isinstance(power_types, list) or not all(isinstance(p, str) for p in power_types):
+        raise InvalidRecord(f"invalid power_types: {power_types!r}")
+    return power_types
+
+
+def _check_coordinates(lat, lon):
+    if not -90 <= lat <= 90:
+        raise InvalidRecord(f"latitude out of range: {lat}")
+    if not -180 <= lon <= 180:
+        raise InvalidRecord(f"longitude out of range: {lon}")
+
+
+def map_station_record(record, record_no) -> Dict:
+    """Validate a record already in (roughly) the station schema"""
+    lat = _number(record, 'latitude')
+    lon = _number(record, 'longitude')
+    _check_coordinates(lat, lon)
+    power_types = _power_types(record)
+
+    total_slots = _number(record, 'total_slots', int, 1)
+    available_slots = _number(record, 'available_slots', int, total_slots)
+    if total_slots < 0 or not 0 <= available_slots <= total_slots:
+        raise InvalidRecord(f"invalid slots: {available_slots}/{total_slots}")
+
+    price = record.get('price_per_kwh')
+    return {
+        # Kept apart from the built-in and provider ids, which are plain integers
+        "id": f"import:{_record_id(record, 'id', record_no)}",
+        "name": _text(record, 'name', "Unnamed station"),
+        "address": _text(record, 'address', ""),
+        "latitude": lat,
+        "longitude": lon,
+        "total_slots": total_slots,
+        "available_slots": available_slots,
+        "power_types": power_types,
+        "max_power": _number(record, 'max_power', float, 0.0),
+        "price_per_kwh": None if price in (None, '') else _number(record, 'price_per_kwh'),
+        "status": _text(record, 'status', "open"),
+        "access_type": _text(record, 'access_type', "public"),
+        "owner_type": _text(record, 'owner_type', "commercial"),
+        "operating_hours": _text(record, 'operating_hours', "Unknown")
+    }
+
+
+def _connector_name(title):
+    if 'CCS' in title:
+        return 'CCS'
+    if 'CHAdeMO' in title:
+        return 'CHAdeMO'
+    if 'Type 2' in title or 'Mennekes' in title:
+        return 'Type 2'
+    if 'Type 1' in title or 'J1772' in title:
+        return 'Type 1'
+    return title
+
+
+def _ocm_price(poi) -> Optional[float]:
+    usage_cost = _text(poi, 'UsageCost')
+    if not usage_cost:
+        return None
+    if 'free' in usage_cost.lower():
+        return 0.0
+    match = re.search(r'(\d+(?:\.\d+)?)', usage_cost)
+    return float(match.group(1)) if match else None
+
+
+def map_ocm_record(poi, record_no) -> Dict:
+    """Map an Open Charge Map POI onto the station schema"""
+    info = _object(poi, 'AddressInfo')
+    lat = _number(info, 'Latitude')
+    lon = _number(info, 'Longitude')
+    _check_coordinates(lat, lon)
+
+    power_types = []
+    max_power = 0.0
+    points = 0
+    connections = poi.get('Connections') or []
+    if not isinstance(connections, list) or not all(isinstance(c, dict) for c in connections):
+        raise InvalidRecord("invalid Connections")
+    for connection in connections:
+        title = _text(_object(connection, 'ConnectionType'), 'Title')
+        if title:
+            name = _connector_name(title)
+            if name not in power_types:
+                power_types.append(name)
+        max_power = max(max_power, _number(connection, 'PowerKW', float, 0.0))
+        points += _number(connection, 'Quantity', int, 1)
+
+    total_slots = _number(poi, 'NumberOfPoints', int, points or 1)
+    if total_slots < 0:
+        raise InvalidRecord(f"invalid NumberOfPoints: {total_slots}")
+    operational = _object(poi, 'StatusType').get('IsOperational') is not False
+    usage = _text(_object(poi, 'UsageType'), 'Title', '').lower()
+    address = ', '.join(part for part in (_text(info, 'AddressLine1'), _text(info, 'Town'),
+                                          _text(info, 'StateOrProvince')) if part)
+
+    return {
+        "id": f"ocm:{_record_id(poi, 'ID', record_no)}",
+        "name": _text(info, 'Title', "Unnamed station"),
+        "address": address,
+        "latitude": lat,
+        "longitude": lon,
+        "total_slots": total_slots,
+        "available_slots": total_slots if operational else 0,
+        "power_types": power_types,
+        "max_power": max_power,
+        "price_per_kwh": _ocm_price(poi),
+        "status": "open" if operational else "closed",
+        "access_type": "private" if 'private' in usage else "public",
+        "owner_type": "commercial",
+        "operating_hours": "Unknown"
+    }
+
+
+def map_record(record, record_no) -> Dict:
+    if isinstance(record, InvalidRecord):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord("not an object")
+    if 'AddressInfo' in record:
+        return map_ocm_record(record, record_no)
+    return map_station_record(record, record_no)
+
+
+def detect_format(path):
+    lower = path.lower()
+    if lower.endswith('.csv'):
+        return 'csv'
+    if lower.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'json'
+
+
+def iter_stations(path, report, fmt=None) -> Iterator[Dict]:
+    """Valid stations from the dataset at path, one at a time; rejects are recorded in report"""
+    fmt = fmt or detect_format(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            records = csv.DictReader(f)
+        elif fmt == 'jsonl':
+            records = iter_json_lines(f)
+        else:
+            records = iter_json_array(f)
+
+        for record_no, record in enumerate(records, 1):
+            try:
+                station = map_record(record, record_no)
+            except InvalidRecord as e:
+                report.reject(record_no, str(e))
+                continue
+            problem = hours_problem(station["operating_hours"])
+            if problem:
+                report.warn(record_no, f"unrecognised operating_hours: {problem}")
+            report.accepted += 1
+            yield station
+    METRICS.incr('import_rows_accepted', report.accepted)
+    METRICS.incr('import_rows_rejected', report.rejected)
+
+
+def import_stations(path, engine, fmt=None) -> ImportReport:
+    """Stream the dataset at path into engine, returning a validation report"""
+    report = ImportReport(path)
+    for station in iter_stations(path, report, fmt):
+        engine.add_station(station)
+    report.finish()
+    return report
+
+
+def main(argv=None):
+    from station_engine import StationEngine
+
+    parser = argparse.ArgumentParser(description="Validate and import an external station dataset")
+    parser.add_argument("dataset", help="CSV, JSON array or JSON-lines file")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl"], help="override format detection")
+    parser.add_argument("--report", help="write the full import report as JSON")
+    args = parser.parse_args(argv)
+
+    engine = StationEngine()
+    report = import_stations(args.dataset, engine, args.format)
+    print(report.summary())
+    for reason, count in sorted(report.reasons.items(), key=lambda item: -item[1]):
+        print(f"  rejected {count}: {reason}")
+    for reason, count in sorted(report.warning_reasons.items(), key=lambda item: -item[1]):
+        print(f"  warned {count}: {reason}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report.to_dict(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Compact station records and search-result views.
+
+A station used to be a 14-16 key dict, and every search hit was copied just
+to attach its distance. StationRecord keeps the fields in __slots__ and
+interns the categorical values that repeat across the catalog (status, access
+and owner type, connector lists), so each station only pays for what is
+unique to it. The shared tables live as long as the process, so free text
+such as hours, contact details and dates is never interned. Provider-only
+fields such as contact_info go in a small side dict that ordinary stations
+don't have.
+
+Records and StationResult views still read like the old dicts
+(station['name'], station.get('contact_info')), so the GUI, map renderer and
+exporters work on either.
+"""
+from typing import Dict, Optional, Tuple
+
+FIELDS = ('id', 'name', 'address', 'latitude', 'longitude', 'total_slots', 'available_slots',
+          'power_types', 'max_power', 'price_per_kwh', 'status', 'access_type', 'owner_type',
+          'operating_hours')
+FIELD_SET = frozenset(FIELDS)
+INTERNED_FIELDS = frozenset(('status', 'access_type', 'owner_type'))
+
+# Every distinct categorical value and connector combination is stored once and shared
+_values: Dict = {}
+_power_types: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_value(value):
+    return _values.setdefault(value, value) if type(value) is str else value
+
+
+def intern_power_types(values) -> Tuple[str, ...]:
+    key = tuple(values)
+    shared = _power_types.get(key)
+    if shared is None:
+        shared = _power_types[key] = tuple(intern_value(v) for v in key)
+    return shared
+
+
+class StationRecord:
+    __slots__ = FIELDS + ('extra',)
+
+    def __init__(self, id, name, address, latitude, longitude, total_slots, available_slots,
+                 power_types, max_power, price_per_kwh, status, access_type, owner_type,
+                 operating_hours, extra: Optional[Dict] = None):
+        self.id = id
+        self.name = name
+        self.address = address
+        self.latitude = latitude
+        self.longitude = longitude
+        self.total_slots = total_slots
+        self.available_slots = available_slots
+        self.power_types = intern_power_types(power_types)
+        self.max_power = max_power
+        self.price_per_kwh = price_per_kwh
+        self.status = intern_value(status)
+        self.access_type = intern_value(access_type)
+        self.owner_type = intern_value(owner_type)
+        self.operating_hours = operating_hours
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, station) -> 'StationRecord':
+        extra = None
+        if station.keys() - FIELD_SET:
+            extra = {k: v for k, v in station.items() if k not in FIELD_SET}
+        return cls(station['id'], station['name'], station['address'], station['latitude'],
+                   station['longitude'], station['total_slots'], station['available_slots'],
+                   station['power_types'], station['max_power'], station['price_per_kwh'],
+                   station.get('status'), station.get('access_type'), station.get('owner_type'),
+                   station.get('operating_hours'), extra)
+
+    def __getitem__(self, key):
+        if key in FIELD_SET:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'power_types':
+            value = intern_power_types(value)
+        elif key in INTERNED_FIELDS:
+            value = intern_value(value)
+        if key in FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in FIELD_SET or bool(self.extra) and key in self.extra
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None and key in FIELD_SET else value
+
+    def keys(self):
+        return list(FIELDS) + list(self.extra or ())
+
+    def to_dict(self) -> Dict:
+        station = {name: getattr(self, name) for name in FIELDS}
+        station['power_types'] = list(self.power_types)
+        if self.extra:
+            station.update(self.extra)
+        return station
+
+    def __repr__(self):
+        return f"StationRecord(id={self.id!r}, name={self.name!r})"
+
+
+class StationResult:
+    """A search hit: the catalog record plus its distance from the search origin.
+
+    estimate is the charging estimate for the current vehicle, when one was
+    asked for (see charging_estimate).
+    """
+
+    __slots__ = ('station', 'distance', 'estimate')
+
+    def __init__(self, station: StationRecord, distance: float, estimate: Optional[Dict] = None):
+        self.station = station
+        self.distance = distance
+        self.estimate = estimate
+
+    def __getitem__(self, key):
+        if key == 'distance_km':
+            return round(self.distance, 2)
+        return self.station[key]
+
+    def __contains__(self, key):
+        return key == 'distance_km' or key in self.station
+
+    def get(self, key, default=None):
+        if key == 'distance_km':
+            return round(self.distance, 2)
+        return self.station.get(key, default)
+
+    def keys(self):
+        return self.station.keys() + ['distance_km']
+
+    def to_dict(self) -> Dict:
+        result = self.station.to_dict()
+        result['distance_km'] = round(self.distance, 2)
+        if self.estimate is not None:
+            result['charge_estimate'] = self.estimate
+        return result
+
+    def __repr__(self):
+        return f"StationResult(id={self.station.id!r}, distance_km={self.distance:.2f})"
@@ -0,0 +1,391 @@
+"""Local HTTP/JSON station search service.
+
+One StationEngine is built at startup and shared by a fixed pool of worker
+threads; open keep-alive connections only occupy a worker while one of their
+requests is being handled. Searches hold a shared lock and run concurrently (the numpy parts
+release the GIL). Registrations take the exclusive side of the lock, so the
+provider store sees one write at a time and a search never runs against a
+half-added station.
+
+    python station_server.py --port 8080 --workers 8 --dataset ocm_india.json
+    python load_test.py --url http://127.0.0.1:8080 --concurrency 16 --duration 20
+
+Endpoints:
+    GET  /health
+    GET  /search?lat=9.93&lon=76.27&radius=25&access_type=public&power_type=CCS&k=10&limit=100
+                           &open_at=now (or an ISO date-time, or "Sat 9PM")
+                           &battery_kwh=60&soc_now=20&soc_target=80&max_kw=100&connectors=CCS,Type 2
+                           &sort=cost (distance, cost, time or score; needs the vehicle)
+                           &q=lulu mal (name or address, typos allowed; best matches first,
+                                        anywhere unless radius is given)
+    GET  /suggest?q=ernak&limit=8   completions of the last word of q
+    POST /providers        provider JSON, as the GUI registration form produces
+    POST /providers/batch  JSON array of providers, registered all or none
+    GET  /metrics          Prometheus text format
+"""
+import argparse
+import json
+import math
+import selectors
+import socket
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from charging_estimate import RANKINGS, ChargeEstimator, VehicleProfile
+from instrumentation import METRICS
+from opening_hours import parse_open_at
+from provider_import import register_providers, validate_providers
+from provider_store import ProviderStoreError, open_provider_store
+from station_engine import build_engine
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ReadWriteLock:
+    """Many readers or one writer; a waiting writer holds off new readers"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class StationService:
+    """The request handlers' view of the catalog and provider store"""
+
+    def __init__(self, engine, store):
+        self.engine = engine
+        self.store = store
+        self.lock = ReadWriteLock()
+
+    def search(self, params) -> Dict:
+        try:
+            lat = float(params["lat"])
+            lon = float(params["lon"])
+            text = params.get("q", "").strip() or None
+            # A name search covers the whole catalog unless it is given a radius
+            radius = float(params["radius"]) if params.get("radius") else None if text else 25.0
+            k = int(params["k"]) if params.get("k") else None
+            limit = int(params["limit"]) if params.get("limit") else None
+            open_at = parse_open_at(params["open_at"]) if params.get("open_at") else None
+            profile = self.vehicle_profile(params)
+        except KeyError as e:
+            raise RequestError(400, f"Missing parameter {e}")
+        except ValueError as e:
+            raise RequestError(400, f"Invalid parameter: {e}")
+        # float() accepts nan and inf, which the grid cannot place
+        if not (math.isfinite(lat) and -90 <= lat <= 90):
+            raise RequestError(400, f"Invalid parameter: lat={lat} (must be within -90..90)")
+        if not (math.isfinite(lon) and -180 <= lon <= 180):
+            raise RequestError(400, f"Invalid parameter: lon={lon} (must be within -180..180)")
+        if radius is not None and not (math.isfinite(radius) and radius > 0):
+            raise RequestError(400, f"Invalid parameter: radius={radius} (must be a positive number of km)")
+        if k is not None and k < 1:
+            raise RequestError(400, f"Invalid parameter: k={k} (must be at least 1)")
+        if limit is not None and limit < 0:
+            raise RequestError(400, f"Invalid parameter: limit={limit} (must not be negative)")
+        access_type = params.get("access_type", "all")
+        power_type = params.get("power_type", "all")
+        sort = params.get("sort", "distance")
+        if sort not in RANKINGS or (sort != "distance" and profile is None):
+            raise RequestError(400, f"Invalid parameter: sort={sort!r} (one of {', '.join(RANKINGS)}, with a vehicle)")
+
+        self.lock.acquire_read()
+        try:
+            if text is not None:
+                rows, distances = self.engine.text_rows(text, lat, lon, radius, access_type, power_type, open_at, k)
+            else:
+                rows, distances = self.engine.search_rows(lat, lon, radius, access_type, power_type, k, open_at)
+            results = self.engine.materialize(rows[:limit], distances[:limit]) if profile is None else \
+                self.estimated(rows, distances, profile, sort, limit)
+            shown = [s.to_dict() for s in results]
+        finally:
+            self.lock.release_read()
+        return {"count": len(rows), "stations": shown}
+
+    def suggest(self, params) -> Dict:
+        try:
+            limit = int(params.get("limit", 8))
+        except ValueError as e:
+            raise RequestError(400, f"Invalid parameter: {e}")
+        if limit < 0:
+            raise RequestError(400, f"Invalid parameter: limit={limit} (must not be negative)")
+        self.lock.acquire_read()
+        try:
+            self.engine.sync_text_index()
+            suggestions = self.engine.suggest(params.get("q", ""), limit)
+        finally:
+            self.lock.release_read()
+        return {"suggestions": suggestions}
+
+    @staticmethod
+    def vehicle_profile(params):
+        """The VehicleProfile described by the request, or None if it names no battery"""
+        if not params.get("battery_kwh"):
+            return None
+        connectors = params.get("connectors", "Type 2,CCS").replace(';', ',').split(',')
+        return VehicleProfile(params["battery_kwh"], params.get("soc_now", 20), params.get("soc_target", 80),
+                              params["max_kw"], connectors)
+
+    def estimated(self, rows, distances, profile, sort, limit):
+        """Results ranked by sort for the vehicle, each carrying its charge estimate"""
+        order, estimates = ChargeEstimator(self.engine, rows, distances).rank(profile, sort)
+        order = order[:limit]
+        results = self.engine.materialize(rows[order], distances[order])
+        for result, position in zip(results, order.tolist()):
+            result.estimate = estimates.to_dict(position)
+        return results
+
+    def register(self, records) -> List[int]:
+        """Validate and register providers, all or none; returns their ids"""
+        providers, report = validate_providers(records)
+        if report.rejected:
+            reasons = "; ".join(f"record {n}: {reason}" for n, reason in report.errors)
+            raise RequestError(400, f"{report.rejected} invalid providers, nothing registered: {reasons}")
+
+        self.lock.acquire_write()
+        try:
+            ids = register_providers(providers, self.store, self.engine)
+        except ProviderStoreError as e:
+            raise RequestError(409, str(e))
+        finally:
+            self.lock.release_write()
+        METRICS.incr('providers_registered', len(ids))
+        return ids
+
+    def health(self) -> Dict:
+        return {"status": "ok", "stations": len(self.engine), "query_cache": self.engine.query_cache.stats(),
+                "unrecognised_hours": sum(self.engine.hours_index.unparsed_counts().values())}
+
+
+class StationRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so load generators and dashboards can reuse connections
+    protocol_version = "HTTP/1.1"
+    server_version = "EVStationServer/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, handler):
+        try:
+            with METRICS.timer('http_request'):
+                status, body = handler()
+            self._send(status, body)
+        except RequestError as e:
+            self._send(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"Internal error: {e}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service = self.server.service
+        if url.path == "/search":
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            self._handle(lambda: (200, service.search(params)))
+        elif url.path == "/suggest":
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            self._handle(lambda: (200, service.suggest(params)))
+        elif url.path == "/health":
+            self._handle(lambda: (200, service.health()))
+        elif url.path == "/metrics":
+            self._send(200, METRICS.to_prometheus(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path not in ("/providers", "/providers/batch"):
+            self._send(404, {"error": f"Unknown path {url.path}"})
+            return
+
+        def register():
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                # The body's end is unknown, so the connection cannot carry another request
+                self.close_connection = True
+                raise RequestError(400, f"Invalid Content-Length: {self.headers.get('Content-Length')!r}")
+            try:
+                data = self.rfile.read(length)
+            except TimeoutError:
+                self.close_connection = True
+                raise RequestError(408, "Timed out reading the request body")
+            try:
+                body = json.loads(data or b"null")
+            except ValueError as e:
+                raise RequestError(400, f"Invalid JSON: {e}")
+            if url.path == "/providers":
+                return 201, {"id": self.server.service.register([body])[0]}
+            if not isinstance(body, list) or not body:
+                raise RequestError(400, "Expected a non-empty JSON array of providers")
+            return 201, {"ids": self.server.service.register(body)}
+        self._handle(register)
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer whose worker pool serves requests rather than connections.
+
+    Idle keep-alive connections wait in a selector on a dispatcher thread and
+    only take a worker while a request is being handled, so a few hundred
+    open clients can share a handful of workers.
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, address, service, workers=8, verbose=False, request_timeout=10.0):
+        super().__init__(address, StationRequestHandler)
+        self.service = service
+        self.verbose = verbose
+        # A client that stops halfway through a request gives its worker back after this long
+        self.request_timeout = request_timeout
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='station-worker')
+        self.selector = selectors.DefaultSelector()
+        self._idle = deque()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ)
+        self._closing = False
+        self._dispatcher = threading.Thread(target=self._dispatch, name='station-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def process_request(self, request, client_address):
+        handler = StationRequestHandler.__new__(StationRequestHandler)
+        handler.request, handler.client_address, handler.server = request, client_address, self
+        # setup() applies the timeout to the connection, so every read on a worker is bounded
+        handler.timeout = self.request_timeout
+        handler.setup()
+        self._park(handler)
+
+    def _park(self, handler):
+        """Hand a connection back to the dispatcher to wait for its next request"""
+        self._idle.append(handler)
+        self._wake_w.send(b'.')
+
+    def _dispatch(self):
+        while not self._closing:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.fileobj is self._wake_r:
+                    try:
+                        self._wake_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                else:
+                    self.selector.unregister(key.fileobj)
+                    self.pool.submit(self._serve, key.data)
+            while self._idle:
+                handler = self._idle.popleft()
+                self.selector.register(handler.connection, selectors.EVENT_READ, handler)
+
+    def _serve(self, handler):
+        try:
+            handler.close_connection = True
+            handler.handle_one_request()
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+            handler.close_connection = True
+        if handler.close_connection or self._closing:
+            try:
+                handler.finish()
+            except OSError:
+                pass
+            self.shutdown_request(handler.request)
+        else:
+            self._park(handler)
+
+    def server_close(self):
+        self._closing = True
+        self._wake_w.send(b'.')
+        self._dispatcher.join()
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                self.shutdown_request(key.fileobj)
+        self.selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve station search over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8, help="worker threads handling requests")
+    parser.add_argument("--providers", default="providers.db", help="provider store (.db, or legacy .json)")
+    parser.add_argument("--dataset", action="append", default=[], help="external station dataset to import (repeatable)")
+    parser.add_argument("--snapshot", help="binary catalog snapshot to load from, or write after building")
+    parser.add_argument("--synthetic", type=int, default=0, help="add N synthetic stations (as benchmark.py generates)")
+    parser.add_argument("--request-timeout", type=float, default=10.0,
+                        help="seconds a worker waits on a client that stalls mid-request")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    store = open_provider_store(args.providers)
+    engine = build_engine(datasets=args.dataset, store=store, snapshot=args.snapshot)
+    if args.synthetic:
+        from benchmark import generate_catalog
+        for station in generate_catalog(args.synthetic):
+            engine.add_station(station)
+    # Index names and addresses now rather than on the first ?q= request
+    engine.sync_text_index()
+    server = PooledHTTPServer((args.host, args.port), StationService(engine, store), args.workers, args.verbose,
+                              args.request_timeout)
+    print(f"Serving {len(engine)} stations on http://{args.host}:{server.server_port} "
+          f"with {args.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
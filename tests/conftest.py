@@ -0,0 +1,55 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The modules live at the top level of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from station_engine import StationEngine  # noqa: E402
+
+POWER_MIXES = (["Type 2"], ["CCS"], ["Type 2", "CCS"], ["CHAdeMO", "CCS"])
+ACCESS_TYPES = ("public", "private", "provider")
+
+
+def make_stations(n, seed, lat_range=(-90.0, 90.0), lon_range=(-180.0, 180.0), first_id=1):
+    """n stations in the station schema, spread uniformly over a lat/lon box"""
+    rng = random.Random(seed)
+    stations = []
+    for i in range(n):
+        total = rng.randint(1, 6)
+        stations.append({
+            "id": first_id + i,
+            "name": f"Station {i}",
+            "address": f"{rng.randint(1, 99)} Test Road",
+            "latitude": rng.uniform(*lat_range),
+            "longitude": rng.uniform(*lon_range),
+            "total_slots": total,
+            # Some stations are full, so the free-slot rule is exercised
+            "available_slots": rng.randint(0, total),
+            "power_types": rng.choice(POWER_MIXES),
+            "max_power": rng.choice([7, 22, 50, 150]),
+            "price_per_kwh": round(rng.uniform(0.1, 0.4), 2),
+            "status": "open",
+            "access_type": rng.choice(ACCESS_TYPES),
+            "owner_type": "commercial",
+            "operating_hours": rng.choice(["24/7", "6AM-10PM", "Mon-Fri 8AM-8PM", "Unknown"]),
+        })
+    return stations
+
+
+@pytest.fixture(scope="session")
+def kerala_stations():
+    # Numbered clear of the built-in stations, which tests load alongside
+    return make_stations(5000, seed=0, lat_range=(8.2, 12.8), lon_range=(74.8, 77.4), first_id=100000)
+
+
+@pytest.fixture
+def kerala_engine(kerala_stations):
+    return StationEngine(kerala_stations)
+
+
+@pytest.fixture(scope="session")
+def world_stations():
+    return make_stations(4000, seed=1)
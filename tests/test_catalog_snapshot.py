@@ -0,0 +1,143 @@
+import random
+
+import pytest
+
+import catalog_snapshot
+from catalog_snapshot import (FORMAT_VERSION, PREFIX, MappedGridIndex, SnapshotError, catalog_signature, load_catalog,
+                              load_snapshot, save_snapshot)
+from conftest import make_stations
+from provider_import import validate_provider
+from station_engine import PUBLIC_STATIONS, StationEngine, provider_to_station
+
+QUERIES = [(9.93, 76.27, 25, "all", "all", None, None), (9.93, 76.27, 25, "public", "CCS", None, None),
+           (10.52, 76.21, 50, "all", "all", 10, None), (8.52, 76.94, 15, "provider", "Type 2", None, 9 * 60),
+           (11.25, 75.78, 40, "all", "CHAdeMO", 5, 6 * 1440 + 23 * 60)]
+
+
+def make_provider(provider_id, name, lat=9.935, lon=76.268):
+    """A stored provider record, as registration produces it"""
+    provider = validate_provider({"name": name, "address": "MG Road, Kochi", "latitude": lat, "longitude": lon,
+                                  "total_slots": 2, "power_types": "CCS", "max_power": 60, "price_per_kwh": 0.2,
+                                  "pricing_model": "per_hour", "time_limits": "2 hours"}, 1)
+    provider["id"] = provider_id
+    return provider
+
+
+@pytest.fixture
+def engines(kerala_stations, tmp_path):
+    """A live engine and one loaded from its snapshot"""
+    live = StationEngine(PUBLIC_STATIONS + kerala_stations)
+    path = tmp_path / "catalog.snap"
+    save_snapshot(live, str(path), catalog_signature(PUBLIC_STATIONS, [], []))
+    mapped, _ = load_snapshot(str(path))
+    return live, mapped
+
+
+def assert_same_results(live, mapped):
+    for query in QUERIES:
+        rows, distances = live.search_rows(*query)
+        mapped_rows, mapped_distances = mapped.search_rows(*query)
+        assert mapped_rows.tolist() == rows.tolist()
+        assert mapped_distances.tolist() == distances.tolist()
+        assert [s.to_dict() for s in mapped.materialize(mapped_rows, mapped_distances)] == \
+            [s.to_dict() for s in live.materialize(rows, distances)]
+
+
+def test_snapshot_answers_like_the_live_catalog(engines):
+    live, mapped = engines
+    assert len(mapped) == len(live)
+    assert_same_results(live, mapped)
+    assert mapped.nearest(9.93, 76.27, 10, "public", "CCS")[0].tolist() == \
+        live.nearest(9.93, 76.27, 10, "public", "CCS")[0].tolist()
+
+
+def test_snapshot_text_search_matches(engines):
+    live, mapped = engines
+    for query in ("lulu mall", "kochi", "main road thrissur", "ernakulm", "stat"):
+        rows, distances = live.text_rows(query, 9.93, 76.27, None, limit=50)
+        mapped_rows, mapped_distances = mapped.text_rows(query, 9.93, 76.27, None, limit=50)
+        assert mapped_rows.tolist() == rows.tolist()
+        assert mapped_distances.tolist() == distances.tolist()
+
+
+def test_snapshot_takes_updates_and_new_stations(engines):
+    live, mapped = engines
+    rng = random.Random(51)
+    for _ in range(30):
+        station = live.stations[rng.randrange(len(live))]
+        slots = rng.randint(0, station.total_slots)
+        live.update_availability(station.id, slots)
+        mapped.update_availability(station.id, slots)
+    provider = make_provider(1001, "Snapshot Test Charger")
+    live.add_station(provider_to_station(provider))
+    mapped.add_station(provider_to_station(provider))
+    assert_same_results(live, mapped)
+
+
+def test_load_catalog_adds_new_providers_and_rejects_changed_inputs(kerala_stations, tmp_path):
+    path = str(tmp_path / "catalog.snap")
+    providers = [make_provider(1000, "A")]
+    engine = StationEngine(PUBLIC_STATIONS + [provider_to_station(p) for p in providers])
+    save_snapshot(engine, path, catalog_signature(PUBLIC_STATIONS, providers, []))
+
+    added = make_provider(1001, "C", 9.9, 76.3)
+    loaded, new = load_catalog(path, PUBLIC_STATIONS, providers + [added], [])
+    assert new == [added] and len(loaded) == len(engine) + 1
+    changed = [dict(providers[0], name="renamed")]
+    assert load_catalog(path, PUBLIC_STATIONS, changed, []) is None
+    assert load_catalog(path, PUBLIC_STATIONS[1:], providers, []) is None
+
+
+def test_other_format_versions_are_refused(engines, tmp_path):
+    live, _ = engines
+    path = tmp_path / "catalog.snap"
+    save_snapshot(live, str(path), {})
+    data = bytearray(path.read_bytes())
+    magic, _, offset, length = PREFIX.unpack_from(data)
+    PREFIX.pack_into(data, 0, magic, FORMAT_VERSION + 1, offset, length)
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+    (tmp_path / "junk.snap").write_bytes(b"not a snapshot" * 10)
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(tmp_path / "junk.snap"))
+
+
+def test_stale_snapshot_is_refused_before_the_catalog_is_built(kerala_stations, tmp_path, monkeypatch):
+    path = str(tmp_path / "catalog.snap")
+    save_snapshot(StationEngine(PUBLIC_STATIONS + kerala_stations), path, catalog_signature(PUBLIC_STATIONS, [], []))
+
+    def fail(*args):
+        raise AssertionError("built an engine for a stale snapshot")
+    monkeypatch.setattr(catalog_snapshot, "snapshot_engine", fail)
+    assert load_catalog(path, PUBLIC_STATIONS[1:], [], []) is None
+    assert load_catalog(path, PUBLIC_STATIONS, [], [str(tmp_path / "catalog.snap")]) is None
+
+
+def test_ids_keep_their_type(tmp_path):
+    stations = [dict(s, id=station_id) for s, station_id in
+                zip(make_stations(3, seed=61), [7, "import:7", "ocm:8"])]
+    path = str(tmp_path / "catalog.snap")
+    save_snapshot(StationEngine(stations), path, {})
+    mapped, _ = load_snapshot(path)
+    assert [mapped.stations[row].id for row in range(3)] == [7, "import:7", "ocm:8"]
+    assert mapped.update_availability(7, 0) == 0 and mapped.update_availability("7", 0) is None
+
+
+@pytest.mark.parametrize("station_id", [7.0, True, None, ("ocm", 8)])
+def test_ids_that_would_not_round_trip_are_refused(tmp_path, station_id):
+    engine = StationEngine([dict(make_stations(1, seed=62)[0], id=station_id)])
+    with pytest.raises(SnapshotError):
+        save_snapshot(engine, str(tmp_path / "catalog.snap"), {})
+    assert not list(tmp_path.iterdir())
+
+
+def test_grid_cells_are_read_from_the_mapping_until_changed(engines):
+    live, mapped = engines
+    assert isinstance(mapped.station_index, MappedGridIndex)
+    assert not any(isinstance(bucket, list) for bucket in mapped.station_index.cells.values())
+    provider = make_provider(1001, "Mapped Cell Charger")
+    live.add_station(provider_to_station(provider))
+    mapped.add_station(provider_to_station(provider))
+    assert sum(isinstance(bucket, list) for bucket in mapped.station_index.cells.values()) == 1
+    assert_same_results(live, mapped)
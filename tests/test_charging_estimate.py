@@ -0,0 +1,159 @@
+import math
+
+import numpy as np
+import pytest
+
+from charging_estimate import (CHARGE_EFFICIENCY, FREE, PER_HOUR, PER_KWH, PER_MINUTE, PER_SESSION,
+                               ChargeEstimator, TariffError, TariffIndex, VehicleError, VehicleProfile,
+                               parse_pricing_model, parse_time_limit, tariff_problem)
+from station_engine import StationEngine
+
+
+def station(station_id, power_types, max_power, price, **extra):
+    return dict({
+        "id": station_id,
+        "name": f"Station {station_id}",
+        "address": "1 Test Road",
+        "latitude": 9.93 + station_id / 1000,
+        "longitude": 76.27,
+        "total_slots": 2,
+        "available_slots": 1,
+        "power_types": power_types,
+        "max_power": max_power,
+        "price_per_kwh": price,
+        "status": "open",
+        "access_type": "public",
+        "owner_type": "commercial",
+        "operating_hours": "24/7",
+    }, **extra)
+
+
+def estimator(stations, distances=None):
+    engine = StationEngine(stations)
+    rows = np.arange(len(stations))
+    return ChargeEstimator(engine, rows, distances if distances is not None else np.zeros(len(stations)))
+
+
+def test_pricing_models_and_time_limits_parse():
+    assert parse_pricing_model(None) == PER_KWH
+    assert parse_pricing_model("") == PER_KWH
+    assert parse_pricing_model("Per kWh") == PER_KWH
+    assert parse_pricing_model("per-hour") == PER_HOUR
+    assert parse_pricing_model("PER_MIN") == PER_MINUTE
+    assert parse_pricing_model("flat rate") == PER_SESSION
+    assert parse_pricing_model("free") == FREE
+    assert parse_time_limit(None) == math.inf
+    assert parse_time_limit("no_limit") == math.inf
+    assert parse_time_limit("2_hours") == 120
+    assert parse_time_limit("1h30m") == 90
+    assert parse_time_limit("45 min") == 45
+    with pytest.raises(TariffError):
+        parse_pricing_model("by the mile")
+    for text in ("two hours", "2 hours later", "0h"):
+        with pytest.raises(TariffError):
+            parse_time_limit(text)
+
+
+def test_tariff_problem_names_the_unreadable_field():
+    assert tariff_problem("per_kwh", "2_hours") is None
+    assert "pricing model" in tariff_problem("barter", None)
+    assert "time limit" in tariff_problem(None, "soon")
+
+
+def test_tariff_index_shares_ids_and_falls_back_to_defaults():
+    index = TariffIndex(capacity=1)
+    index.add(0, None)
+    index.add(1, {"pricing_model": "per_hour", "time_limits": "1_hour"})
+    index.add(2, {"pricing_model": "per_hour", "time_limits": "1_hour"})
+    index.add(3, {"pricing_model": "barter", "time_limits": "soon"})
+    assert len(index) == 4
+    assert index.rows[1] == index.rows[2] != 0
+    models, limits = index.gather(np.arange(4))
+    assert models.tolist() == [PER_KWH, PER_HOUR, PER_HOUR, PER_KWH]
+    assert limits.tolist() == [math.inf, 60, 60, math.inf]
+
+
+def test_vehicle_profile_rejects_impossible_values():
+    with pytest.raises(VehicleError):
+        VehicleProfile(0, 10, 80, 50)
+    with pytest.raises(VehicleError):
+        VehicleProfile(40, 80, 80, 50)
+    with pytest.raises(VehicleError):
+        VehicleProfile(40, 10, 101, 50)
+    with pytest.raises(VehicleError):
+        VehicleProfile(40, 10, 80, 0)
+    with pytest.raises(VehicleError):
+        VehicleProfile(40, 10, 80, 50, connectors=[" ", ""])
+    assert VehicleProfile(40, 10, 80, 50, connectors=["CCS", "CCS "]).connectors == ("CCS",)
+
+
+def test_cost_follows_the_pricing_model():
+    profile = VehicleProfile(40, 20, 60, 22, connectors=["Type 2"], ac_kw=22)
+    estimates = estimator([
+        station(1, ["Type 2"], 22, 0.3),
+        station(2, ["Type 2"], 22, 2.0, pricing_model="per_hour"),
+        station(3, ["Type 2"], 22, 0.05, pricing_model="per_minute"),
+        station(4, ["Type 2"], 22, 5.0, pricing_model="per_session"),
+        station(5, ["Type 2"], 22, 0.3, pricing_model="free"),
+    ]).estimate(profile)
+    energy = 40 * 0.4 / CHARGE_EFFICIENCY
+    hours = 40 * 0.4 / (22 * CHARGE_EFFICIENCY)
+    assert estimates.energy_kwh == pytest.approx([energy] * 5)
+    assert estimates.minutes == pytest.approx([hours * 60] * 5)
+    assert estimates.cost == pytest.approx([0.3 * energy, 2.0 * hours, 0.05 * hours * 60, 5.0, 0.0])
+    assert not estimates.truncated.any()
+
+
+def test_time_limit_truncates_the_session():
+    profile = VehicleProfile(60, 10, 90, 11, connectors=["Type 2"])
+    estimates = estimator([
+        station(1, ["Type 2"], 22, 0.3, time_limits="1_hour"),
+        station(2, ["Type 2"], 22, 0.3),
+    ]).estimate(profile)
+    assert estimates.truncated.tolist() == [True, False]
+    assert estimates.minutes[0] == pytest.approx(60)
+    assert estimates.minutes[1] > 60
+    # An hour at 11 kW on AC puts 11 * 0.9 kWh into the 60 kWh battery
+    assert estimates.soc_reached[0] == pytest.approx(10 + 100 * 11 * CHARGE_EFFICIENCY / 60)
+    assert estimates.soc_reached[1] == pytest.approx(90)
+    assert estimates.to_dict(0)["truncated"] is True
+
+
+def test_dc_power_is_capped_by_the_car_and_tapers():
+    profile = VehicleProfile(50, 10, 100, 100, connectors=["CCS", "Type 2"], ac_kw=7)
+    estimates = estimator([
+        station(1, ["CCS"], 150, 0.3),
+        station(2, ["Type 2"], 50, 0.3),
+    ]).estimate(profile)
+    assert estimates.power_kw.tolist() == [100, 7]
+    # Without the taper the DC session would take this long
+    assert estimates.minutes[0] > 50 * 0.9 / (100 * CHARGE_EFFICIENCY) * 60
+
+
+def test_incompatible_or_unknown_power_gets_no_estimate_and_ranks_last():
+    profile = VehicleProfile(40, 20, 80, 50, connectors=["CCS"])
+    charge = estimator([
+        station(1, ["CHAdeMO"], 50, 0.1),
+        station(2, ["CCS"], 0, 0.1),
+        station(3, ["CCS"], 50, 0.4),
+        station(4, ["CCS"], 50, 0.2),
+    ], distances=np.array([1.0, 2.0, 3.0, 4.0]))
+    order, estimates = charge.rank(profile, by="cost")
+    assert not estimates.compatible[0]
+    assert math.isnan(estimates.minutes[0]) and math.isnan(estimates.cost[0])
+    assert math.isnan(estimates.minutes[1])
+    assert estimates.to_dict(0) is None and estimates.to_dict(1) is None
+    assert order.tolist() == [3, 2, 0, 1]
+    assert charge.rank(profile, by="distance")[0].tolist() == [0, 1, 2, 3]
+    assert charge.rank(profile, by="time")[0][:2].tolist() == [2, 3]
+    with pytest.raises(ValueError):
+        charge.rank(profile, by="colour")
+
+
+def test_score_adds_the_value_of_time():
+    profile = VehicleProfile(40, 20, 80, 50, connectors=["CCS"], value_of_time=100)
+    charge = estimator([station(1, ["CCS"], 50, 0.2), station(2, ["CCS"], 50, 0.1)],
+                       distances=np.array([1.0, 40.0]))
+    # The cheaper station is an hour's drive further, which costs more than it saves
+    assert charge.rank(profile, by="cost")[0].tolist() == [1, 0]
+    assert charge.rank(profile, by="score")[0].tolist() == [0, 1]
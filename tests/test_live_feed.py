@@ -0,0 +1,107 @@
+import json
+import time
+
+import pytest
+
+from live_feed import FileTailSource, LiveFeed, parse_update
+from station_engine import PUBLIC_STATIONS, StationEngine
+
+
+@pytest.mark.parametrize("line", [
+    '{"id": [1], "status": "open"}', '{"id": {"n": 1}, "available_slots": 1}', '{"id": true, "status": "open"}',
+    '{"id": 1, "status": ["open"]}', '{"id": 1, "available_slots": "2"}', '{"id": 1, "available_slots": true}',
+    '{"id": 1}', '{"status": "open"}', '[1]', 'not json',
+])
+def test_malformed_updates_are_rejected(line):
+    assert parse_update(line) is None
+
+
+def test_valid_updates_are_accepted():
+    assert parse_update('{"id": 3, "available_slots": 0}') == {"id": 3, "available_slots": 0}
+    assert parse_update('{"id": "ocm:42", "status": "closed"}') == {"id": "ocm:42", "status": "closed"}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def latest_state(batches, station_id):
+    state = {}
+    for batch in list(batches):
+        for update in batch:
+            if update["id"] == station_id:
+                state.update(update)
+    return state
+
+
+def test_feed_survives_bad_lines_and_failing_batches(tmp_path):
+    path = tmp_path / "updates.jsonl"
+    path.write_text("")
+    batches = []
+
+    def on_batch(batch):
+        batches.append(batch)
+        if len(batches) == 1:
+            raise RuntimeError("first batch fails")
+
+    feed = LiveFeed(FileTailSource(str(path), poll_interval=0.01, from_start=True), on_batch, flush_interval=0.01).start()
+    try:
+        with open(path, "a") as f:
+            f.write('{"id": [1], "status": "open"}\n{"id": 1, "available_slots": 2}\n')
+        assert wait_for(lambda: len(batches) >= 1)
+        with open(path, "a") as f:
+            f.write('{"id": 2, "available_slots": 0}\n{"id": 2, "status": "closed"}\n')
+        assert wait_for(lambda: latest_state(batches[1:], 2) == {"id": 2, "available_slots": 0, "status": "closed"})
+        assert feed._thread.is_alive()
+    finally:
+        feed.stop()
+    assert batches[0] == [{"id": 1, "available_slots": 2}]
+
+
+class LineSource:
+    def __init__(self, lines):
+        self._lines = lines
+
+    def lines(self, stop):
+        yield from self._lines
+        while not stop.is_set():
+            yield None
+            stop.wait(0.01)
+
+
+def test_repeated_updates_are_coalesced_into_the_latest_state():
+    batches = []
+    lines = ['{"id": 2, "available_slots": 1}', '{"id": 3, "status": "closed"}', '{"id": 2, "available_slots": 0}',
+             '{"id": 2, "status": "closed"}']
+    feed = LiveFeed(LineSource(lines), batches.append, max_batch=10, flush_interval=60).start()
+    try:
+        # Nothing is flushed before the interval unless the batch is full
+        time.sleep(0.05)
+        assert batches == []
+    finally:
+        feed.stop()
+    feed = LiveFeed(LineSource(lines + ['{"id": %d, "status": "open"}' % i for i in range(4, 12)]),
+                    batches.append, max_batch=10, flush_interval=60).start()
+    try:
+        assert wait_for(lambda: batches)
+    finally:
+        feed.stop()
+    assert batches[0][:2] == [{"id": 2, "available_slots": 0, "status": "closed"}, {"id": 3, "status": "closed"}]
+    assert len(batches[0]) == 10
+
+
+def test_updates_change_the_engine_in_place():
+    engine = StationEngine(PUBLIC_STATIONS)
+    station = engine.stations[0]
+    lat, lon = station.latitude, station.longitude
+    assert station.id in {s["id"] for s in engine.search(lat, lon, 1)}
+    assert engine.update_availability(station.id, 0) == 0
+    assert station.id not in {s["id"] for s in engine.search(lat, lon, 1)}
+    assert engine.update_availability(station.id, 0) is None
+    assert engine.update_availability("no such station", 1) is None
+    engine.update_availability(station.id, station.total_slots + 5, "closed")
+    assert station.available_slots == station.total_slots and station.status == "closed"
+    assert json.loads(json.dumps(station.to_dict()))["status"] == "closed"
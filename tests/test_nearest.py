@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from station_engine import StationEngine
+
+FILTERS = [("all", "all"), ("public", "CCS"), ("provider", "Type 2"), ("private", "CHAdeMO")]
+
+
+def radius_then_truncate(engine, lat, lon, k, access_type, power_type, radius, open_at=None):
+    """What top-k replaces: every match in the radius, filtered, sorted, cut to k"""
+    rows, distances = engine.radius_query(lat, lon, radius)
+    keep = engine.matches(rows, access_type, power_type, open_at=open_at)
+    return rows[keep][:k].tolist(), distances[keep][:k].tolist()
+
+
+@pytest.mark.parametrize("k", [1, 5, 10, 50])
+@pytest.mark.parametrize("access_type, power_type", FILTERS)
+def test_nearest_equals_radius_search_truncated(kerala_engine, k, access_type, power_type):
+    rng = random.Random(k)
+    for _ in range(15):
+        lat, lon = rng.uniform(8.2, 12.8), rng.uniform(74.8, 77.4)
+        radius = rng.choice([2, 10, 50])
+        rows, distances = kerala_engine.nearest(lat, lon, k, access_type, power_type, radius)
+        assert (rows.tolist(), distances.tolist()) == radius_then_truncate(
+            kerala_engine, lat, lon, k, access_type, power_type, radius)
+
+
+def test_nearest_without_radius_searches_everywhere(world_stations):
+    engine = StationEngine(world_stations)
+    rng = random.Random(31)
+    for _ in range(20):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        rows, distances = engine.nearest(lat, lon, 10, "public", "CCS")
+        # Half the earth's circumference reaches every station
+        assert (rows.tolist(), distances.tolist()) == radius_then_truncate(
+            engine, lat, lon, 10, "public", "CCS", 20100)
+
+
+def test_nearest_with_open_at(kerala_engine):
+    for minute in (0, 9 * 60, 5 * 1440 + 23 * 60):
+        rows, distances = kerala_engine.nearest(9.93, 76.27, 20, "all", "all", 30, minute)
+        assert (rows.tolist(), distances.tolist()) == radius_then_truncate(
+            kerala_engine, 9.93, 76.27, 20, "all", "all", 30, minute)
+
+
+def test_search_rows_with_k_is_the_nearest(kerala_engine):
+    for _ in range(2):  # the second round is answered from the query cache
+        rows, distances = kerala_engine.search_rows(10.0, 76.3, 25, "public", "all", 15)
+        assert (rows.tolist(), distances.tolist()) == radius_then_truncate(
+            kerala_engine, 10.0, 76.3, 15, "public", "all", 25)
+
+
+def test_nearest_returns_fewer_when_radius_holds_fewer(kerala_engine):
+    rows, _ = kerala_engine.nearest(9.93, 76.27, 10 ** 6, "all", "all", 5)
+    assert len(rows) == len(radius_then_truncate(kerala_engine, 9.93, 76.27, 10 ** 6, "all", "all", 5)[0])
+    assert len(kerala_engine.nearest(9.93, 76.27, 0)[0]) == 0
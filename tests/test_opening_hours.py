@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from opening_hours import (MINUTES_PER_DAY, MINUTES_PER_WEEK, HoursError, HoursIndex, hours_problem, parse_hours,
+                           parse_open_at, parse_week, week_mask)
+from station_engine import StationEngine
+
+MON, SAT, SUN = 0, 5, 6
+HOURS = ["24/7", "10AM-10PM", "Mon-Fri 8AM-8PM; Sat 9AM-1PM", "22:00-06:00", "8AM-12PM, 2PM-8PM",
+         "Daily 6-10PM, Sun closed", "Mon closed", "Sat-Sun 9-5", "Sun 10PM-2AM", "Unknown", None, "whenever"]
+
+
+def at(day, hour, minute=0):
+    return day * MINUTES_PER_DAY + hour * 60 + minute
+
+
+@pytest.mark.parametrize("text, intervals", [
+    ("24/7", ((0, MINUTES_PER_WEEK),)),
+    ("Mon 9AM-5PM", ((at(MON, 9), at(MON, 17)),)),
+    ("Mon 6-10PM", ((at(MON, 18), at(MON, 22)),)),
+    ("Mon 9-5", ((at(MON, 9), at(MON, 17)),)),
+    ("Sun 10PM-2AM", ((0, at(MON, 2)), (at(SUN, 22), MINUTES_PER_WEEK))),
+    ("Daily 8AM-8PM, Sun closed", tuple((at(d, 8), at(d, 20)) for d in range(6))),
+])
+def test_parse_hours(text, intervals):
+    assert parse_hours(text) == intervals
+
+
+def test_days_no_rule_names_are_unknown():
+    assert parse_week("Mon-Fri 8AM-8PM")[1] == (SAT, SUN)
+    assert parse_week("Mon closed") == ((), tuple(range(1, 7)))
+    assert parse_week("10AM-10PM")[1] == ()
+
+
+@pytest.mark.parametrize("text", ["whenever", "Mon-Fri", "25:00-26:00", "Funday 9-5", "9AM-5PM maybe"])
+def test_unreadable_hours(text):
+    with pytest.raises(HoursError):
+        parse_hours(text)
+    assert hours_problem(text)
+
+
+def test_index_matches_the_unpacked_masks_at_every_minute():
+    index = HoursIndex(capacity=1)
+    for row, text in enumerate(HOURS * 3):
+        index.add(row, text)
+    rows = np.arange(len(index))
+    expected = np.array([week_mask(*parse_week(text)) if hours_problem(text) is None and text not in ("Unknown", None)
+                         else np.ones(MINUTES_PER_WEEK, dtype=bool) for text in HOURS * 3])
+    for minute in range(MINUTES_PER_WEEK):
+        assert np.array_equal(index.open_at(rows, minute), expected[:, minute])
+    assert index.unparsed_counts() == {"whenever": 3}
+
+
+def test_schedules_are_stored_as_bitmaps():
+    index = HoursIndex()
+    for row in range(200):
+        index.add(row, f"Mon {row % 12 + 1}AM-{row % 11 + 1}PM")
+    # One bit per minute: 1,260 bytes per distinct schedule rather than 10,080
+    assert index.week.dtype == np.uint8 and index.week.shape[1] == MINUTES_PER_WEEK // 8 == 1260
+    assert index.n_schedules == 1 + len({f"Mon {r % 12 + 1}AM-{r % 11 + 1}PM" for r in range(200)})
+
+
+def test_open_at_filter_keeps_unknown_hours():
+    stations = [{"id": i, "name": f"S{i}", "address": "", "latitude": 9.93, "longitude": 76.27 + i * 1e-3,
+                 "total_slots": 1, "available_slots": 1, "power_types": ["CCS"], "max_power": 50,
+                 "price_per_kwh": 0.2, "operating_hours": text} for i, text in enumerate(HOURS)]
+    engine = StationEngine(stations)
+    sunday_night = parse_open_at("Sun 11PM")
+    shown = {stations[row]["operating_hours"] for row in engine.search_rows(9.93, 76.27, 10, open_at=sunday_night)[0]}
+    assert shown == {"24/7", "22:00-06:00", "Mon closed", "Sun 10PM-2AM", "Unknown", None, "whenever",
+                     "Mon-Fri 8AM-8PM; Sat 9AM-1PM"}
+
+
+def test_parse_open_at():
+    monday = datetime(2026, 10, 19, 14, 5)
+    assert parse_open_at("now", monday) == at(MON, 14, 5)
+    assert parse_open_at("Sat 9PM", monday) == at(SAT, 21)
+    assert parse_open_at("18:30", monday) == at(MON, 18, 30)
+    assert parse_open_at("2026-10-25T07:00", monday) == at(SUN, 7)
+    with pytest.raises(HoursError):
+        parse_open_at("Sat 25:00", monday)
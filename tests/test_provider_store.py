@@ -0,0 +1,108 @@
+import json
+import threading
+
+import pytest
+
+from provider_store import (FIRST_PROVIDER_ID, JsonProviderStore, ProviderStore, ProviderStoreError,
+                            SQLiteProviderStore, open_provider_store)
+
+
+def provider(provider_id, name):
+    return {"id": provider_id, "name": name, "latitude": 9.93, "longitude": 76.27}
+
+
+def write_legacy(tmp_path, providers):
+    path = tmp_path / "providers.json"
+    path.write_text(json.dumps(providers))
+    return str(path)
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ProviderStore()
+
+
+def test_migration_keeps_every_provider_with_shared_ids(tmp_path):
+    legacy = write_legacy(tmp_path, [provider(1000, "A"), provider(1000, "B"), provider(1001, "C")])
+    store = SQLiteProviderStore(str(tmp_path / "providers.db"), legacy_json=legacy)
+    loaded = store.load_all()
+    assert sorted(p["name"] for p in loaded) == ["A", "B", "C"]
+    assert len({p["id"] for p in loaded}) == 3
+    assert {p["name"]: p["id"] for p in loaded}["A"] == 1000
+    # New registrations are numbered after the renumbered ones
+    new = [provider(None, "D")]
+    assert store.add_new(new)[0] > max(p["id"] for p in loaded)
+    store.close()
+
+
+def test_migration_runs_once(tmp_path):
+    legacy = write_legacy(tmp_path, [provider(1000, "A")])
+    db = str(tmp_path / "providers.db")
+    SQLiteProviderStore(db, legacy_json=legacy).close()
+    store = SQLiteProviderStore(db, legacy_json=legacy)
+    assert store.migrate_json(legacy) == 0
+    assert [p["name"] for p in store.load_all()] == ["A"]
+    store.close()
+
+
+@pytest.mark.parametrize("records", [[{"name": "no id"}], [provider("1000", "text id")], ["not a record"]])
+def test_migration_rejects_records_without_an_integer_id(tmp_path, records):
+    legacy = write_legacy(tmp_path, records)
+    with pytest.raises(ProviderStoreError):
+        SQLiteProviderStore(str(tmp_path / "providers.db"), legacy_json=legacy)
+
+
+def test_unreadable_legacy_file_is_a_store_error(tmp_path):
+    path = tmp_path / "providers.json"
+    path.write_text("{not json")
+    with pytest.raises(ProviderStoreError):
+        SQLiteProviderStore(str(tmp_path / "providers.db"), legacy_json=str(path))
+
+
+def test_add_new_allocates_distinct_ids_across_connections(tmp_path):
+    db = str(tmp_path / "providers.db")
+    SQLiteProviderStore(db).close()
+    ids, errors = [], []
+
+    def register(n):
+        store = SQLiteProviderStore(db)
+        try:
+            for i in range(n):
+                ids.extend(store.add_new([provider(None, f"P{i}"), provider(None, f"Q{i}")]))
+        except Exception as e:  # surfaced below; a thread swallows it otherwise
+            errors.append(e)
+        finally:
+            store.close()
+
+    threads = [threading.Thread(target=register, args=(10,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(ids) == len(set(ids)) == 80 and min(ids) >= FIRST_PROVIDER_ID
+
+
+def test_add_and_update(tmp_path):
+    store = open_provider_store(str(tmp_path / "providers.db"), legacy_json=None)
+    store.add(provider(1500, "A"))
+    with pytest.raises(ProviderStoreError):
+        store.add(provider(1500, "again"))
+    store.update(provider(1500, "renamed"))
+    assert [p["name"] for p in store.load_all()] == ["renamed"]
+    with pytest.raises(ProviderStoreError):
+        store.update(provider(1501, "missing"))
+    store.close()
+
+
+def test_json_store_writes_atomically_and_allocates_past_existing_ids(tmp_path):
+    path = str(tmp_path / "providers.json")
+    store = open_provider_store(path)
+    assert isinstance(store, JsonProviderStore)
+    store.add(provider(1004, "A"))
+    assert store.add_new([provider(None, "B")]) == [1005]
+    with pytest.raises(TypeError):
+        store.add_new([dict(provider(None, "C"), extra=object())])
+    reloaded = JsonProviderStore(path).providers
+    assert [p["name"] for p in reloaded] == ["A", "B"]
+    assert list(tmp_path.iterdir()) == [tmp_path / "providers.json"]
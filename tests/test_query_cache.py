@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from query_cache import QueryCache
+from spatial_index import KM_PER_DEG_LAT, haversine_km
+from station_engine import StationEngine
+
+QUERIES = [(9.93, 76.27, 25, "all", "all", None), (9.93, 76.27, 25, "public", "CCS", None),
+           (9.93, 76.27, 50, "all", "all", 10), (10.52, 76.21, 10, "all", "Type 2", 5),
+           (8.52, 76.94, 25, "all", "all", None)]
+
+
+@pytest.fixture
+def engines(kerala_stations):
+    """An engine with the query cache and an identical one without it"""
+    cached = StationEngine(kerala_stations)
+    uncached = StationEngine(kerala_stations)
+    uncached.query_cache = QueryCache(max_entries=0)
+    return cached, uncached
+
+
+def assert_same_results(cached, uncached):
+    for query in QUERIES:
+        rows, distances = cached.search_rows(*query)
+        expected_rows, expected_distances = uncached.search_rows(*query)
+        assert rows.tolist() == expected_rows.tolist()
+        assert distances.tolist() == expected_distances.tolist()
+
+
+def test_repeated_searches_are_cache_hits(engines):
+    cached, uncached = engines
+    assert_same_results(cached, uncached)
+    hits = cached.query_cache.hits
+    assert_same_results(cached, uncached)
+    assert cached.query_cache.hits == hits + len(QUERIES)
+
+
+def test_results_stay_exact_after_availability_changes(engines):
+    cached, uncached = engines
+    rng = random.Random(41)
+    assert_same_results(cached, uncached)
+    for _ in range(40):
+        station = cached.stations[rng.randrange(len(cached))]
+        slots = rng.randint(0, station.total_slots)
+        for engine in engines:
+            engine.update_availability(station.id, slots)
+        assert_same_results(cached, uncached)
+
+
+def test_results_stay_exact_after_stations_are_added(engines):
+    cached, uncached = engines
+    assert_same_results(cached, uncached)
+    template = dict(cached.stations[0].to_dict())
+    for i, (lat, lon) in enumerate([(9.931, 76.271), (10.52, 76.2), (8.5, 76.9), (12.9, 74.9)]):
+        station = dict(template, id=900000 + i, latitude=lat, longitude=lon, available_slots=2,
+                       total_slots=2, power_types=["CCS", "Type 2"], access_type="public")
+        for engine in engines:
+            engine.add_station(station)
+        assert_same_results(cached, uncached)
+
+
+def test_changes_only_evict_results_covering_them(kerala_stations):
+    engine = StationEngine(kerala_stations)
+    kochi = engine.search_rows(9.93, 76.27, 10)
+    far = engine.search_rows(8.52, 76.94, 10)
+    # A station in Kochi changes: the Thiruvananthapuram result is still served from the cache
+    row = int(kochi[0][0])
+    engine.update_availability(engine.stations[row].id, 0)
+    hits = engine.query_cache.hits
+    rows, distances = engine.search_rows(8.52, 76.94, 10)
+    assert rows is far[0] and distances is far[1]
+    assert engine.query_cache.hits == hits + 1
+    assert row not in engine.search_rows(9.93, 76.27, 10)[0].tolist()
+
+
+def test_lru_eviction_is_bounded(kerala_stations):
+    engine = StationEngine(kerala_stations)
+    engine.query_cache = QueryCache(max_entries=3)
+    for lat in (9.0, 9.5, 10.0, 10.5, 11.0):
+        engine.search_rows(lat, 76.3, 5)
+    assert len(engine.query_cache) == 3
+    assert engine.query_cache.stats()["evictions"] == 2
+
+
+def test_nearby_origins_do_not_share_results():
+    # One station 25.005 km due north of a; b is 10 m further north (same 1e-4 degree cell), so only b has it within 25 km
+    a_lat, lon = 9.929955, 76.27
+    station_lat = a_lat + 25.005 / KM_PER_DEG_LAT
+    b_lat = a_lat + 0.010 / KM_PER_DEG_LAT
+    engine = StationEngine([{"id": 1, "name": "Edge", "address": "", "latitude": station_lat, "longitude": lon,
+                             "total_slots": 1, "available_slots": 1, "power_types": ["CCS"], "max_power": 50,
+                             "price_per_kwh": 0.2}])
+    assert len(engine.search_rows(a_lat, lon, 25)[0]) == 0
+    rows, distances = engine.search_rows(b_lat, lon, 25)
+    assert rows.tolist() == [0]
+    assert distances[0] == pytest.approx(haversine_km(b_lat, lon, station_lat, lon), abs=1e-9)
+    # Distances are those from the actual origin, not from an earlier one nearby
+    engine.search_rows(b_lat, lon, 50)
+    assert engine.search_rows(a_lat, lon, 50)[1][0] == pytest.approx(
+        haversine_km(a_lat, lon, station_lat, lon), abs=1e-9)
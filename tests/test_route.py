@@ -0,0 +1,88 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from conftest import make_stations
+from route import Route, RouteError, load_route, segment_distances
+from station_engine import StationEngine
+
+GPX = """<?xml version="1.0"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="9.90" lon="76.20"/><trkpt lat="10.00" lon="76.25"/>
+  </trkseg><trkseg>
+    <trkpt lat="10.80" lon="76.60"/><trkpt lat="10.90" lon="76.65"/>
+  </trkseg></trk>
+</gpx>"""
+
+
+def brute_corridor(engine, route, width_km):
+    """Every free station within width_km of some segment of the route"""
+    columns = engine.station_columns
+    lat, lon = np.degrees(columns.lat_rad), np.degrees(columns.lon_rad)
+    best = np.full(len(lat), np.inf)
+    for a, b in route.segments():
+        best = np.minimum(best, segment_distances(lat, lon, a, b)[0])
+    return set(np.flatnonzero((best <= width_km) & (columns.available_slots > 0)).tolist())
+
+
+def test_gpx_segments_stay_separate(tmp_path):
+    path = tmp_path / "trip.gpx"
+    path.write_text(GPX)
+    route = load_route(str(path))
+    assert route.name == "trip" and len(route.parts) == 2
+    assert route.parts[0][0] == (9.90, 76.20) and route.parts[1][-1] == (10.90, 76.65)
+    # Only the two segments count towards the length, not the 90 km gap
+    assert route.length_km < 30
+
+
+def test_geojson_features_and_multilinestring_parts_stay_separate(tmp_path):
+    data = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "LineString", "coordinates": [[76.2, 9.9], [76.25, 10.0]]}},
+        {"type": "Feature", "geometry": {"type": "MultiLineString",
+                                         "coordinates": [[[76.6, 10.8], [76.65, 10.9]], [[77.0, 11.0]]]}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.0, 9.0]}}]}
+    path = tmp_path / "trip.geojson"
+    path.write_text(json.dumps(data))
+    route = load_route(str(path))
+    assert [(part[0], part[-1]) for part in route.parts] == [
+        ((9.9, 76.2), (10.0, 76.25)), ((10.8, 76.6), (10.9, 76.65)), ((11.0, 77.0), (11.0, 77.0))]
+
+
+@pytest.mark.parametrize("text, name", [("<gpx><trk/></gpx>", "empty.gpx"), ("<gpx", "broken.gpx"),
+                                        ('{"type": "Point", "coordinates": [76, 9]}', "point.geojson"),
+                                        ('{"type": "LineString", "coordinates": [["a"]]}', "bad.geojson")])
+def test_unreadable_routes_raise_route_error(tmp_path, text, name):
+    path = tmp_path / name
+    path.write_text(text)
+    with pytest.raises(RouteError):
+        load_route(str(path))
+
+
+def test_corridor_does_not_search_the_gap_between_parts():
+    # One station halfway between the parts, right on the straight line joining them
+    gap = {"id": "gap", "name": "Gap", "address": "", "latitude": 10.4, "longitude": 76.425, "total_slots": 2,
+           "available_slots": 2, "power_types": ["CCS"], "max_power": 50, "price_per_kwh": 0.2}
+    ends = [dict(gap, id="start", latitude=9.95, longitude=76.225), dict(gap, id="end", latitude=10.85, longitude=76.625)]
+    engine = StationEngine([gap] + ends)
+    route = Route([[(9.90, 76.20), (10.00, 76.25)], [(10.80, 76.60), (10.90, 76.65)]])
+    rows, distances, along = engine.corridor_query(route, 5)
+    assert [engine.stations[row].id for row in rows.tolist()] == ["start", "end"]
+    assert np.all(np.diff(along) >= 0)
+
+
+def test_corridor_matches_brute_force():
+    stations = make_stations(6000, seed=31, lat_range=(8.5, 11.5), lon_range=(75.5, 77.5))
+    engine = StationEngine(stations)
+    rng = random.Random(32)
+    for _ in range(10):
+        parts = [[(rng.uniform(8.5, 11.5), rng.uniform(75.5, 77.5)) for _ in range(rng.randint(1, 4))]
+                 for _ in range(rng.randint(1, 3))]
+        route = Route(parts)
+        width = rng.choice([1, 5, 15])
+        rows, distances, _ = engine.corridor_query(route, width)
+        assert len(set(rows.tolist())) == len(rows)
+        assert set(rows.tolist()) == brute_corridor(engine, route, width)
+        assert np.all(distances <= width)
@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+import pytest
+
+from sharded_search import ShardedSearch
+
+FILTERS = [("all", "all", None), ("public", "CCS", None), ("all", "all", 5), ("provider", "Type 2", 3)]
+
+
+def origins(n, seed):
+    rng = random.Random(seed)
+    return [(rng.uniform(8.0, 13.0), rng.uniform(74.6, 77.6)) for _ in range(n)]
+
+
+def assert_same_as_engine(engine, sharded, points, radius, access_type, power_type, k):
+    lats, lons = zip(*points)
+    result = sharded.search_batch(lats, lons, radius, access_type, power_type, k)
+    assert len(result) == len(points)
+    for i, (lat, lon) in enumerate(points):
+        rows, distances = result[i]
+        expected_rows, expected_distances = engine.search_rows(lat, lon, radius, access_type, power_type, k)
+        assert rows.tolist() == expected_rows.tolist()
+        np.testing.assert_array_equal(distances, expected_distances)
+
+
+@pytest.mark.parametrize("shards", [1, 3, 8])
+@pytest.mark.parametrize("access_type, power_type, k", FILTERS)
+def test_sharded_in_process_matches_engine(kerala_engine, shards, access_type, power_type, k):
+    sharded = ShardedSearch(kerala_engine, shards=shards, processes=False, tile_cells=4)
+    try:
+        assert_same_as_engine(kerala_engine, sharded, origins(40, shards), 30, access_type, power_type, k)
+    finally:
+        sharded.close()
+
+
+def test_sharded_processes_match_engine(kerala_engine):
+    with ShardedSearch(kerala_engine, shards=2, tile_cells=4) as sharded:
+        for access_type, power_type, k in FILTERS:
+            assert_same_as_engine(kerala_engine, sharded, origins(25, 61), 25, access_type, power_type, k)
+
+
+def test_unbounded_nearest_matches_engine(kerala_engine):
+    sharded = ShardedSearch(kerala_engine, shards=4, processes=False, tile_cells=4)
+    try:
+        lats, lons = zip(*origins(20, 71))
+        result = sharded.search_batch(lats, lons, None, "public", "CCS", 5)
+        for i, (lat, lon) in enumerate(zip(lats, lons)):
+            rows, distances = result[i]
+            expected_rows, expected_distances = kerala_engine.nearest(lat, lon, 5, "public", "CCS")
+            assert rows.tolist() == expected_rows.tolist()
+            np.testing.assert_array_equal(distances, expected_distances)
+    finally:
+        sharded.close()
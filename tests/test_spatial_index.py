@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import make_stations
+from spatial_index import GridIndex, haversine_km
+from station_engine import StationEngine
+
+
+def linear_scan(stations, lat, lon, radius):
+    """The search the grid replaced: every station with free slots within radius, nearest first"""
+    found = []
+    for row, station in enumerate(stations):
+        if station["available_slots"] <= 0:
+            continue
+        distance = haversine_km(lat, lon, station["latitude"], station["longitude"])
+        if distance <= radius:
+            found.append((distance, row))
+    found.sort()
+    return [row for _, row in found], [distance for distance, _ in found]
+
+
+def assert_same_as_scan(engine, stations, lat, lon, radius):
+    rows, distances = engine.radius_query(lat, lon, radius)
+    expected_rows, expected_distances = linear_scan(stations, lat, lon, radius)
+    assert rows.tolist() == expected_rows
+    np.testing.assert_allclose(distances, expected_distances, rtol=0, atol=1e-9)
+
+
+def edge_stations():
+    """Stations crowded on both sides of the antimeridian and around both poles"""
+    return (make_stations(800, seed=2, lat_range=(-20, 20), lon_range=(175, 180))
+            + make_stations(800, seed=3, lat_range=(-20, 20), lon_range=(-180, -175))
+            + make_stations(500, seed=4, lat_range=(84, 90))
+            + make_stations(500, seed=5, lat_range=(-90, -84)))
+
+
+@pytest.mark.parametrize("radius", [0.5, 5, 25, 100, 1000])
+def test_radius_query_matches_linear_scan_kerala(kerala_engine, kerala_stations, radius):
+    rng = random.Random(radius)
+    for _ in range(20):
+        lat, lon = rng.uniform(8.2, 12.8), rng.uniform(74.8, 77.4)
+        assert_same_as_scan(kerala_engine, kerala_stations, lat, lon, radius)
+
+
+def test_radius_query_matches_linear_scan_world(world_stations):
+    engine = StationEngine(world_stations)
+    rng = random.Random(7)
+    for _ in range(50):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        assert_same_as_scan(engine, world_stations, lat, lon, rng.choice([50, 500, 2000]))
+
+
+@pytest.mark.parametrize("lat, lon", [
+    (0.0, 179.99), (0.0, -179.99), (10.0, 180.0), (-10.0, -180.0), (5.0, 179.5),
+    (89.99, 0.0), (90.0, 45.0), (-89.99, 120.0), (-90.0, -60.0), (87.0, 179.9), (-86.0, -179.9),
+])
+@pytest.mark.parametrize("radius", [10, 200, 800])
+def test_radius_query_across_antimeridian_and_poles(lat, lon, radius):
+    stations = edge_stations()
+    engine = StationEngine(stations)
+    assert_same_as_scan(engine, stations, lat, lon, radius)
+
+
+def test_antimeridian_search_finds_both_sides():
+    stations = edge_stations()
+    engine = StationEngine(stations)
+    rows, _ = engine.radius_query(0.0, 180.0, 300)
+    longitudes = [stations[row]["longitude"] for row in rows.tolist()]
+    assert any(lon > 0 for lon in longitudes) and any(lon < 0 for lon in longitudes)
+
+
+def test_cells_in_radius_cover_every_station_in_the_circle():
+    grid = GridIndex(cell_size_deg=0.5)
+    stations = make_stations(3000, seed=11) + edge_stations()
+    for key, station in enumerate(stations):
+        grid.insert(key, station["latitude"], station["longitude"])
+    rng = random.Random(12)
+    origins = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(30)] + [(0, 180), (90, 0), (-89.9, 10)]
+    for lat, lon in origins:
+        radius = rng.choice([20, 300, 3000])
+        candidates = {key for cell in grid.cells_in_radius(lat, lon, radius) for key in grid.cells[cell]}
+        inside = {key for key, s in enumerate(stations)
+                  if haversine_km(lat, lon, s["latitude"], s["longitude"]) <= radius}
+        assert inside <= candidates
+
+
+def test_remove_keeps_index_consistent():
+    stations = make_stations(200, seed=13, lat_range=(9, 11), lon_range=(76, 77))
+    grid = GridIndex()
+    for key, station in enumerate(stations):
+        grid.insert(key, station["latitude"], station["longitude"])
+    for key in range(0, 200, 2):
+        grid.remove(key, stations[key]["latitude"], stations[key]["longitude"])
+    assert len(grid) == 100
+    remaining = sorted(key for bucket in grid.cells.values() for key in bucket)
+    assert remaining == list(range(1, 200, 2))
@@ -0,0 +1,50 @@
+import random
+
+import numpy as np
+
+from conftest import make_stations
+from spatial_index import haversine_km
+from station_columns import StationColumns, haversine_batch
+from station_record import StationRecord
+
+
+def columns_for(stations):
+    columns = StationColumns()
+    columns.extend(StationRecord.from_dict(s) for s in stations)
+    return columns
+
+
+def test_batch_distances_match_scalar_haversine(world_stations):
+    columns = columns_for(world_stations)
+    rng = random.Random(21)
+    for lat, lon in [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(20)] + [(90, 0), (-90, 0), (0, 180)]:
+        expected = [haversine_km(lat, lon, s["latitude"], s["longitude"]) for s in world_stations]
+        np.testing.assert_allclose(columns.distances(lat, lon), expected, rtol=0, atol=1e-9)
+
+
+def test_batch_distances_for_selected_rows(kerala_stations):
+    columns = columns_for(kerala_stations)
+    rows = np.arange(0, len(kerala_stations), 7)
+    expected = [haversine_km(9.93, 76.27, kerala_stations[r]["latitude"], kerala_stations[r]["longitude"])
+                for r in rows.tolist()]
+    np.testing.assert_allclose(columns.distances(9.93, 76.27, rows), expected, rtol=0, atol=1e-9)
+
+
+def test_many_origins_give_a_distance_matrix():
+    stations = make_stations(300, seed=22)
+    columns = columns_for(stations)
+    lats, lons = np.array([0.0, 45.5, -89.0]), np.array([0.0, -120.25, 179.9])
+    matrix = haversine_batch(lats, lons, columns.lat_rad, columns.lon_rad)
+    assert matrix.shape == (3, 300)
+    for i in range(3):
+        expected = [haversine_km(lats[i], lons[i], s["latitude"], s["longitude"]) for s in stations]
+        np.testing.assert_allclose(matrix[i], expected, rtol=0, atol=1e-9)
+
+
+def test_columns_grow_and_track_slots():
+    stations = make_stations(1000, seed=23)
+    columns = columns_for(stations)
+    assert len(columns) == 1000
+    assert columns.available_slots.tolist() == [s["available_slots"] for s in stations]
+    columns.set(5, 'available_slots', 0)
+    assert columns.available_slots[5] == 0
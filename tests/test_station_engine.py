@@ -0,0 +1,34 @@
+import io
+import json
+
+from station_engine import PUBLIC_STATIONS, StationEngine, run_queries
+
+
+def answer(lines):
+    out = io.StringIO()
+    count = run_queries(StationEngine(PUBLIC_STATIONS), lines, out)
+    return count, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_bad_query_lines_are_reported_and_the_batch_continues():
+    count, results = answer([
+        '{"lat": null, "lon": 76.27}',
+        '{"lat": 9.93, "lon": 76.27, "access_type": ["public"]}',
+        '{"lat": 9.93, "lon": 76.27, "k": [1]}',
+        '{"lat": 9.93}',
+        '{"lat": 9.93, "lon"',
+        'north, 76.27',
+        '9.93',
+        '{"lat": 9.93, "lon": 76.27, "radius": 25}',
+        '9.93, 76.27, 25, public, CCS, 3',
+    ])
+    assert count == 2
+    assert [r["line"] for r in results] == list(range(1, 10))
+    assert all(r["error"].startswith("Invalid query") for r in results[:7])
+    assert results[7]["count"] > 0 and "error" not in results[7]
+    assert results[8]["query"]["k"] == 3 and results[8]["count"] <= 3
+
+
+def test_comments_and_blank_lines_are_skipped():
+    count, results = answer(["# header", "", "9.93, 76.27"])
+    assert count == 1 and results[0]["line"] == 3
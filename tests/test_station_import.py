@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from station_engine import StationEngine
+from station_import import InvalidRecord, import_stations, iter_json_array, map_record
+
+STATION = {"id": 7, "name": "Depot", "address": "Kochi", "latitude": 9.93, "longitude": 76.27,
+           "power_types": "CCS;Type 2", "total_slots": 4, "available_slots": 2, "max_power": 50}
+OCM = {"ID": 42, "AddressInfo": {"Title": "Mall", "AddressLine1": "MG Road", "Town": "Kochi",
+                                 "Latitude": 9.97, "Longitude": 76.28},
+       "Connections": [{"ConnectionType": {"Title": "CCS (Type 2)"}, "PowerKW": 60, "Quantity": 2},
+                       {"ConnectionType": {"Title": "Type 2 (Socket Only)"}, "PowerKW": 22}],
+       "UsageCost": "Rs 18/kWh", "StatusType": {"IsOperational": True}, "UsageType": {"Title": "Public"}}
+
+
+def write_lines(tmp_path, records):
+    path = tmp_path / "stations.jsonl"
+    path.write_text("\n".join(r if isinstance(r, str) else json.dumps(r) for r in records) + "\n")
+    return str(path)
+
+
+def test_station_and_ocm_records_map_to_namespaced_stations():
+    station = map_record(STATION, 1)
+    assert station["id"] == "import:7" and station["power_types"] == ["CCS", "Type 2"]
+    assert station["available_slots"] == 2 and station["operating_hours"] == "Unknown"
+    assert map_record(dict(STATION, id=None), 5)["id"] == "import:5"
+    poi = map_record(OCM, 1)
+    assert poi["id"] == "ocm:42" and poi["power_types"] == ["CCS", "Type 2"]
+    assert poi["total_slots"] == 3 and poi["max_power"] == 60 and poi["price_per_kwh"] == 18
+    assert poi["address"] == "MG Road, Kochi" and poi["access_type"] == "public"
+
+
+@pytest.mark.parametrize("change", [
+    {"operating_hours": ["24/7"]}, {"status": ["open"]}, {"name": {"en": "x"}}, {"access_type": 1},
+    {"power_types": [1]}, {"id": [1]}, {"latitude": "north"}, {"longitude": 200}, {"available_slots": 9},
+])
+def test_mistyped_station_fields_are_rejected(change):
+    with pytest.raises(InvalidRecord):
+        map_record(dict(STATION, **change), 1)
+
+
+@pytest.mark.parametrize("change", [
+    {"UsageCost": 12}, {"AddressInfo": "x"}, {"StatusType": "Operational"}, {"UsageType": ["Public"]},
+    {"Connections": {"PowerKW": 22}}, {"Connections": [{"ConnectionType": "CCS"}]},
+    {"Connections": [{"PowerKW": "fast"}]}, {"NumberOfPoints": -1}, {"ID": {"n": 1}},
+    {"AddressInfo": {"Latitude": 9.9, "Longitude": 76.2, "Town": 5}},
+])
+def test_mistyped_ocm_fields_are_rejected(change):
+    with pytest.raises(InvalidRecord):
+        map_record(dict(OCM, **change), 1)
+
+
+def test_bad_lines_are_reported_and_the_import_continues(tmp_path):
+    path = write_lines(tmp_path, [STATION, "{not json", dict(STATION, operating_hours=["24/7"]),
+                                  [1, 2], dict(OCM, UsageCost=12), OCM, dict(STATION, operating_hours="whenever")])
+    engine = StationEngine()
+    report = import_stations(path, engine)
+    assert (report.accepted, report.rejected, report.warned) == (3, 4, 1)
+    assert [n for n, _ in report.errors] == [2, 3, 4, 5]
+    assert {s.id for s in engine.stations} == {"import:7", "ocm:42"}
+
+
+def test_json_array_streams_across_chunk_boundaries(tmp_path):
+    records = [dict(STATION, id=i, max_power=i * 1.5) for i in range(200)]
+    path = tmp_path / "stations.json"
+    path.write_text(json.dumps(records))
+    with open(path) as f:
+        assert list(iter_json_array(f, chunk_size=7)) == records
+
+
+@pytest.mark.parametrize("text", ['{"a": 1}', '[{"a": 1} {"b": 2}]', '[{"a": 1},'])
+def test_json_array_rejects_malformed_files(tmp_path, text):
+    path = tmp_path / "bad.json"
+    path.write_text(text)
+    with open(path) as f, pytest.raises(ValueError):
+        list(iter_json_array(f, chunk_size=4))
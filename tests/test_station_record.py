@@ -0,0 +1,31 @@
+import station_record
+from station_record import StationRecord, StationResult
+
+PROVIDER = {"id": 1000, "name": "Depot", "address": "Kochi", "latitude": 9.93, "longitude": 76.27,
+            "total_slots": 2, "available_slots": 1, "power_types": ["CCS"], "max_power": 60, "price_per_kwh": 0.2,
+            "status": "available", "access_type": "provider", "owner_type": "commercial",
+            "operating_hours": "Mon-Fri 8AM-8PM", "contact_info": "+91 98470 00000", "email": "depot@example.com"}
+
+
+def test_categorical_values_are_shared():
+    a = StationRecord.from_dict(dict(PROVIDER, status="".join(["avail", "able"])))
+    b = StationRecord.from_dict(PROVIDER)
+    assert a.status is b.status and a.access_type is b.access_type and a.power_types is b.power_types
+
+
+def test_free_text_is_not_interned():
+    before = len(station_record._values)
+    for i in range(100):
+        record = StationRecord.from_dict(dict(PROVIDER, id=i, email=f"owner{i}@example.com",
+                                              operating_hours=f"{i % 12 + 1}AM-10PM", registered_date=f"2026-01-{i}"))
+        record["contact_info"] = f"+91 {i}"
+    assert len(station_record._values) == before
+
+
+def test_records_read_like_the_old_dicts():
+    record = StationRecord.from_dict(PROVIDER)
+    assert record.to_dict() == PROVIDER
+    assert record["email"] == "depot@example.com" and record.get("missing", 1) == 1 and "email" in record
+    result = StationResult(record, 3.14159)
+    assert result["distance_km"] == 3.14 and result["name"] == "Depot"
+    assert result.to_dict() == dict(PROVIDER, distance_km=3.14)
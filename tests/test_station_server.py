@@ -0,0 +1,83 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from provider_store import open_provider_store
+from station_engine import PUBLIC_STATIONS, StationEngine
+from station_server import PooledHTTPServer, StationService
+
+PROVIDER = {"name": "Server Test Charger", "address": "MG Road, Kochi", "latitude": 9.935, "longitude": 76.268,
+            "total_slots": 2, "power_types": "CCS", "max_power": 60, "price_per_kwh": 0.2}
+
+
+@pytest.fixture
+def server(tmp_path):
+    store = open_provider_store(str(tmp_path / "providers.db"), legacy_json=None)
+    server = PooledHTTPServer(("127.0.0.1", 0), StationService(StationEngine(PUBLIC_STATIONS), store), workers=1,
+                              request_timeout=0.3)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    store.close()
+
+
+def request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_search_and_registration(server):
+    status, body = request(server, "GET", "/search?lat=9.93&lon=76.27&radius=50&limit=2")
+    assert status == 200 and body["count"] > 2 and len(body["stations"]) == 2
+    status, body = request(server, "POST", "/providers", json.dumps(PROVIDER))
+    assert status == 201
+    status, found = request(server, "GET", "/search?lat=9.935&lon=76.268&radius=1&k=1")
+    assert found["stations"][0]["id"] == body["id"]
+
+
+@pytest.mark.parametrize("query", [
+    "lat=nan&lon=76.27", "lat=91&lon=76.27", "lat=9.93&lon=-181", "lat=9.93&lon=inf", "lat=9.93&lon=76.27&radius=0",
+    "lat=9.93&lon=76.27&radius=-5", "lat=9.93&lon=76.27&k=0", "lat=9.93&lon=76.27&k=-3",
+    "lat=9.93&lon=76.27&limit=-1", "lat=9.93&lon=76.27&k=x", "lon=76.27", "lat=9.93&lon=76.27&sort=cost",
+])
+def test_invalid_search_parameters_are_400(server, query):
+    status, body = request(server, "GET", f"/search?{query}")
+    assert status == 400 and "error" in body
+
+
+def test_limit_zero_returns_no_stations(server):
+    status, body = request(server, "GET", "/search?lat=9.93&lon=76.27&radius=50&limit=0")
+    assert status == 200 and body["count"] > 0 and body["stations"] == []
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_bad_content_length_is_400(server, length):
+    with socket.create_connection(("127.0.0.1", server.server_port), timeout=5) as sock:
+        sock.sendall(f"POST /providers HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n{{}}".encode())
+        assert sock.recv(4096).startswith(b"HTTP/1.1 400")
+
+
+def test_stalled_client_does_not_pin_the_only_worker(server):
+    stalled = socket.create_connection(("127.0.0.1", server.server_port), timeout=5)
+    stalled.sendall(b"GET /search?lat=9.93")
+    body_stalled = socket.create_connection(("127.0.0.1", server.server_port), timeout=5)
+    body_stalled.sendall(b"POST /providers HTTP/1.1\r\nHost: x\r\nContent-Length: 100\r\n\r\n{")
+    started = time.monotonic()
+    status, _ = request(server, "GET", "/health")
+    assert status == 200 and time.monotonic() - started < 3
+    assert body_stalled.recv(4096).startswith(b"HTTP/1.1 408")
+    # The server hangs up on both once their requests time out
+    assert stalled.recv(4096) == b"" and body_stalled.recv(4096) == b""
+    stalled.close()
+    body_stalled.close()
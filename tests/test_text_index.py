@@ -0,0 +1,144 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import make_stations
+from station_engine import StationEngine
+from text_index import PREFIX_WEIGHT, TextIndex, best_first, fold, trigrams
+
+TOWNS = ("Ernakulam", "Thrissur", "Kozhikode", "Kollam", "Kottayam", "Alappuzha", "Kannur", "Palakkad")
+KINDS = ("Mall", "Depot", "Plaza", "Hub")
+
+
+def index_of(texts):
+    index = TextIndex()
+    index.sync(len(texts), lambda start, stop: texts[start:stop])
+    return index
+
+
+def matched(index, query):
+    rows, scores = index.match(query)
+    return dict(zip(rows.tolist(), scores.tolist()))
+
+
+@pytest.fixture(scope="module")
+def town_stations():
+    stations = make_stations(3000, seed=2, lat_range=(8.2, 12.8), lon_range=(74.8, 77.4))
+    rng = random.Random(2)
+    for station in stations:
+        station["name"] = f"{rng.choice(TOWNS)} {rng.choice(KINDS)}"
+    return stations
+
+
+def test_fold_and_trigrams():
+    assert fold("Kochi") == "kochi"
+    assert fold("Café") == "cafe"
+    assert trigrams("ab") == {" ab", "ab "}
+    assert len(trigrams("ernakulam")) == len("ernakulam")
+
+
+def test_best_first_orders_by_score_then_tiebreak():
+    scores = np.array([1.0, 2.0, 2.0, 0.5, 2.0])
+    tiebreak = np.array([0.0, 3.0, 1.0, 0.0, 2.0])
+    assert best_first(scores, tiebreak).tolist() == [2, 4, 1, 0, 3]
+    assert best_first(scores, tiebreak, 2).tolist() == [2, 4]
+    assert best_first(scores, tiebreak, 0).tolist() == []
+
+
+def test_every_query_word_must_match():
+    index = index_of(["Lulu Mall Edappally", "Oberon Mall Kochi", "Edappally Metro"])
+    assert matched(index, "mall ") == {0: 1.0, 1: 1.0}
+    assert matched(index, "edappally mall ") == {0: 2.0}
+    assert matched(index, "metro mall ") == {}
+    assert matched(index, "") == {}
+
+
+def test_typos_match_by_trigram_similarity():
+    index = index_of(["Ernakulam South", "Thrissur Round", "Kannur Town"])
+    assert list(matched(index, "ernakulm ")) == [0]
+    assert list(matched(index, "trissur ")) == [1]
+    assert 0.5 <= matched(index, "ernakulm ")[0] < 1
+    # Short words must be typed exactly
+    assert matched(index, "twn ") == {}
+
+
+def test_last_word_matches_as_a_prefix_while_typing():
+    index = index_of(["Kottayam Depot", "Kollam Plaza", "Kozhikode Hub"])
+    assert sorted(matched(index, "ko")) == [0, 1, 2]
+    assert matched(index, "ko ") == {}
+    assert matched(index, "kol")[1] == pytest.approx(PREFIX_WEIGHT + (1 - PREFIX_WEIGHT) * 3 / 6)
+    assert matched(index, "kollam")[1] == 1.0
+    assert sorted(matched(index, "depot ko")) == [0]
+
+
+def test_match_within_rows_keeps_their_order():
+    index = index_of(["Kochi Mall", "Kochi Depot", "Kochi Mall"])
+    rows, scores = index.match("kochi mall ", rows=np.array([2, 1, 0]))
+    assert rows.tolist() == [2, 0] and scores.tolist() == [2.0, 2.0]
+
+
+def test_incremental_sync_matches_a_bulk_sync():
+    texts = [f"{TOWNS[i % len(TOWNS)]} {KINDS[i % len(KINDS)]} {i}" for i in range(500)]
+    bulk = index_of(texts)
+    grown = TextIndex()
+    for count in (10, 11, 200, 500):
+        grown.sync(count, lambda start, stop: texts[start:stop])
+    for query in ("thrissur hub ", "kozhikod", "palakad plaza ", "4"):
+        assert matched(grown, query) == matched(bulk, query)
+
+
+def test_complete_prefers_common_words():
+    index = index_of(["Kollam Depot", "Kollam Plaza", "Kottayam Hub", "Lulu Mall"])
+    assert index.complete("Depot ko") == ["Depot kollam", "Depot kottayam"]
+    assert index.complete("Depot ko", limit=1) == ["Depot kollam"]
+    assert index.complete("ko ") == []
+    assert index.complete("zz") == []
+
+
+def test_engine_text_rows_match_a_brute_force_filter(town_stations):
+    engine = StationEngine(town_stations)
+    lat, lon = 9.93, 76.27
+    for query, radius, access_type, power_type in (("thrissur mall ", None, "all", "all"),
+                                                   ("kollam ", 150, "public", "all"),
+                                                   ("plaza ", 80, "all", "CCS"),
+                                                   ("hub ", None, "provider", "Type 2")):
+        rows, distances = engine.text_rows(query, lat, lon, radius, access_type, power_type)
+        words = query.split()
+        expected = []
+        for row, station in enumerate(town_stations):
+            if not set(words) <= set(fold(station["name"]).split()):
+                continue
+            if station["available_slots"] <= 0:
+                continue
+            if access_type != "all" and station["access_type"] != access_type:
+                continue
+            if power_type != "all" and power_type not in station["power_types"]:
+                continue
+            expected.append(row)
+        all_distances = engine.station_columns.distances(lat, lon, np.array(expected, dtype=np.intp))
+        if radius is not None:
+            expected = [row for row, d in zip(expected, all_distances) if d <= radius]
+        assert len(expected) > 0
+        assert sorted(rows.tolist()) == expected
+        # Equal scores, so nearest first
+        assert np.all(np.diff(distances) >= 0)
+
+
+def test_engine_text_rows_with_a_limit_keep_the_best(town_stations):
+    engine = StationEngine(town_stations)
+    lat, lon = 10.5, 76.2
+    # Every address has "road", so its ties are searched through the grid
+    for query, radius in (("mall ", None), ("kozhikode ", 200), ("kannr depot ", None), ("pala", 120),
+                          ("road ", None), ("road ", 60)):
+        rows, distances = engine.text_rows(query, lat, lon, radius)
+        limited, limited_distances = engine.text_rows(query, lat, lon, radius, limit=10)
+        assert limited.tolist() == rows[:10].tolist()
+        assert limited_distances == pytest.approx(distances[:10])
+
+
+def test_suggest_completes_from_the_catalog(town_stations):
+    engine = StationEngine(town_stations)
+    engine.sync_text_index()
+    assert engine.suggest("Thrissur pl") == ["Thrissur plaza"]
+    assert "kottayam" in engine.suggest("kot")
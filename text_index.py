@@ -0,0 +1,322 @@
+"""Typo-tolerant text search over station names and addresses.
+
+Each station's name and address are split into words, and every distinct
+word keeps the sorted rows that contain it. The rows of all words live in
+one array sliced by per-word offsets, so a word's stations are a view, not
+a list. A query word is looked up in the vocabulary of distinct words, not
+among the stations:
+
+  * exactly,
+  * as a prefix when it is the last word and still being typed, which also
+    drives autocomplete,
+  * or, for words of FUZZY_MIN_LENGTH letters or more, by trigram
+    similarity, so "ernakulm" and "trissur" still find Ernakulam and
+    Thrissur.
+
+A station must match every query word, and it scores the sum of its best
+match per word: 1 for exact, PREFIX_WEIGHT up to 1 for a prefix, and the
+trigram similarity for a fuzzy match. Candidates come from the rarest
+query word and the others are checked by binary search in their rows, so
+the cost follows the shortest list rather than the catalog size.
+
+Rows are indexed in bulk the first time they are searched and then
+incrementally. Stations added later (registered providers, streamed
+datasets) go into short per-word pending lists, which are merged into the
+arrays once they grow.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from collections import Counter
+from itertools import chain
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+WORD = re.compile(r'[^\W_]+')
+FUZZY_MIN_LENGTH = 4
+# Dice coefficient of the trigram sets; one wrong letter in a six-letter word still scores 0.5
+FUZZY_THRESHOLD = 0.5
+PREFIX_WEIGHT = 0.75
+# Most vocabulary words one query word may expand to (prefixes of common words, fuzzy matches)
+MAX_TERM_WORDS = 32
+# A query word whose rows number fewer than this many times the candidates is checked
+# through a per-row array rather than by binary search
+DENSE_RATIO = 16
+# Pending rows merged into the arrays once there are this many (or an eighth of the index)
+COMPACT_MIN = 4096
+SYNC_CHUNK = 1 << 16
+
+
+def fold(word) -> str:
+    """word as stored in the vocabulary: lower case, without accents"""
+    word = word.lower()
+    if word.isascii():
+        return word
+    return ''.join(c for c in unicodedata.normalize('NFKD', word) if not unicodedata.combining(c))
+
+
+def trigrams(word) -> set:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def best_first(scores, tiebreak, limit=None) -> np.ndarray:
+    """Positions by descending score, then ascending tiebreak; only the first limit if given"""
+    if limit is None or len(scores) <= limit:
+        return np.lexsort((tiebreak, -scores))
+    if limit <= 0:
+        return np.empty(0, dtype=np.intp)
+    # Everything scoring above the limit-th best is in; ties at that score go to the lowest tiebreak
+    cutoff = -np.partition(-scores, limit - 1)[limit - 1]
+    above = np.flatnonzero(scores > cutoff)
+    tied = np.flatnonzero(scores == cutoff)
+    need = limit - len(above)
+    if need < len(tied):
+        tied = tied[np.argpartition(tiebreak[tied], need - 1)[:need]]
+    chosen = np.concatenate((above, tied))
+    return chosen[np.lexsort((tiebreak[chosen], -scores[chosen]))]
+
+
+class TextIndex:
+    """Word -> sorted rows postings over station text, with a trigram index over the vocabulary"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        with self.lock:
+            self.size = 0
+            # Lower-cased token as found in the text -> word id of its folded form
+            self.token_ids: Dict[str, int] = {}
+            self.word_ids: Dict[str, int] = {}
+            self.words: List[str] = []
+            self.by_trigram: Dict[str, List[int]] = {}
+            self.trigram_counts: List[int] = []
+            # Vocabulary in alphabetical order, for prefix lookups
+            self.sorted_words: List[str] = []
+            self.sorted_ids = np.empty(0, dtype=np.int32)
+            self.new_words: List[int] = []
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.postings = np.empty(0, dtype=np.int32)
+            self.pending: Dict[int, List[int]] = {}
+            self.n_pending = 0
+
+    def _word_id(self, token) -> int:
+        word = fold(token)
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = self.word_ids[word] = len(self.words)
+            self.words.append(word)
+            self.new_words.append(word_id)
+            # Numbers and codes only match exactly or by prefix
+            grams = trigrams(word) if word.isalpha() else ()
+            for gram in grams:
+                self.by_trigram.setdefault(gram, []).append(word_id)
+            self.trigram_counts.append(len(grams))
+        self.token_ids[token] = word_id
+        return word_id
+
+    def _sort_new_words(self):
+        new, self.new_words = self.new_words, []
+        if not new:
+            return
+        if len(new) > len(self.sorted_words) // 8:
+            order = sorted(range(len(self.words)), key=self.words.__getitem__)
+            self.sorted_words = [self.words[i] for i in order]
+            self.sorted_ids = np.array(order, dtype=np.int32)
+            return
+        ids = self.sorted_ids.tolist()
+        for word_id in new:
+            i = bisect.bisect_left(self.sorted_words, self.words[word_id])
+            self.sorted_words.insert(i, self.words[word_id])
+            ids.insert(i, word_id)
+        self.sorted_ids = np.array(ids, dtype=np.int32)
+
+    def _tokenize(self, start, texts) -> Tuple[np.ndarray, np.ndarray]:
+        """Word ids and rows of every word occurrence in texts, the first being row start"""
+        words_per_row = [WORD.findall(text.lower()) if text else [] for text in texts]
+        tokens = list(chain.from_iterable(words_per_row))
+        for token in set(tokens).difference(self.token_ids):
+            self._word_id(token)
+        ids = np.fromiter(map(self.token_ids.__getitem__, tokens), dtype=np.int32, count=len(tokens))
+        counts = np.fromiter(map(len, words_per_row), dtype=np.int64, count=len(words_per_row))
+        rows = np.repeat(np.arange(start, start + len(texts), dtype=np.int32), counts)
+        return ids, rows
+
+    def sync(self, count, texts: Callable[[int, int], Sequence[str]]):
+        """Index rows from the first unindexed one up to count; texts(start, stop) gives their name and address"""
+        with self.lock:
+            if count <= self.size:
+                return
+            parts = []
+            for start in range(self.size, count, SYNC_CHUNK):
+                stop = min(start + SYNC_CHUNK, count)
+                parts.append(self._tokenize(start, texts(start, stop)))
+            ids = np.concatenate([p[0] for p in parts])
+            rows = np.concatenate([p[1] for p in parts])
+            self.size = count
+            self._sort_new_words()
+            threshold = max(COMPACT_MIN, len(self.postings) // 8)
+            if len(rows) >= threshold:
+                self._merge(ids, rows)
+                return
+            pending = self.pending
+            for word_id, row in zip(ids.tolist(), rows.tolist()):
+                listed = pending.setdefault(word_id, [])
+                if not listed or listed[-1] != row:
+                    listed.append(row)
+            self.n_pending += len(rows)
+            if self.n_pending > threshold:
+                self._merge(np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32))
+
+    def _merge(self, ids, rows):
+        """Rebuild the postings arrays from the current ones, the pending lists and the given occurrences"""
+        known = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+        pending_ids = np.repeat(np.fromiter(self.pending, dtype=np.int32, count=len(self.pending)),
+                                [len(listed) for listed in self.pending.values()])
+        pending_rows = np.fromiter(chain.from_iterable(self.pending.values()), dtype=np.int32)
+        words = np.concatenate((known, pending_ids, ids))
+        postings = np.concatenate((self.postings, pending_rows, rows))
+        order = np.lexsort((postings, words))
+        words, postings = words[order], postings[order]
+        # A word repeated in one station's text counts once
+        first = np.ones(len(words), dtype=bool)
+        first[1:] = (words[1:] != words[:-1]) | (postings[1:] != postings[:-1])
+        words, postings = words[first], postings[first]
+        self.offsets = np.searchsorted(words, np.arange(len(self.words) + 1)).astype(np.int64)
+        self.postings = postings
+        self.pending = {}
+        self.n_pending = 0
+
+    def _rows(self, word_id) -> np.ndarray:
+        """Sorted rows containing a word; pending rows are all newer than the merged ones"""
+        if word_id < len(self.offsets) - 1:
+            merged = self.postings[self.offsets[word_id]:self.offsets[word_id + 1]]
+        else:
+            merged = self.postings[:0]
+        pending = self.pending.get(word_id)
+        if pending:
+            return np.concatenate((merged, np.array(pending, dtype=np.int32)))
+        return merged
+
+    def _frequencies(self, ids) -> np.ndarray:
+        """Number of merged rows containing each word"""
+        counts = np.diff(self.offsets)
+        frequencies = np.zeros(len(ids), dtype=np.int64)
+        known = ids < len(counts)
+        frequencies[known] = counts[ids[known]]
+        return frequencies
+
+    def _prefixed(self, word) -> np.ndarray:
+        """Ids of the vocabulary words starting with word"""
+        lo = bisect.bisect_left(self.sorted_words, word)
+        hi = bisect.bisect_left(self.sorted_words, word + '\uffff', lo)
+        return self.sorted_ids[lo:hi]
+
+    def _term(self, token, prefix) -> Dict[int, float]:
+        """Vocabulary words a query word matches, with the weight of each match"""
+        word = fold(token)
+        found: Dict[int, float] = {}
+        if prefix:
+            ids = self._prefixed(word)
+            if len(ids) > MAX_TERM_WORDS:
+                ids = ids[np.argsort(-self._frequencies(ids), kind='stable')[:MAX_TERM_WORDS]]
+            for word_id in ids.tolist():
+                found[word_id] = PREFIX_WEIGHT + (1 - PREFIX_WEIGHT) * len(word) / len(self.words[word_id])
+        exact = self.word_ids.get(word)
+        if exact is not None:
+            found[exact] = 1.0
+        if len(word) >= FUZZY_MIN_LENGTH and word.isalpha():
+            grams = trigrams(word)
+            shared = Counter(chain.from_iterable(self.by_trigram.get(gram, ()) for gram in grams))
+            for word_id, n in shared.items():
+                similarity = 2 * n / (len(grams) + self.trigram_counts[word_id])
+                if similarity >= FUZZY_THRESHOLD and similarity > found.get(word_id, 0.0):
+                    found[word_id] = similarity
+        if len(found) > MAX_TERM_WORDS:
+            found = dict(sorted(found.items(), key=lambda item: -item[1])[:MAX_TERM_WORDS])
+        return found
+
+    def match(self, query, rows=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows matching every word of query and their scores, unordered; only among rows if given.
+
+        The last word also matches as a prefix unless the query ends in a space.
+        With rows, matches keep the order they have there.
+        """
+        tokens = WORD.findall(query.lower())
+        if not tokens:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        typing = not query[-1:].isspace()
+        with self.lock:
+            terms = []
+            for i, token in enumerate(tokens):
+                found = self._term(token, typing and i == len(tokens) - 1)
+                lists = [(self._rows(word_id), weight) for word_id, weight in found.items()]
+                terms.append((sum(len(listed) for listed, _ in lists), lists))
+        terms.sort(key=lambda term: term[0])
+
+        if rows is None:
+            candidates, scores = self._union(terms.pop(0)[1])
+        else:
+            candidates = np.asarray(rows)
+            scores = np.zeros(len(candidates))
+        for total, lists in terms:
+            if not len(candidates):
+                break
+            if len(lists) == 1 and len(lists[0][0]) == self.size:
+                # A word in every station's text rules nothing out
+                scores = scores + lists[0][1]
+                continue
+            if total < DENSE_RATIO * len(candidates):
+                # Cheaper to spread the term's rows over a per-row array than to look each candidate up
+                weights = np.zeros(self.size)
+                for listed, weight in sorted(lists, key=lambda entry: entry[1]):
+                    weights[listed] = weight
+                best = weights[candidates]
+            else:
+                best = np.zeros(len(candidates))
+                for listed, weight in lists:
+                    if not len(listed):
+                        continue
+                    at = np.minimum(np.searchsorted(listed, candidates), len(listed) - 1)
+                    hit = listed[at] == candidates
+                    best[hit] = np.maximum(best[hit], weight)
+            keep = best > 0
+            candidates, scores = candidates[keep], scores[keep] + best[keep]
+        return candidates.astype(np.intp), scores
+
+    @staticmethod
+    def _union(lists) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows in any of the lists, each with its best weight"""
+        lists = [(listed, weight) for listed, weight in lists if len(listed)]
+        if not lists:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        if len(lists) == 1:
+            listed, weight = lists[0]
+            return listed, np.full(len(listed), weight)
+        rows = np.concatenate([listed for listed, _ in lists])
+        weights = np.concatenate([np.full(len(listed), weight) for listed, weight in lists])
+        order = np.lexsort((-weights, rows))
+        rows, weights = rows[order], weights[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        return rows[first], weights[first]
+
+    def complete(self, query, limit=8) -> List[str]:
+        """query with its last word completed from the vocabulary, the most common completions first"""
+        tokens = WORD.findall(query.lower())
+        if not tokens or query[-1:].isspace():
+            return []
+        head = query[:query.lower().rfind(tokens[-1])]
+        with self.lock:
+            ids = self._prefixed(fold(tokens[-1]))
+            if not len(ids):
+                return []
+            ids = ids[np.argsort(-self._frequencies(ids), kind='stable')[:limit]]
+            return [head + self.words[word_id] for word_id in ids.tolist()]